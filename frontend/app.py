@@ -6,11 +6,13 @@ This module initializes and runs the Chainlit application for the document manag
 import chainlit as cl
 from sqlalchemy import select
 import base64
+from collections import deque
 from io import BytesIO
 from fastapi import UploadFile
 import chainlit.data as cl_data
 from chainlit.data.sql_alchemy import SQLAlchemyDataLayer
-from src.rag_pipeline import pipeline
+import asyncio
+from src.rag_pipeline import get_pipeline
 from src.docstore.session import AsyncSessionLocal, SessionLocal
 from src.api.routes import upload_files
 from src.docstore.files_crud import (async_list_all_files, 
@@ -20,8 +22,9 @@ from src.docstore.files_crud import (async_list_all_files,
                                      async_delete_file_row
                                     )
 from src.rag_utils import rewrite_query
-from src.builder import rewrite_query_prompt, qdrant_store
-from src.config import COLLECTION as collection_name, COLLECTION_RESOURCES
+from src.builder import load_prompt, init_docstore
+from src.config import COLLECTION as collection_name, REWRITE_QUERY_PROMPT_PATH, COLLECTION_RESOURCES, CACHE_TOP_K, RESPONSE_DISTANCE_THRESHOLD
+from src.config import REWRITE_CACHE_TTL
 from src.config import DOCSTORE_HOST, DOCSTORE_PORT, DOCSTORE_USER, DOCSTORE_PASSWORD, DOCSTORE_NAME
 from src.logger import logger
 
@@ -31,6 +34,57 @@ cl_data._data_layer = SQLAlchemyDataLayer(conninfo=conninfo, ssl_require=False)
 collection_sources = COLLECTION_RESOURCES or []
 history_window = 5
 
+# tables are created once per process, by whichever chat starts first
+_docstore_lock = asyncio.Lock()
+_docstore_ready = False
+
+async def ensure_docstore():
+    global _docstore_ready
+    if _docstore_ready:
+        return
+    async with _docstore_lock:
+        if not _docstore_ready:
+            await init_docstore()
+            _docstore_ready = True
+
+class TokenBatcher:
+    """
+    Coalesces streamed LLM tokens into fewer `stream_token` calls (one websocket send each).
+
+    Buffered tokens are flushed once `max_tokens` have accumulated or `max_wait_ms` has
+    passed since the first of them was buffered, whichever comes first. The time bound is
+    enforced by a timer, so a stalled stream still shows what it has produced so far.
+    """
+    def __init__(self, message: cl.Message, max_tokens: int = 8, max_wait_ms: float = 20.0):
+        self.message = message
+        self.max_tokens = max_tokens
+        self.max_wait = max_wait_ms / 1000
+        self._buffer = []
+        self._timer = None          # pending call_later handle while the buffer is non-empty
+        self._timer_task = None     # flush started by the timer
+        self._send_lock = asyncio.Lock()  # keeps sends in buffer order
+
+    async def push(self, token: str) -> None:
+        self._buffer.append(token)
+        if len(self._buffer) >= self.max_tokens:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._timer_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._send_lock:
+            if self._buffer:
+                text = "".join(self._buffer)
+                self._buffer.clear()
+                await self.message.stream_token(text)
+
 @cl.set_starters
 async def set_starters():
     return []
@@ -49,8 +103,11 @@ def auth_callback(username: str, password: str):
 
 @cl.on_chat_start
 async def on_chat_start():
-    cl.user_session.set("history", [])
-    cl.user_session.set("pipeline", pipeline)
+    # rolling window of formatted "Role: content" turns; the oldest turn drops off as new ones arrive
+    await ensure_docstore()
+    cl.user_session.set("history", deque(maxlen=history_window))
+    # built on the first chat of the process, then shared
+    cl.user_session.set("pipeline", await asyncio.to_thread(get_pipeline))
 
     actions = [
         cl.Action(
@@ -87,9 +144,7 @@ async def get_files_action(action: cl.Action):
     
     logger.debug(f"List of files: {file_names}")
     props = {"files": file_names}
-    print(props)
     file_element = cl.CustomElement(name="GetFiles", props=props)
-    print(file_element)
     await cl.Message(
         content="Here is the files information!",
         elements=[file_element]
@@ -113,8 +168,8 @@ async def confirm_upload_file(action: cl.Action):
         await cl.Message(content="No file selected.").send()
         return
 
-    # Decode base64 to bytes
-    content = base64.b64decode(file_data.split(",")[1])
+    # Decode base64 to bytes off the event loop; large uploads would otherwise stall other sessions
+    content = await asyncio.to_thread(base64.b64decode, file_data.split(",", 1)[1])
     size_kb = len(content) / 1024
 
     # Create UploadFile-like object
@@ -125,7 +180,7 @@ async def confirm_upload_file(action: cl.Action):
     async with AsyncSessionLocal() as session:
         try:
             # Call your async upload_files function
-            response = await upload_files(file=upload_file, session=session)
+            response = await upload_files(file=upload_file, session=session, pipeline=cl.user_session.get("pipeline"))
             await cl.Message(
                 content=f"File '{filename}' uploaded successfully ({size_kb:.2f} KB)\nResponse: {response}"
             ).send()
@@ -152,7 +207,7 @@ async def confirm_delete_file(action: cl.Action):
             # Call async delete_file endpoint 
             res = await async_delete_file_row(filename, session=session, commit=False)
             if res:  
-                qdrant_store.delete_points_by_source(collection_name=collection_name, source=filename)
+                await cl.user_session.get("pipeline").vectorstore.async_delete_points_by_source(collection_name=collection_name, source=filename)
                 await session.commit()
                 await cl.Message(content=f"File '{filename}' and related docstore entries deleted.").send()
             else:
@@ -165,21 +220,27 @@ async def confirm_delete_file(action: cl.Action):
 async def on_message(message: cl.Message):
     history = cl.user_session.get("history")
     pipeline = cl.user_session.get("pipeline")
-    chat_history = "\n".join(f"{item['role'].capitalize()}: {item['content']}" for item in history[-history_window:])
+    chat_history = "\n".join(history)
     user_message = message.content
-    history.append(
-        {
-            "role": "user",
-            "content": user_message
-        }
-    )
+    history.append(f"User: {user_message}")
+
+    # A first message is probed as is, before paying for rewrite, retrieval and generation.
+    # Follow-ups can depend on earlier turns, so they are probed with the rewritten query below.
+    cached = await pipeline.lookup_response(query=user_message,
+                                            top_k=CACHE_TOP_K,
+                                            distance_threshold=RESPONSE_DISTANCE_THRESHOLD,
+                                            chat_history=chat_history)
+    if cached:
+        await send_cached(cached, user_message, history)
+        return
 
     async with cl.Step("Query Rewrite") as step:
         query, sources, fallback_response = await rewrite_query(user_query=user_message,
-                                                                rewrite_query_prompt=rewrite_query_prompt, 
+                                                                rewrite_query_prompt=load_prompt(REWRITE_QUERY_PROMPT_PATH), 
                                                                 llm=pipeline.llm, 
                                                                 chat_history=chat_history, 
-                                                                collection_sources=collection_sources)       
+                                                                collection_sources=collection_sources,
+                                                                cache_ttl=REWRITE_CACHE_TTL)       
         
         step.output = query if query else "No rewritten query"
 
@@ -190,50 +251,66 @@ async def on_message(message: cl.Message):
         await response.send()
 
     else:
+        # the first message keys the cache as sent; a follow-up by its self-contained rewrite
+        cache_query = query if chat_history else user_message
+        if chat_history:
+            cached = await pipeline.lookup_response(query=cache_query,
+                                                    top_k=CACHE_TOP_K,
+                                                    distance_threshold=RESPONSE_DISTANCE_THRESHOLD)
+            if cached:
+                await send_cached(cached, cache_query, history)
+                return
         cl.user_session.set("stop", False)
         logger.debug(f"Actual query: {user_message}\nRewritten query: {query}\n Sources: {sources}")
         retrieved_docs = await pipeline.retrieve(query=query,
                                                 sources=sources                                      
                                         )
-        contexts = retrieved_docs
         formatted_context = pipeline.build_context(retrieved_docs)
-        logger.debug(f"Retrieved {len(retrieved_docs)} docs")
+        logger.debug("Retrieved %d docs", len(retrieved_docs))
         stream = await pipeline.generate_response(query, formatted_context)
+        # source elements and footer are ready before the first token, so the final update only adds the footer
+        elements, sources_footer = format_sources(retrieved_docs)
         # stream response
-        response = cl.Message(content="")
-        res = ""
+        response = cl.Message(content="", elements=elements)
+        chunks = []
+        batcher = TokenBatcher(response)
         async for chunk in stream:
-            res += chunk
-            await response.stream_token(chunk)    
+            chunks.append(chunk)
+            await batcher.push(chunk)
+        await batcher.flush()
+        res = "".join(chunks)
 
-        # output sources
-        elements = []
-        names = []
-    
-        for n, context in enumerate(contexts):
-            name = f"Source_{n}: {context.get('metadata', {}).get('source', 'Unknown Source')}"
-            content = context.get("text", "")
-            names.append(name)
-            element = cl.Text(
-                content=content, name=name, display="side"
-            )
-            elements.append(element)
-        
-        names = "\n".join(names)
-        result = f"{res}\n\nSources:\n{names}"
-        response.content = result
-        response.elements = elements
         step.output = res
-        await response.update()
-        await response.send()
+        await send_with_sources(response, res, sources_footer)
+        await pipeline.cache_response(query=cache_query, response=res, sources=retrieved_docs)
+
+    history.append(f"Assistant: {res}")
+
+async def send_cached(cached: dict, query: str, history: deque):
+    """Send a cached response with its sources and record it in the chat history."""
+    res = cached["response"]
+    logger.debug(f"Serving cached response for: {query}")
+    elements, sources_footer = format_sources(cached["sources"])
+    response = cl.Message(content="", elements=elements)
+    await response.stream_token(res)
+    await send_with_sources(response, res, sources_footer)
+    history.append(f"Assistant: {res}")
+
+def format_sources(contexts: list):
+    """Build the side-panel elements and the "Sources:" footer for a response in one pass."""
+    elements = []
+    footer = ["\n\nSources:"]
+    for n, context in enumerate(contexts):
+        name = f"Source_{n}: {context.get('metadata', {}).get('source', 'Unknown Source')}"
+        footer.append(name)
+        elements.append(cl.Text(content=context.get("text", ""), name=name, display="side"))
+    return elements, "\n".join(footer)
 
-    history.append(
-        {
-            "role": "assistant",
-            "content": res
-        }
-    )
-    cl.user_session.set("history", history)
+async def send_with_sources(response: cl.Message, res: str, sources_footer: str):
+    """Append the sources footer to a streamed response and send it."""
+    response.content = res + sources_footer
+    await response.update()
+    await response.send()
 
 @cl.on_chat_end
 def end():
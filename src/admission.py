@@ -0,0 +1,79 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """
+    Bounds the number of in-flight calls to a backend (LLM API, Qdrant) from one process.
+
+    Callers wait in `acquire` while `limit` calls are running. The limit can be changed at runtime
+    with `set_limit`; raising it wakes waiters right away, lowering it lets in-flight calls finish
+    and admits new ones only once the count drops below the new limit.
+
+    Usage:
+        async with admission:
+            await client.call(...)
+
+    Args:
+        limit (int): Maximum number of concurrent calls. Defaults to 32.
+        name (str): Label used in log messages. Defaults to "backend".
+    """
+    def __init__(self, limit: int = 32, name: str = "backend"):
+        if limit < 1:
+            raise ValueError("Admission limit must be at least 1")
+        self.name = name
+        self._limit = limit
+        self._inflight = 0
+        self._cond = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    async def acquire(self) -> None:
+        """Wait until fewer than `limit` calls are in flight, then take a slot."""
+        async with self._cond:
+            try:
+                await self._cond.wait_for(lambda: self._inflight < self._limit)
+            except asyncio.CancelledError:
+                # a waiter cancelled after being notified would swallow the wakeup; pass it on
+                if self._inflight < self._limit:
+                    self._cond.notify(1)
+                raise
+            self._inflight += 1
+
+    async def release(self) -> None:
+        """Give a slot back and wake one waiter."""
+        async with self._cond:
+            self._inflight -= 1
+            self._cond.notify(1)
+
+    async def set_limit(self, limit: int) -> None:
+        """
+        Change the concurrency limit without disturbing current waiters.
+
+        Args:
+            limit (int): New maximum number of concurrent calls.
+        """
+        if limit < 1:
+            raise ValueError("Admission limit must be at least 1")
+        async with self._cond:
+            raised = limit > self._limit
+            self._limit = limit
+            if raised:
+                self._cond.notify_all()
+        logger.info("%s admission limit set to %s", self.name, limit)
+
+    async def __aenter__(self) -> "AdmissionController":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # shielded so a cancelled caller still returns its slot
+        await asyncio.shield(self.release())
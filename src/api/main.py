@@ -9,7 +9,8 @@ Key functionalities:
 1. Creates a FastAPI app instance.
 2. Mounts the API router defined in `src.api.routes` under the `/api` prefix,
    with the "files" tag for documentation grouping.
-3. Runs the application using Uvicorn when executed as the main program.
+3. Creates the docstore tables and builds the RAG pipeline and MinIO client at startup, so importing the app stays cheap.
+4. Runs the application using Uvicorn when executed as the main program.
 
 Usage:
     Run this module directly to start the server:
@@ -18,11 +19,32 @@ Usage:
 """
 
 
+import asyncio
+import logging
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from src.api.routes import router 
+from src.rag_pipeline import get_pipeline
+from src.builder import get_minio_client, close_http_client, init_docstore
+from src.logger import log_level
 
+# the entrypoint owns logging configuration; library modules only create their loggers
+logging.basicConfig(level=log_level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
-app = FastAPI()
+
+# orjson encodes the large `contexts` payloads considerably faster than the stdlib json module
+app = FastAPI(default_response_class=ORJSONResponse)
+
+@app.on_event("startup")
+async def load_components():
+    await init_docstore()
+    # models and clients are built lazily; pay that cost once before serving requests
+    await asyncio.to_thread(get_pipeline)
+    await asyncio.to_thread(get_minio_client)
+
+@app.on_event("shutdown")
+async def close_clients():
+    await close_http_client()
 
 # mount the router
 app.include_router(router, prefix="/api", tags=["files"])
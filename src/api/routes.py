@@ -13,6 +13,8 @@ Key functionalities:
     - `POST /upload_files/`: Uploads a file, stages it in the database, 
       stores it in MinIO, processes it through the pipeline (splitting,
       embedding, indexing), and commits it to the docstore.
+    - `POST /upload_files/batch/`: Uploads several files through the same pipeline,
+      up to `UPLOAD_CONCURRENCY` at a time, each in its own database session.
     - `DELETE /delete_file/async/{filename}`: Deletes a file from the database 
       and its associated entries in the vector store (Qdrant).
 
@@ -21,12 +23,15 @@ Key functionalities:
       rewriting it, retrieving relevant documents, building context, and 
       generating a streaming response from the LLM pipeline. Supports
       context relevance checking, reranking, and neighbor retrieval.
+    - `POST /generate_response/stream`: The same pipeline, answering as
+      server-sent events forwarded chunk by chunk from the LLM stream.
 
 3. Pydantic Models:
     - `FileInfo`: Represents basic information about a file.
     - `UploadFileResponse`: Returns the status of a file upload along with 
       file info.
     - `FilesResponse`: Returns a count and list of file names for listing endpoints.
+    - `BatchUploadResponse`: Returns the uploaded files and the failures of a batch upload.
 
 4. Dependencies:
     - `SQLAlchemy` for async database sessions and CRUD operations.
@@ -43,39 +48,32 @@ Usage:
 """
 
 import logging
+import asyncio
+import json
 from pydantic import BaseModel
 from fastapi import APIRouter, UploadFile, Depends, HTTPException, File as fastapi_file
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from src.docstore.models import File
 from src.docstore.files_crud import (async_list_all_files, 
                                      async_list_files, 
                                      async_ensure_unique_filenames, 
-                                     async_stage_file_rows, 
+                                     async_ensure_unique_filenames_batch,
                                      async_delete_file_row
                                     )
-from src.docstore.docstore_crud import async_upsert_parents_to_docstore
-from src.docstore.session import get_async_session
-from src.minio_utils import async_upload_file_to_minio, async_download_file
-from src.rag_pipeline import pipeline
-from src.builder import (
-    llm,
-    system_prompt,
-    rewrite_query_prompt,
-    context_relevance_prompt,
-    minio_client,
-    qdrant_store
-    )
+from src.docstore.docstore_crud import async_stage_file_with_parents
+from src.docstore.session import get_async_session, pool_stats
+from src.minio_utils import async_upload_file_to_minio
+from src.rag import RagPipeline
+from src.rag_pipeline import get_pipeline
+from src.builder import get_minio_client, load_prompt
 from src.docstore.session import AsyncSessionLocal
 from src.rag_utils import rewrite_query
-from src.config import MINIO_BUCKET as minio_bucket, TEMP_FILE_DOWNLOAD_DIR as temp_dir, COLLECTION as collection_name
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
+from src.config import MINIO_BUCKET as minio_bucket, COLLECTION as collection_name, REWRITE_QUERY_PROMPT_PATH
+from src.config import CACHE_TOP_K as cache_top_k, RESPONSE_DISTANCE_THRESHOLD as response_distance_threshold
+from src.config import REWRITE_CACHE_TTL as rewrite_cache_ttl
+
 logger = logging.getLogger(__name__)
 
 class FileInfo(BaseModel):
@@ -90,6 +88,17 @@ class FilesResponse(BaseModel):
     count: int
     files: List[str]
 
+class FailedUpload(BaseModel):
+    name: Optional[str]
+    error: str
+
+class BatchUploadResponse(BaseModel):
+    uploaded: List[UploadFileResponse]
+    failed: List[FailedUpload]
+
+# files of one batch upload processed at the same time (MinIO upload, embedding, docstore writes)
+UPLOAD_CONCURRENCY = 16
+
 router = APIRouter()
 
 @router.get("/get_all_files", response_model=FilesResponse)
@@ -119,31 +128,35 @@ async def get_collection_files(session: AsyncSession = Depends(get_async_session
 
 @router.post("/upload_files/", response_model=UploadFileResponse)
 async def upload_files(file: UploadFile = fastapi_file(...), 
-                       session: AsyncSession = Depends(get_async_session)) -> Optional[File]:
+                       session: AsyncSession = Depends(get_async_session),
+                       pipeline: RagPipeline = Depends(get_pipeline)) -> Optional[File]:
+    await async_ensure_unique_filenames(session=session, file=file)
+    return await _ingest_upload(file, session, pipeline)
+
+async def _ingest_upload(file: UploadFile, session: AsyncSession, pipeline: RagPipeline) -> UploadFileResponse:
+    """Store an upload whose name was already checked: MinIO, split and index, docstore rows, commit."""
     try:
-        await async_ensure_unique_filenames(session=session, file=file)
-        minio_meta = await async_upload_file_to_minio(minio_client, file, minio_bucket)
-        logger.debug(f"uploaded {file.filename} to minio")
-        staged_file = await async_stage_file_rows(session=session, minio_metadata=minio_meta)
-        logger.debug(f"Staged {staged_file.name, staged_file.id}")
-        save_file_path = await async_download_file(minio_client=minio_client, object_name=staged_file.name, local_dir=temp_dir, minio_bucket=minio_bucket)
+        minio_meta = await async_upload_file_to_minio(get_minio_client(), file, minio_bucket)
         logger.debug(f"uploaded {file.filename} to minio")
-        texts = pipeline.load(path=save_file_path)
-        parent_chunks, child_chunks = pipeline.split(texts=texts, base_metadata=None)
-        await pipeline.embed_and_index(texts=child_chunks, doc_type="documents")
-        file_id_map = {staged_file.name: staged_file.id}
-        saved = await async_upsert_parents_to_docstore(parent_chunks, session, file_id_map=file_id_map)
-        logger.debug(f"Saved {saved} parents in docstore")
+        file_name = minio_meta["object_name"]
+        # parse from the local upload instead of downloading it back from minio
+        await file.seek(0)
+        content = await file.read()
+        texts = await asyncio.to_thread(pipeline.load_bytes, filename=file_name, content=content)
+        parent_chunks = await pipeline.split_and_index(texts=texts, doc_type="documents", base_metadata=None)
+        # files row and parent chunks in a single statement
+        file_id, saved = await async_stage_file_with_parents(minio_meta, parent_chunks, session)
+        logger.debug(f"Staged {file_name, file_id} with {saved} parents in docstore")
         await session.commit()
-        logger.debug(f"Committed pipeline for file: {staged_file.name}, id: {staged_file.id} to the docstore database")
+        logger.debug(f"Committed pipeline for file: {file_name}, id: {file_id} to the docstore database")
         return UploadFileResponse(
             status="success",
-            file=FileInfo(id=staged_file.id, name=staged_file.name)
+            file=FileInfo(id=file_id, name=file_name)
         )
 
     # catch any known HPPT exceptions
     except HTTPException:
-        session.rollback()
+        await session.rollback()
         raise
     
     except Exception as e:
@@ -151,12 +164,42 @@ async def upload_files(file: UploadFile = fastapi_file(...),
         logger.exception(f"Failed to commit pipeline for file: {getattr(file, 'filename', None)} to the docstore database")
         raise RuntimeError(f"DB commit failed for file {getattr(file, 'filename', None)}: {str(e)}")
 
+@router.post("/upload_files/batch/", response_model=BatchUploadResponse)
+async def upload_files_batch(files: List[UploadFile] = fastapi_file(...),
+                             session: AsyncSession = Depends(get_async_session),
+                             pipeline: RagPipeline = Depends(get_pipeline)) -> BatchUploadResponse:
+    """
+    Upload several files concurrently, overlapping their MinIO uploads, indexing and docstore writes.
+    All names are checked with one query up front; any collision rejects the batch.
+    An AsyncSession cannot be shared between concurrent tasks, so every file gets its own session
+    and commits on its own; one failing file does not roll back the others.
+    """
+    await async_ensure_unique_filenames_batch(session=session, files=files)
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def upload_one(file: UploadFile) -> UploadFileResponse:
+        async with semaphore, AsyncSessionLocal() as file_session:
+            return await _ingest_upload(file, file_session, pipeline)
+
+    results = await asyncio.gather(*(upload_one(file) for file in files), return_exceptions=True)
+    uploaded, failed = [], []
+    for file, result in zip(files, results):
+        if isinstance(result, BaseException):
+            error = result.detail if isinstance(result, HTTPException) else str(result)
+            failed.append(FailedUpload(name=file.filename, error=error))
+        else:
+            uploaded.append(result)
+    logger.debug(f"Batch upload: {len(uploaded)} uploaded, {len(failed)} failed")
+    return BatchUploadResponse(uploaded=uploaded, failed=failed)
+
 @router.delete("/delete_file/async/{filename}")
-async def delete_file(filename: str, session: AsyncSession = Depends(get_async_session)):
+async def delete_file(filename: str, 
+                      session: AsyncSession = Depends(get_async_session),
+                      pipeline: RagPipeline = Depends(get_pipeline)):
     try:
         res = await async_delete_file_row(filename, session, commit=False)
         if res:
-            qdrant_store.delete_points_by_source(collection_name=collection_name, source=filename)
+            await pipeline.vectorstore.async_delete_points_by_source(collection_name=collection_name, source=filename)
             await session.commit()
             logger.debug(f"File '{filename}' and related docstore and vectorstore entries deleted.")
             return {"message": f"File '{filename}' and related docstore and vectorstore entries deleted."}
@@ -166,12 +209,63 @@ async def delete_file(filename: str, session: AsyncSession = Depends(get_async_s
         logger.exception(f"File not deleted. Exception while deleting file {filename}: {e}")
         raise HTTPException(status_code=500, detail=f"Error deleting file: {e}")
 
+@router.get("/debug/pool")
+async def debug_pool():
+    stats = pool_stats()
+    logger.info(f"DB pool: {stats}")
+    return stats
+
+async def _prepare_answer(user_query: str,
+                          pipeline: RagPipeline,
+                          rewrite_query_prompt: Optional[str],
+                          is_rewrite_query: bool,
+                          rerank: bool,
+                          top_k: int,
+                          rerank_top_k: int,
+                          retrieve_neighbors: bool) -> Tuple[Optional[Dict], str, List[Dict], List[str]]:
+    """
+    Cache probe, optional query rewrite and retrieval shared by the generate endpoints.
+
+    Returns:
+        Tuple[Optional[Dict], str, List[Dict], List[str]]: (answer, query, retrieved_docs, context).
+            answer is a finished {"response", "contexts"} dict (cached response or rewrite fallback)
+            when no generation is needed, else None.
+    """
+    # Probe the response cache with the raw query before paying for rewrite, retrieval and generation.
+    # API requests carry no chat history, so the raw query is self-contained and safe to key on.
+    cached = await pipeline.lookup_response(query=user_query,
+                                            top_k=cache_top_k,
+                                            distance_threshold=response_distance_threshold)
+    if cached:
+        logger.debug(f"Serving cached response for: {user_query}")
+        return {"response": cached["response"], "contexts": cached["sources"]}, user_query, [], []
+
+    query = user_query
+    sources = None
+    if is_rewrite_query:
+            query, sources, fallback_response = await rewrite_query(user_query=user_query, 
+                                                                    rewrite_query_prompt=rewrite_query_prompt or load_prompt(REWRITE_QUERY_PROMPT_PATH), 
+                                                                    llm=pipeline.llm,
+                                                                    cache_ttl=rewrite_cache_ttl)
+            logger.debug(f"Actual query: {user_query}\nRewritten query: {query}\n Sources: {sources}")
+            if not query:
+                return {"response": fallback_response, "contexts": []}, user_query, [], []
+
+    # cache lookup runs inside retrieve, concurrently with the dense and sparse query embeddings
+    retrieved_docs = await pipeline.retrieve(query=query, 
+                                        top_k=top_k, 
+                                        rerank=rerank, 
+                                        rerank_top_k=rerank_top_k,
+                                        retrieve_neighbors=retrieve_neighbors,
+                                        sources=sources
+                                        )
+    logger.debug(f"Retrieved {len(retrieved_docs)} docs")
+    return None, query, retrieved_docs, pipeline.build_context(retrieved_docs)
+
 @router.post("/generate_reponse")
 async def generate(user_query: str, 
-                 session: AsyncSession = Depends(get_async_session),
-                 system_prompt: str = system_prompt,
-                 rewrite_query_prompt: str = rewrite_query_prompt,
-                 context_relevance_prompt: str = context_relevance_prompt,
+                 pipeline: RagPipeline = Depends(get_pipeline),
+                 rewrite_query_prompt: Optional[str] = None,
                  context_relevance: bool = True,
                  is_rewrite_query: bool = True,
                  rerank: bool = True,
@@ -182,36 +276,65 @@ async def generate(user_query: str,
     if not user_query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty or whitespace.")
     try:
-        query = user_query
-        if is_rewrite_query:
-                query, sources = await rewrite_query(user_query=user_query, rewrite_query_prompt=rewrite_query_prompt, llm=llm)
-                logger.debug(f"Actual query: {user_query}\nRewritten query: {query}\n Sources: {sources}")
-        # TODO: check cache here before retrieval
-
-        retrieved_docs = await pipeline.retrieve(query=query, 
-                                            top_k=top_k, 
-                                            rerank=rerank, 
-                                            rerank_top_k=rerank_top_k,
-                                            retrieve_neighbors=retrieve_neighbors,
-                                            session=session
-                                            )
-        logger.debug(f"Retrieved {len(retrieved_docs)} docs")
-        context = pipeline.build_context(retrieved_docs)
-        stream, contexts = await pipeline.generate_response(query, context, system_prompt, context_relevance=True, context_relevance_prompt=context_relevance_prompt)
+        answer, query, retrieved_docs, context = await _prepare_answer(user_query, pipeline, rewrite_query_prompt,
+                                                                       is_rewrite_query, rerank, top_k,
+                                                                       rerank_top_k, retrieve_neighbors)
+        if answer is not None:
+            return answer
+        stream = await pipeline.generate_response(query, context, context_relevance=context_relevance)
+        response = "".join([chunk async for chunk in stream])
         logger.debug(f"Response generated successfully")
-        return {"response": stream, "contexts": contexts}
+        await pipeline.cache_response(query=user_query, response=response, sources=retrieved_docs)
+        return {"response": response, "contexts": retrieved_docs}
     except Exception as e:
         logger.debug(f"Failed to generate response: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    
-
-    
-
-
-
-    
 
+def _sse(data: str, event: Optional[str] = None) -> str:
+    """One server-sent event; every line of `data` gets its own "data:" field so newlines survive."""
+    head = f"event: {event}\n" if event else ""
+    return head + "".join(f"data: {line}\n" for line in data.split("\n")) + "\n"
 
+@router.post("/generate_response/stream")
+async def generate_stream(user_query: str, 
+                          pipeline: RagPipeline = Depends(get_pipeline),
+                          rewrite_query_prompt: Optional[str] = None,
+                          context_relevance: bool = True,
+                          is_rewrite_query: bool = True,
+                          rerank: bool = True,
+                          top_k: int = 50,
+                          rerank_top_k: int = 5,
+                          retrieve_neighbors: bool = True
+                          ) -> StreamingResponse:
+    """
+    Same pipeline as `generate`, but the answer is sent as server-sent events while the LLM produces it.
 
+    Each chunk from the LLM stream is forwarded as a "data" event as soon as it arrives, with no
+    intermediate queue; a slow client back-pressures the LLM read instead of growing a buffer.
+    A final "contexts" event carries the retrieved documents as JSON.
+    """
+    if not user_query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty or whitespace.")
+    try:
+        answer, query, retrieved_docs, context = await _prepare_answer(user_query, pipeline, rewrite_query_prompt,
+                                                                       is_rewrite_query, rerank, top_k,
+                                                                       rerank_top_k, retrieve_neighbors)
+    except Exception as e:
+        logger.debug(f"Failed to generate response: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
+    async def events():
+        if answer is not None:
+            yield _sse(answer["response"])
+            yield _sse(json.dumps(answer["contexts"], default=str), event="contexts")
+            return
+        stream = await pipeline.generate_response(query, context, context_relevance=context_relevance)
+        parts = []
+        async for chunk in stream:
+            parts.append(chunk)
+            yield _sse(chunk)
+        yield _sse(json.dumps(retrieved_docs, default=str), event="contexts")
+        # only a response that reached the client in full is cached
+        await pipeline.cache_response(query=user_query, response="".join(parts), sources=retrieved_docs)
 
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
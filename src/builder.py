@@ -5,71 +5,121 @@ This module is responsible for initializing all core components and objects
 required for the Retrieval-Augmented Generation (RAG) pipeline and file 
 management system. It sets up document loaders, chunkers, embedders, vector 
 stores, rerankers, LLMs, and the MinIO storage client.
+
+Components are created lazily by `get_*` factories, each cached with
+`functools.lru_cache`, so nothing heavy is loaded at import time.
 """
-from qdrant_client import QdrantClient, AsyncQdrantClient
+from functools import lru_cache
 from minio import Minio
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+import httpx
+import urllib3
 import logging
 from src.file_loader import FileLoader
 from src.chunker import TextChunker
 from src.embed import DenseEmbedder, SparseEmbedder
 from src.rerank import Rerank
-from src.qdrant_utils import QdrantStore
+from src.qdrant_utils import QdrantStore, get_qdrant_client, get_async_qdrant_client
 from src.llm import LLM
-# from src.docstore.setup import init_db
-from src.db_setup import init_db
+from src.admission import AdmissionController
+from src.db_setup import async_init_db
 from src.docstore.session import AsyncSessionLocal
-from src.cache import RagSemanticCache, RedisClient
+from src.cache import RagSemanticCache, RedisClient, get_connection_pool, get_async_connection_pool
 import src.docstore.models
 import frontend.chainlit_models
 from src.config import *
 from src.logger import logger
 
-# Initialize docstore database
-init_db()
-
-# initialize loader
-loader = FileLoader()
-
-# initialize chunker
-CHILD_CHUNK_SIZE = CHILD_CHUNK_SIZE or MAX_SEQ_LENGTH_EMBEDDING - 30   
-chunker = TextChunker(
-    parent_chunk_size=PARENT_CHUNK_SIZE,
-    parent_chunk_overlap=PARENT_CHUNK_OVERLAP,
-    child_chunk_size=CHILD_CHUNK_SIZE,
-    child_chunk_overlap=CHILD_CHUNK_OVERLAP
-)
-
-# Initialize Dense and Sparse embedders
-dense_embedder = DenseEmbedder(embedding_model_name=DENSE_EMBEDDING_MODEL)
-sparse_embedder = SparseEmbedder(embedding_model_name=SPARSE_EMBEDDING_MODEL)
-
-# Initialize Reranker
-reranker = Rerank(reranking_model=CROSS_ENCODER_MODEL)
-
-# initialize Qdrant clients
-qdrant_client = QdrantClient(
-    url=f"http://{QDRANT_HOST}:{QDRANT_PORT}",
-    # prefer_grpc=True,
-)
-
-async_qdrant_client = AsyncQdrantClient(
-    url=f"http://{QDRANT_HOST}:{QDRANT_PORT}",
-    # prefer_grpc=True,
-)
-
-# Initialize Vector store
-qdrant_store = QdrantStore(
-                        client=qdrant_client,
-                        async_client=async_qdrant_client,
-                        host=QDRANT_HOST,
-                        port=QDRANT_PORT,
-                        collection_name=COLLECTION,
-                        vector_size=dense_embedder.embedding_dim,
-                        distance=DISTANCE,
-                        sparse_modifier=SPARSE_MODIFIER,
-                        dense_vector_name=DENSE_VECTOR_NAME,
-                        sparse_vector_name=SPARSE_VECTOR_NAME
-                        )
+__all__ = [
+    "init_docstore",
+    "get_loader",
+    "get_chunker",
+    "get_dense_embedder",
+    "get_sparse_embedder",
+    "get_reranker",
+    "get_qdrant_store",
+    "get_http_client",
+    "close_http_client",
+    "build_minio_client",
+    "get_minio_client",
+    "get_llm",
+    "get_redis_client",
+    "get_rag_cache",
+    "load_prompt",
+]
+
+# Every component is built on first use and then reused, so importing this module
+# (or anything that imports it) does not load models or open connections.
+
+async def init_docstore() -> None:
+    """Create the docstore and Chainlit tables. Imported models register themselves on `Base`."""
+    await async_init_db()
+
+@lru_cache(maxsize=1)
+def get_loader() -> FileLoader:
+    return FileLoader()
+
+@lru_cache(maxsize=1)
+def get_chunker() -> TextChunker:
+    return TextChunker(
+        parent_chunk_size=PARENT_CHUNK_SIZE,
+        parent_chunk_overlap=PARENT_CHUNK_OVERLAP,
+        child_chunk_size=CHILD_CHUNK_SIZE or MAX_SEQ_LENGTH_EMBEDDING - 30,
+        child_chunk_overlap=CHILD_CHUNK_OVERLAP
+    )
+
+@lru_cache(maxsize=1)
+def get_dense_embedder() -> DenseEmbedder:
+    return DenseEmbedder(embedding_model_name=DENSE_EMBEDDING_MODEL, cache_path=EMBEDDING_CACHE_PATH)
+
+@lru_cache(maxsize=1)
+def get_sparse_embedder() -> SparseEmbedder:
+    return SparseEmbedder(embedding_model_name=SPARSE_EMBEDDING_MODEL, cache_path=EMBEDDING_CACHE_PATH)
+
+@lru_cache(maxsize=1)
+def get_reranker() -> Rerank:
+    return Rerank(reranking_model=CROSS_ENCODER_MODEL)
+
+@lru_cache(maxsize=1)
+def get_qdrant_store() -> QdrantStore:
+    # The sync client is only used at startup (collection creation) and by CLI scripts.
+    # Request handlers use the async client exclusively, over gRPC.
+    qdrant_client = get_qdrant_client(f"http://{QDRANT_HOST}:{QDRANT_PORT}")
+    async_qdrant_client = get_async_qdrant_client(
+        f"http://{QDRANT_HOST}:{QDRANT_PORT}",
+        prefer_grpc=True,
+        grpc_port=QDRANT_GRPC_PORT,
+    )
+    return QdrantStore(
+                    client=qdrant_client,
+                    async_client=async_qdrant_client,
+                    host=QDRANT_HOST,
+                    port=QDRANT_PORT,
+                    collection_name=COLLECTION,
+                    vector_size=get_dense_embedder().embedding_dim,
+                    distance=DISTANCE,
+                    sparse_modifier=SPARSE_MODIFIER,
+                    dense_vector_name=DENSE_VECTOR_NAME,
+                    sparse_vector_name=SPARSE_VECTOR_NAME,
+                    dense_datatype=DENSE_VECTOR_DATATYPE,
+                    dense_on_disk=DENSE_VECTORS_ON_DISK,
+                    admission=AdmissionController(QDRANT_MAX_INFLIGHT, name="qdrant")
+                    )
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide async HTTP connection pool, reused across LLM calls."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, read=120.0),
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+    )
+
+async def close_http_client() -> None:
+    """Close the shared HTTP pool if it was ever created."""
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
 
 # initialize minio client and bucket
 def build_minio_client(minio_bucket:str = MINIO_BUCKET) -> Minio:
@@ -77,47 +127,90 @@ def build_minio_client(minio_bucket:str = MINIO_BUCKET) -> Minio:
         endpoint=MINIO_ENDPOINT,
         access_key=MINIO_ACCESS_KEY,
         secret_key=MINIO_SECRET_KEY,
-        secure=False
+        secure=False,
+        # keep-alive pool sized for concurrent uploads; worker threads share these connections.
+        # block=True makes it a bounded pool: a thread waits for a free connection instead of opening an extra one
+        http_client=urllib3.PoolManager(
+            maxsize=HTTP_MAX_KEEPALIVE,
+            block=True,
+            timeout=urllib3.Timeout(connect=10, read=300),
+            retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+        )
     )
     # Ensure bucket exists
     if not client.bucket_exists(minio_bucket):
         logger.info(f"Creating MinIO bucket {minio_bucket}")
         client.make_bucket(minio_bucket)
     return client
-minio_client = build_minio_client()
-
-# initialize LLM
-llm = LLM(
-    model=MODEL,
-    api_key=API_KEY
-)
-
-# Initialize redis cache client and RAG cache instance
-redis_client = RedisClient(host=REDIS_HOST, port=REDIS_PORT).client
-rag_cache = RagSemanticCache(
-    redis_client=redis_client,
-    embedding_model_name=DENSE_EMBEDDING_MODEL,
-    index_name=INDEX_NAME,
-    redis_url=f"redis://{REDIS_HOST}:{REDIS_PORT}",
-    ttl=CACHE_TTL,
-    prefix=INDEX_NAME,
-    distance_threshold=DISTANCE_THRESHOLD
-)
 
-# Initialize prompts
-with open(SYSTEM_PROMPT_PATH) as f:
-    system_prompt = f.read()
+@lru_cache(maxsize=1)
+def get_minio_client() -> Minio:
+    return build_minio_client()
+
+@lru_cache(maxsize=1)
+def get_llm() -> LLM:
+    redis_url = f"redis://{REDIS_HOST}:{REDIS_PORT}"
+    return LLM(
+        model=MODEL,
+        api_key=API_KEY,
+        http_client=get_http_client(),
+        response_cache=Redis(connection_pool=get_connection_pool(redis_url)) if LLM_CACHE_TTL else None,
+        async_response_cache=AsyncRedis(connection_pool=get_async_connection_pool(redis_url)) if LLM_CACHE_TTL else None,
+        cache_ttl=LLM_CACHE_TTL,
+        admission=AdmissionController(LLM_MAX_INFLIGHT, name="llm")
+    )
 
-with open(REWRITE_QUERY_PROMPT_PATH) as f:
-    rewrite_query_prompt = f.read()
+@lru_cache(maxsize=1)
+def get_redis_client():
+    return RedisClient(host=REDIS_HOST, port=REDIS_PORT).client
+
+@lru_cache(maxsize=1)
+def get_rag_cache() -> RagSemanticCache:
+    return RagSemanticCache(
+        redis_client=get_redis_client(),
+        embedding_model_name=DENSE_EMBEDDING_MODEL,
+        index_name=INDEX_NAME,
+        redis_url=f"redis://{REDIS_HOST}:{REDIS_PORT}",
+        ttl=CACHE_TTL,
+        prefix=INDEX_NAME,
+        distance_threshold=DISTANCE_THRESHOLD,
+        local_cache_size=LOCAL_CACHE_SIZE,
+        quantize=CACHE_QUANTIZE,
+        onnx_file_name=CACHE_ONNX_FILE_NAME
+    )
 
-with open(CONTEXT_RELEVANCE_PROMPT_PATH) as f:
-    context_relevance_prompt = f.read()
+@lru_cache(maxsize=None)
+def load_prompt(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+# Attribute-style access (`from src.builder import llm`) for existing callers;
+# each name resolves to its lazily built singleton.
+_lazy_attributes = {
+    "loader": get_loader,
+    "chunker": get_chunker,
+    "dense_embedder": get_dense_embedder,
+    "sparse_embedder": get_sparse_embedder,
+    "reranker": get_reranker,
+    "qdrant_store": get_qdrant_store,
+    "minio_client": get_minio_client,
+    "llm": get_llm,
+    "redis_client": get_redis_client,
+    "rag_cache": get_rag_cache,
+    "system_prompt": get_system_prompt,
+    "rewrite_query_prompt": lambda: load_prompt(REWRITE_QUERY_PROMPT_PATH),
+    "context_relevance_prompt": lambda: load_prompt(CONTEXT_RELEVANCE_PROMPT_PATH),
+}
+
+def __getattr__(name: str):
+    if name in _lazy_attributes:
+        return _lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
     minio_client = build_minio_client()
     print(minio_client)
-    rag_cache.clear()
+    get_rag_cache().clear()
     print("Cleared the cache")
     
\ No newline at end of file
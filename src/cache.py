@@ -1,8 +1,67 @@
-from typing import Optional
-from redis import Redis
+from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import numpy as np
+from redis import Redis, ConnectionPool
+from redis.asyncio import Redis as AsyncRedis, ConnectionPool as AsyncConnectionPool
 from redisvl.extensions.cache.llm  import SemanticCache
+from redisvl.extensions.cache.llm.base import BaseLLMCache
+from redisvl.extensions.cache.llm.schema import CacheEntry, SemanticCacheIndexSchema
+from redisvl.extensions.constants import (ENTRY_ID_FIELD_NAME, CACHE_VECTOR_FIELD_NAME, REDIS_KEY_FIELD_NAME,
+                                          PROMPT_FIELD_NAME, RESPONSE_FIELD_NAME, INSERTED_AT_FIELD_NAME,
+                                          UPDATED_AT_FIELD_NAME, METADATA_FIELD_NAME)
+from redisvl.index import SearchIndex
+from redisvl.query import VectorRangeQuery
 from redisvl.utils.vectorize import HFTextVectorizer
 
+logger = logging.getLogger(__name__)
+
+# One connection pool per Redis URL, shared by every client in the process
+_POOLS: Dict[str, ConnectionPool] = {}
+
+def get_connection_pool(redis_url: str, max_connections: int = 32) -> ConnectionPool:
+    """
+    Return the process-wide connection pool for `redis_url`, creating it on first use.
+
+    Args:
+        redis_url (str): Redis connection URL.
+        max_connections (int): Upper bound on open connections in the pool. Defaults to 32.
+
+    Returns:
+        ConnectionPool: Pool whose warmed sockets are reused across clients.
+    """
+    pool = _POOLS.get(redis_url)
+    if pool is None:
+        pool = _POOLS.setdefault(redis_url, ConnectionPool.from_url(
+            redis_url,
+            max_connections=max_connections,
+            socket_keepalive=True,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+            health_check_interval=30
+        ))
+    return pool
+
+_ASYNC_POOLS: Dict[str, AsyncConnectionPool] = {}
+
+def get_async_connection_pool(redis_url: str, max_connections: int = 32) -> AsyncConnectionPool:
+    """Async counterpart of `get_connection_pool`; connections are opened lazily on the running loop."""
+    pool = _ASYNC_POOLS.get(redis_url)
+    if pool is None:
+        pool = _ASYNC_POOLS.setdefault(redis_url, AsyncConnectionPool.from_url(
+            redis_url,
+            max_connections=max_connections,
+            socket_keepalive=True,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+            health_check_interval=30
+        ))
+    return pool
+
 class RedisClient:
     """
     Simple wrapper for a Redis client with configurable connection parameters.
@@ -22,26 +81,249 @@ class RedisClient:
             host (str): Redis server hostname. Defaults to "localhost".
             port (int): Redis server port. Defaults to 6379.
         """
-        self.client = Redis(
-            host=host,
-            port=port,
-            decode_responses=False,
-            socket_timeout=5,
-            socket_connect_timeout=5,
-            health_check_interval=30
-        )
+        self.client = Redis(connection_pool=get_connection_pool(f"redis://{host}:{port}"))
+
+class LocalVectorIndex:
+    """
+    Bounded in-process index of recently cached prompt embeddings.
+
+    Acts as a first-level cache in front of Redis. Vectors are L2-normalized and kept
+    in a preallocated matrix, so a lookup is a single matrix-vector product with no
+    network round trip. Entries are evicted in least-recently-used order and expire
+    after `ttl` seconds. Redis remains the shared source of truth across workers.
+
+    Attributes:
+        max_entries (int): Maximum number of entries held in memory.
+        ttl (int, optional): Time-to-live (seconds) for entries. None = no expiration.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._bank = None                          # (max_entries, dim) float32, allocated on first add
+        self._scores = np.empty(max_entries, dtype=np.float32)
+        self._mask = np.full(max_entries, -np.inf, dtype=np.float32)  # 0 for live slots, -inf for free ones
+        self._high_water = 0                       # slots at or above this index have never been used
+        self._entries = OrderedDict()              # prompt -> (slot, expires_at, result)
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm != 0 else vector
+
+    def _evict(self, key: str) -> None:
+        slot, _, _ = self._entries.pop(key)
+        self._mask[slot] = -np.inf
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+
+    def add(self, prompt: str, vector, result: Dict[str, Any]) -> None:
+        """
+        Add or replace an entry.
+
+        Args:
+            prompt (str): The cached prompt, used as the entry key.
+            vector (array-like): Embedding of the prompt.
+            result (dict): Cache result to return on a hit ("prompt", "response", "metadata").
+        """
+        vector = self._normalize(vector)
+        if self._bank is None:
+            self._bank = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+        if prompt in self._entries:
+            self._evict(prompt)
+        elif not self._free_slots:
+            self._evict(next(iter(self._entries)))  # least recently used
+
+        slot = self._free_slots.pop()
+        self._bank[slot] = vector
+        self._mask[slot] = 0.0
+        self._high_water = max(self._high_water, slot + 1)
+        self._slot_keys[slot] = prompt
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[prompt] = (slot, expires_at, result)
+
+    def search(self, vector, top_k: int = 1, distance_threshold: float = 0.2) -> List[Dict[str, Any]]:
+        """
+        Return up to top_k entries within the cosine distance threshold, closest first.
+
+        Args:
+            vector (array-like): Embedding of the query prompt.
+            top_k (int): Maximum number of results. Defaults to 1.
+            distance_threshold (float): Maximum cosine distance for a hit.
+
+        Returns:
+            list: Result dicts with an added "vector_distance" key. Empty on miss.
+        """
+        if not self._entries:
+            return []
+        # Score only the occupied prefix of the bank, in place: no per-lookup allocations
+        # beyond the query vector itself. Free slots are pushed to -inf by the mask.
+        n = self._high_water
+        scores = self._scores[:n]
+        np.matmul(self._bank[:n], self._normalize(vector), out=scores)
+        scores += self._mask[:n]
+        k = min(top_k, len(self._entries))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        now = time.monotonic()
+        results = []
+        for slot in candidates:
+            distance = 1.0 - float(scores[slot])
+            if distance > distance_threshold:
+                break
+            key = self._slot_keys[slot]
+            _, expires_at, result = self._entries[key]
+            if expires_at is not None and expires_at < now:
+                self._evict(key)
+                continue
+            self._entries.move_to_end(key)
+            results.append({**result, "vector_distance": distance})
+        return results
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        for key in list(self._entries):
+            self._evict(key)
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._high_water = 0
+
+class QuantizedHFTextVectorizer(HFTextVectorizer):
+    """
+    HFTextVectorizer that emits int8 embeddings for an INT8 Redis vector field.
+
+    Each vector is scaled symmetrically by its own max magnitude onto [-127, 127].
+    Per-vector scaling changes only the norm, so cosine distances (the cache's metric)
+    are preserved up to rounding error while vector memory shrinks 4x versus float32.
+    """
+    @staticmethod
+    def quantize(vector) -> List[int]:
+        vector = np.asarray(vector, dtype=np.float32)
+        scale = float(np.abs(vector).max()) or 1.0
+        return np.clip(np.round(vector / scale * 127), -128, 127).astype(np.int8).tolist()
+
+    def _embed(self, text: str, **kwargs) -> List[int]:
+        return self.quantize(super()._embed(text, **kwargs))
+
+    def _embed_many(self, texts: List[str], batch_size: int = 10, **kwargs) -> List[List[int]]:
+        return [self.quantize(v) for v in super()._embed_many(texts, batch_size=batch_size, **kwargs)]
+
+def build_vectorizer(model: str, quantize: bool = False, onnx_file_name: Optional[str] = None) -> HFTextVectorizer:
+    """
+    Build the cache's prompt vectorizer, preferring a quantized ONNX Runtime graph on CPU.
+
+    With `onnx_file_name` set, sentence-transformers loads that ONNX file from the model repo
+    (e.g. "onnx/model_qint8_avx512_vnni.onnx", the dynamically int8-quantized export that uses
+    VNNI int8 dot products on x86) instead of running the PyTorch fp32 weights. If the ONNX
+    backend or file is unavailable the PyTorch model is used.
+
+    Args:
+        model (str): HuggingFace sentence-transformers model name.
+        quantize (bool): Emit int8 vectors for an INT8 Redis vector field.
+        onnx_file_name (str, optional): ONNX file inside the model repo. None or "" disables ONNX.
+    Returns:
+        HFTextVectorizer: The vectorizer.
+    """
+    cls, dtype = (QuantizedHFTextVectorizer, "int8") if quantize else (HFTextVectorizer, "float32")
+    if onnx_file_name:
+        try:
+            return cls(model=model, dtype=dtype, backend="onnx", model_kwargs={"file_name": onnx_file_name})
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable for {model} ({onnx_file_name}), using PyTorch: {e}")
+    return cls(model=model, dtype=dtype)
+
+# (redis_url, index_name, dims, dtype) -> monotonic time the index was last confirmed to exist with that schema
+_INDEX_READY: Dict[tuple, float] = {}
+
+class PrevalidatedSemanticCache(SemanticCache):
+    """
+    SemanticCache for an index this process has recently confirmed exists with the same schema.
+
+    Sets up the same state as SemanticCache.__init__ but skips its FT._LIST / FT.INFO /
+    FT.CREATE round trips.
+    """
+    def __init__(self, name: str, distance_threshold: float, ttl: Optional[int],
+                 vectorizer: HFTextVectorizer, redis_client: Redis):
+        BaseLLMCache.__init__(self, name=name, ttl=ttl, redis_client=redis_client)
+        self._vectorizer = vectorizer
+        self.set_threshold(distance_threshold)
+        self.return_fields = [
+            ENTRY_ID_FIELD_NAME,
+            PROMPT_FIELD_NAME,
+            RESPONSE_FIELD_NAME,
+            INSERTED_AT_FIELD_NAME,
+            UPDATED_AT_FIELD_NAME,
+            METADATA_FIELD_NAME,
+        ]
+        schema = SemanticCacheIndexSchema.from_params(name, name, vectorizer.dims, vectorizer.dtype)
+        self._index = SearchIndex(schema=schema, redis_client=self._redis_client)
+        self._aindex = None
+        self.overwrite = False
+
+class LookupCoalescer:
+    """
+    Auto-pipelines concurrent async cache lookups.
+
+    Lookups submitted during one event-loop iteration are flushed together on the next
+    one (`loop.call_soon`), so N concurrent `alookup` misses cost one pipelined batch
+    of KNN queries instead of N round trips.
+
+    Attributes:
+        lookup_fn: Coroutine function `(vectors, top_k, distance_threshold) -> List[results]`.
+    """
+    def __init__(self, lookup_fn):
+        self.lookup_fn = lookup_fn
+        self._pending: List[tuple] = []
+        self._scheduled = False
+        self._running = set()   # strong references to in-flight flush tasks
+
+    async def submit(self, vector, top_k: int, distance_threshold: Optional[float]):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((vector, top_k, distance_threshold, future))
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        self._scheduled = False
+        pending, self._pending = self._pending, []
+        groups: Dict[tuple, list] = {}
+        for vector, top_k, distance_threshold, future in pending:
+            groups.setdefault((top_k, distance_threshold), []).append((vector, future))
+        for (top_k, distance_threshold), items in groups.items():
+            task = asyncio.ensure_future(self._run(items, top_k, distance_threshold))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, items: list, top_k: int, distance_threshold: Optional[float]) -> None:
+        try:
+            results = await self.lookup_fn([vector for vector, _ in items], top_k, distance_threshold)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
 
 class RagSemanticCache:
     """
     Wrapper around RedisVL SemanticCache for use in RAG pipelines.
 
     Provides synchronous and asynchronous methods for storing and retrieving
-    semantically similar query-response pairs in Redis.
+    semantically similar query-response pairs in Redis. Recent entries are also
+    kept in an in-process `LocalVectorIndex`, which is checked before Redis.
 
     Attributes:
         client (Redis): Redis client used by the cache.
-        vectorizer (HFTextVectorizer): Embedding model for queries.
-        cache (SemanticCache): RedisVL SemanticCache instance.
+        vectorizer (HFTextVectorizer): Embedding model for queries, loaded on first use.
+        cache (SemanticCache): RedisVL SemanticCache instance, built on first use.
+        local_index (LocalVectorIndex): In-process first-level index of recent entries.
     """
     def __init__(
             self,
@@ -51,7 +333,12 @@ class RagSemanticCache:
             redis_url: str = "redis://localhost:6379",
             ttl: Optional[int] = None,
             prefix: Optional[str] = "llmcache",
-            distance_threshold: int = 0.2
+            distance_threshold: int = 0.2,
+            local_cache_size: int = 1024,
+            quantize: bool = False,
+            onnx_file_name: Optional[str] = None,
+            embedding_cache_size: int = 10_000,
+            index_ready_ttl: float = 300
             ):
         """
         Initialize the RAG semantic cache.
@@ -64,46 +351,159 @@ class RagSemanticCache:
             ttl (int, optional): Default time-to-live (seconds) for cache entries. None = no expiration.
             prefix (str, optional): Prefix for Redis keys. Defaults to "llmcache".
             distance_threshold (float): Cosine distance threshold for semantic similarity. Defaults to 0.2.
+            local_cache_size (int): Number of recent entries kept in the in-process index. Defaults to 1024.
+            quantize (bool): Store prompt vectors as int8 instead of float32. INT8 vector fields need Redis 8+,
+                and an existing index created with the other datatype must be deleted before switching. Defaults to False.
+            onnx_file_name (str, optional): Quantized ONNX file in the model repo used for prompt embeddings
+                on ONNX Runtime. None runs the PyTorch model. Defaults to None.
+            embedding_cache_size (int): Number of prompt embeddings memoized in-process, keyed by prompt hash,
+                so repeated prompts are not re-encoded. 0 disables it. Defaults to 10000.
+            index_ready_ttl (float): Seconds during which another instance for the same Redis URL and index skips
+                the index existence/schema checks and creation. Defaults to 300.
         
             Attributes:
                 client (Redis): The underlying Redis client instance.
-                vectorizer (HFTextVectorizer): The embedding model for queries.
-                cache (SemanticCache): The RedisVL SemanticCache instance.
+                vectorizer (HFTextVectorizer): The embedding model for queries, loaded on first use.
+                cache (SemanticCache): The RedisVL SemanticCache instance, built on first use.
+                local_index (LocalVectorIndex): In-process first-level index of recent entries.
         
         """
-        self.client = redis_client or Redis.from_url(redis_url)
-        self.vectorizer = HFTextVectorizer(model=embedding_model_name)
-        self.cache = SemanticCache(
-            name=index_name,
-            vectorizer=self.vectorizer,
-            redis_client=self.client,
-            ttl=ttl,
-            distance_threshold=distance_threshold,
-            prefix=prefix
-        )
+        self.client = redis_client or Redis(connection_pool=get_connection_pool(redis_url))
+        # the embedding model and the RedisVL cache are built on first use, so workers that
+        # never touch the cache do not pay for the model load
+        self._embedding_model_name = embedding_model_name
+        self._quantize = quantize
+        self._onnx_file_name = onnx_file_name
+        self._index_name = index_name
+        self._redis_url = redis_url
+        self._ttl = ttl
+        self._prefix = prefix
+        self._index_ready_ttl = index_ready_ttl
+        self._vectorizer: Optional[HFTextVectorizer] = None
+        self._cache: Optional[SemanticCache] = None
+        self._init_lock = threading.RLock()
+        self.lookup_coalescer = LookupCoalescer(self._aremote_lookup)
+        self.distance_threshold = distance_threshold
+        self.local_index = LocalVectorIndex(max_entries=local_cache_size, ttl=ttl)
+        # bounded LRU of prompt embeddings; sync lookups may run in worker threads
+        self._embedding_cache: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._embedding_cache_size = embedding_cache_size
+        self._embedding_cache_lock = threading.Lock()
+
+    @property
+    def vectorizer(self) -> HFTextVectorizer:
+        """Prompt embedding model, loaded on first access."""
+        if self._vectorizer is None:
+            with self._init_lock:
+                if self._vectorizer is None:
+                    self._vectorizer = build_vectorizer(self._embedding_model_name,
+                                                        quantize=self._quantize,
+                                                        onnx_file_name=self._onnx_file_name)
+        return self._vectorizer
+
+    @property
+    def cache(self) -> SemanticCache:
+        """RedisVL SemanticCache, built (with its index checks) on first access."""
+        if self._cache is None:
+            with self._init_lock:
+                if self._cache is None:
+                    self._cache = self._build_cache()
+        return self._cache
+
+    def _build_cache(self) -> SemanticCache:
+        self._index_key = (self._redis_url, self._index_name, self.vectorizer.dims, self.vectorizer.dtype)
+        if time.monotonic() - _INDEX_READY.get(self._index_key, float("-inf")) < self._index_ready_ttl:
+            cache = PrevalidatedSemanticCache(
+                name=self._index_name,
+                distance_threshold=self.distance_threshold,
+                ttl=self._ttl,
+                vectorizer=self.vectorizer,
+                redis_client=self.client
+            )
+        else:
+            cache = SemanticCache(
+                name=self._index_name,
+                vectorizer=self.vectorizer,
+                redis_client=self.client,
+                ttl=self._ttl,
+                distance_threshold=self.distance_threshold,
+                prefix=self._prefix
+            )
+            _INDEX_READY[self._index_key] = time.monotonic()
+        # SemanticCache does not accept an async client directly; give it one backed by the shared async pool
+        cache._async_redis_client = AsyncRedis(connection_pool=get_async_connection_pool(self._redis_url))
+        return cache
+
+    def _embed(self, prompt: str):
+        """Embed a prompt, reusing the vector of an identical recent prompt."""
+        key = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+        with self._embedding_cache_lock:
+            vector = self._embedding_cache.get(key)
+            if vector is not None:
+                self._embedding_cache.move_to_end(key)
+                return vector
+        vector = self.vectorizer.embed(prompt)
+        if self._embedding_cache_size > 0:
+            with self._embedding_cache_lock:
+                self._embedding_cache[key] = vector
+                if len(self._embedding_cache) > self._embedding_cache_size:
+                    self._embedding_cache.popitem(last=False)
+        return vector
+
+    async def _aembed(self, prompt: str):
+        """Async `_embed`: a memoized vector is returned without a thread hop."""
+        key = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+        with self._embedding_cache_lock:
+            vector = self._embedding_cache.get(key)
+            if vector is not None:
+                self._embedding_cache.move_to_end(key)
+                return vector
+        return await asyncio.to_thread(self._embed, prompt)
     
     def lookup(self,
                prompt: str,
-               top_k: int = 1
-               
+               top_k: int = 1,
+               distance_threshold: Optional[float] = None,
+               require_response: bool = False,
+               namespace: Optional[str] = None
     ):
         """
         Retrieve semantically similar cached responses for a query.
 
+        For top_k=1 the entry stored under this exact prompt is fetched first by its
+        deterministic key, skipping the embedding and the KNN search. Otherwise the
+        prompt is embedded once; the in-process index (entries stored by this
+        process) is checked first and Redis is only queried, with the precomputed
+        vector, on a local miss.
+
         Args:
             prompt (str): User query or prompt.
             top_k (int): Number of nearest neighbors to return. Defaults to 1.
+            distance_threshold (float, optional): Override the cache's cosine distance threshold for this lookup.
+            require_response (bool): Only return entries with a non-empty response, skipping retrieval-only
+                entries (stored with response=""). An exact hit without a response falls through to the
+                semantic search. Defaults to False.
+            namespace (str, optional): Namespace of the exact-key probe; see `store`. The semantic
+                search is not restricted to it. Defaults to None.
 
         Returns:
             list or None: List of cached results if found, otherwise None.
         """
-        results = self.cache.check(prompt, num_results=top_k)
-        return results if results else None
+        if top_k == 1:
+            exact = self._exact_lookup(prompt, namespace)
+            if self._usable(exact, require_response):
+                return exact
+        vector = self._embed(prompt)
+        results = self._local_lookup(vector, top_k, distance_threshold)
+        if not results:
+            results = self.cache.check(vector=vector, num_results=top_k, distance_threshold=distance_threshold)
+        return self._with_response(results, require_response) or None
     
     def store(self,
               prompt: str,
               response: str = None,
-              metadata: dict = None      
+              metadata: dict = None,
+              namespace: Optional[str] = None
     ):
         """
         Store a query-response pair in the cache.
@@ -112,27 +512,51 @@ class RagSemanticCache:
             prompt (str): The query or prompt string.
             response (str, optional): The response to cache.
             metadata (dict, optional): Optional metadata to store with the entry.
+            namespace (str, optional): Keeps this entry under its own key, so e.g. a retrieval-only entry
+                and a response for the same prompt do not overwrite each other. Defaults to None.
         """
+        vector = self._embed(prompt)
         self.cache.store(
             prompt=prompt,
             response=response,
-            metadata=metadata or {}
+            vector=vector,
+            metadata=metadata or {},
+            filters=self._namespace_filters(namespace)
         )
+        self.local_index.add(self._local_key(prompt, namespace), vector,
+                             {"prompt": prompt, "response": response, "metadata": metadata or {}})
 
-    async def alookup(self, prompt: str, top_k: int = 1):
+    async def alookup(self,
+                      prompt: str,
+                      top_k: int = 1,
+                      distance_threshold: Optional[float] = None,
+                      require_response: bool = False,
+                      namespace: Optional[str] = None):
         """
         Asynchronously retrieve semantically similar cached responses.
 
         Args:
             prompt (str): User query or prompt.
             top_k (int): Number of nearest neighbors to return. Defaults to 1.
+            distance_threshold (float, optional): Override the cache's cosine distance threshold for this lookup.
+            require_response (bool): Only return entries with a non-empty response; see `lookup`. Defaults to False.
+            namespace (str, optional): Namespace of the exact-key probe; see `lookup`. Defaults to None.
 
         Returns:
             list or None: List of cached results if found, otherwise None.
         """
-        return await self.cache.acheck(prompt, num_results=top_k)
+        if top_k == 1:
+            exact = await self._aexact_lookup(prompt, namespace)
+            if self._usable(exact, require_response):
+                return exact
+        vector = await self._aembed(prompt)
+        results = self._local_lookup(vector, top_k, distance_threshold)
+        if not results:
+            # concurrent misses are coalesced into one pipelined Redis batch
+            results = await self.lookup_coalescer.submit(vector, top_k, distance_threshold)
+        return self._with_response(results, require_response) or None
 
-    async def astore(self, prompt: str, response: str, metadata: dict = None):
+    async def astore(self, prompt: str, response: str, metadata: dict = None, namespace: Optional[str] = None):
         """
         Asynchronously store a query-response pair in the cache.
 
@@ -140,16 +564,232 @@ class RagSemanticCache:
             prompt (str): The query or prompt string.
             response (str): The response to cache.
             metadata (dict, optional): Optional metadata to store with the entry.
+            namespace (str, optional): Keeps this entry under its own key; see `store`. Defaults to None.
+        """
+        vector = await self._aembed(prompt)
+        await self.cache.astore(prompt=prompt, response=response, vector=vector, metadata=metadata or {},
+                                filters=self._namespace_filters(namespace))
+        self.local_index.add(self._local_key(prompt, namespace), vector,
+                             {"prompt": prompt, "response": response, "metadata": metadata or {}})
+
+    def store_many(self,
+                   prompts: List[str],
+                   responses: List[str],
+                   metadatas: Optional[List[dict]] = None,
+                   batch_size: int = 64
+    ):
+        """
+        Store many query-response pairs, embedding all prompts in batched forward passes.
+        All entries are written to Redis in a single pipelined load (HSET + EXPIRE per entry).
+
+        Args:
+            prompts (List[str]): Query or prompt strings.
+            responses (List[str]): Responses to cache, aligned with prompts.
+            metadatas (List[dict], optional): Metadata per entry, aligned with prompts.
+            batch_size (int): Number of prompts per embedding batch. Defaults to 64.
+        """
+        metadatas = metadatas or [None] * len(prompts)
+        if not (len(prompts) == len(responses) == len(metadatas)):
+            raise ValueError("prompts, responses and metadatas must have the same length")
+        vectors = self.vectorizer.embed_many(prompts, batch_size=batch_size)
+        records = self._cache_records(prompts, responses, vectors, metadatas)
+        self.cache._index.load(data=records, ttl=self.cache._ttl, id_field=ENTRY_ID_FIELD_NAME)
+        for prompt, response, vector, metadata in zip(prompts, responses, vectors, metadatas):
+            self.local_index.add(prompt, vector, {"prompt": prompt, "response": response, "metadata": metadata or {}})
+
+    def lookup_many(self,
+                    prompts: List[str],
+                    top_k: int = 1,
+                    distance_threshold: Optional[float] = None,
+                    batch_size: int = 64
+    ) -> List[Optional[list]]:
         """
-        await self.cache.astore(prompt=prompt, response=response, metadata=metadata or {})
+        Look up many prompts, embedding them in batched forward passes.
+        Prompts missing from the in-process index are searched in Redis with one
+        pipelined batch of KNN range queries instead of one round trip each.
+
+        Args:
+            prompts (List[str]): User queries or prompts.
+            top_k (int): Number of nearest neighbors to return per prompt. Defaults to 1.
+            distance_threshold (float, optional): Override the cache's cosine distance threshold.
+            batch_size (int): Number of prompts per embedding batch. Defaults to 64.
+
+        Returns:
+            list: One entry per prompt: the list of cached results, or None on a miss.
+        """
+        vectors = self.vectorizer.embed_many(prompts, batch_size=batch_size)
+        local_hits = [self._local_lookup(vector, top_k, distance_threshold) for vector in vectors]
+        misses = [vector for vector, hits in zip(vectors, local_hits) if not hits]
+        remote_hits = []
+        if misses:
+            queries = self._range_queries(misses, top_k, distance_threshold)
+            raw_results = self.cache._index.batch_query(queries, batch_size=len(queries))
+            remote_hits = self._process_batch_results(raw_results)
+            keys = [hit[REDIS_KEY_FIELD_NAME] for hits in remote_hits for hit in hits]
+            if keys and self.cache._ttl:
+                # refresh TTLs of every hit in one round trip
+                with self.client.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.expire(key, self.cache._ttl)
+                    pipe.execute()
+        remote_iter = iter(remote_hits)
+        return [(hits or next(remote_iter)) or None for hits in local_hits]
+
+    async def astore_many(self,
+                          prompts: List[str],
+                          responses: List[str],
+                          metadatas: Optional[List[dict]] = None,
+                          batch_size: int = 64
+    ):
+        """
+        Asynchronously store many query-response pairs; see `store_many`.
+        Embedding runs in a worker thread and the Redis writes go out in one pipeline.
+        """
+        metadatas = metadatas or [None] * len(prompts)
+        if not (len(prompts) == len(responses) == len(metadatas)):
+            raise ValueError("prompts, responses and metadatas must have the same length")
+        vectors = await asyncio.to_thread(self.vectorizer.embed_many, prompts, batch_size=batch_size)
+        records = self._cache_records(prompts, responses, vectors, metadatas)
+        aindex = await self.cache._get_async_index()
+        await aindex.load(data=records, ttl=self.cache._ttl, id_field=ENTRY_ID_FIELD_NAME)
+        for prompt, response, vector, metadata in zip(prompts, responses, vectors, metadatas):
+            self.local_index.add(prompt, vector, {"prompt": prompt, "response": response, "metadata": metadata or {}})
+
+    async def alookup_many(self,
+                           prompts: List[str],
+                           top_k: int = 1,
+                           distance_threshold: Optional[float] = None,
+                           batch_size: int = 64
+    ) -> List[Optional[list]]:
+        """
+        Asynchronously look up many prompts; see `lookup_many`.
+        Embedding runs in a worker thread and the KNN queries for local misses go out in one pipeline.
+        """
+        vectors = await asyncio.to_thread(self.vectorizer.embed_many, prompts, batch_size=batch_size)
+        local_hits = [self._local_lookup(vector, top_k, distance_threshold) for vector in vectors]
+        misses = [vector for vector, hits in zip(vectors, local_hits) if not hits]
+        remote_hits = await self._aremote_lookup(misses, top_k, distance_threshold) if misses else []
+        remote_iter = iter(remote_hits)
+        return [(hits or next(remote_iter)) or None for hits in local_hits]
+
+    async def _aremote_lookup(self, vectors, top_k: int, distance_threshold: Optional[float]) -> List[List[Dict[str, Any]]]:
+        """Run pipelined KNN range queries on the async index and refresh TTLs of the hits."""
+        queries = self._range_queries(vectors, top_k, distance_threshold)
+        aindex = await self.cache._get_async_index()
+        raw_results = await aindex.batch_query(queries, batch_size=len(queries))
+        remote_hits = self._process_batch_results(raw_results)
+        await asyncio.gather(*(self.cache.aexpire(hit[REDIS_KEY_FIELD_NAME]) for hits in remote_hits for hit in hits))
+        return remote_hits
+
+    def _range_queries(self, vectors, top_k: int, distance_threshold: Optional[float]) -> List[VectorRangeQuery]:
+        """Build the range queries SemanticCache.check would run, for both the sync and async paths.
+
+        The threshold is a raw cosine distance, as in SemanticCache.check. Setting
+        normalize_vector_distance (as SemanticCache.acheck does) would rescale it to 2 - 2t,
+        turning 0.15 into 1.7 and letting almost any prompt hit. The vectorizer dtype is
+        always passed; SemanticCache.acheck omits it and would serialize int8 probe vectors as float32.
+        """
+        threshold = self.distance_threshold if distance_threshold is None else distance_threshold
+        return [
+            VectorRangeQuery(
+                vector=vector,
+                vector_field_name=CACHE_VECTOR_FIELD_NAME,
+                return_fields=self.cache.return_fields,
+                distance_threshold=threshold,
+                num_results=top_k,
+                return_score=True,
+                dtype=self.vectorizer.dtype,
+            )
+            for vector in vectors
+        ]
+
+    def _process_batch_results(self, raw_results: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """Convert raw per-query search results into cache hits, as SemanticCache.check returns them."""
+        return [self.cache._process_cache_results(results)[1] for results in raw_results]
+
+    def _cache_records(self, prompts, responses, vectors, metadatas) -> List[Dict[str, Any]]:
+        """Build Redis hash records exactly as SemanticCache.store would, for a pipelined bulk load."""
+        return [
+            CacheEntry(
+                entry_id=self.cache._make_entry_id(prompt, None),
+                prompt=prompt,
+                response=response,
+                prompt_vector=vector,
+                metadata=metadata or {},
+            ).to_dict(self.vectorizer.dtype)
+            for prompt, response, vector, metadata in zip(prompts, responses, vectors, metadatas)
+        ]
+
+    @staticmethod
+    def _namespace_filters(namespace: Optional[str]) -> Optional[Dict[str, str]]:
+        """SemanticCache filters for a namespace; they are hashed into the entry id and stored as an extra hash field."""
+        return {"namespace": namespace} if namespace else None
+
+    @staticmethod
+    def _local_key(prompt: str, namespace: Optional[str]) -> str:
+        """In-process index key of an entry, namespaced like its Redis key."""
+        return f"{namespace}:{prompt}" if namespace else prompt
+
+    def _exact_key(self, prompt: str, namespace: Optional[str] = None) -> str:
+        """Redis key SemanticCache.store uses for this prompt (entry ids are a hash of the prompt and namespace)."""
+        return self.cache._index.key(self.cache._make_entry_id(prompt, self._namespace_filters(namespace)))
+
+    def _exact_hit(self, key: str, values: list) -> Optional[List[Dict[str, Any]]]:
+        """Turn HMGET values of `return_fields` into a zero-distance hit shaped like SemanticCache.check results."""
+        if values[0] is None:
+            return None
+        fields = {
+            name: value.decode("utf-8") if isinstance(value, bytes) else value
+            for name, value in zip(self.cache.return_fields, values)
+            if value is not None
+        }
+        return self.cache._process_cache_results([{"id": key, "vector_distance": 0.0, **fields}])[1]
+
+    def _exact_lookup(self, prompt: str, namespace: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Fetch the entry stored under exactly this prompt, refreshing its TTL on a hit."""
+        key = self._exact_key(prompt, namespace)
+        hit = self._exact_hit(key, self.client.hmget(key, self.cache.return_fields))
+        if hit:
+            self.cache.expire(key)
+        return hit
+
+    async def _aexact_lookup(self, prompt: str, namespace: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Async `_exact_lookup` over the shared async pool."""
+        if self._cache is None:
+            # first use loads the embedding model; keep that off the event loop
+            await asyncio.to_thread(getattr, self, "cache")
+        key = self._exact_key(prompt, namespace)
+        hit = self._exact_hit(key, await self.cache._async_redis_client.hmget(key, self.cache.return_fields))
+        if hit:
+            await self.cache.aexpire(key)
+        return hit
+
+    @staticmethod
+    def _usable(hits: Optional[List[Dict[str, Any]]], require_response: bool) -> bool:
+        """Whether an exact-key hit answers the lookup; retrieval-only entries have an empty response."""
+        return bool(hits) and (not require_response or bool(hits[0].get("response")))
+
+    @staticmethod
+    def _with_response(hits: Optional[List[Dict[str, Any]]], require_response: bool) -> Optional[List[Dict[str, Any]]]:
+        """Drop retrieval-only entries from semantic hits when the caller needs a response."""
+        if not hits or not require_response:
+            return hits
+        return [hit for hit in hits if hit.get("response")]
+
+    def _local_lookup(self, vector, top_k: int, distance_threshold: Optional[float]) -> list:
+        threshold = self.distance_threshold if distance_threshold is None else distance_threshold
+        return self.local_index.search(vector, top_k=top_k, distance_threshold=threshold)
 
     def clear(self):
         """Clear all entries in the cache while keeping the index structure intact."""
         self.cache.clear()
+        self.local_index.clear()
     
     def delete(self):
         """Completely delete the cache index and all stored data."""
         self.cache.delete()
+        _INDEX_READY.pop(self._index_key, None)
+        self.local_index.clear()
 
     def set_threshold(self, threshold: float):
         """
@@ -159,6 +799,7 @@ class RagSemanticCache:
             threshold (float): New cosine distance threshold.
         """
         self.cache.set_threshold(threshold)
+        self.distance_threshold = threshold
     
     def set_ttl(self, ttl: int):
         """
@@ -167,7 +808,9 @@ class RagSemanticCache:
         Args:
             ttl (int): Time-to-live in seconds.
         """
+        self._ttl = ttl
         self.cache.set_ttl(ttl)
+        self.local_index.ttl = ttl
 
 
 # --- IGNORE ---
@@ -1,7 +1,141 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from collections import ChainMap
+from dataclasses import dataclass
+import asyncio
+import re
+import numpy as np
 import uuid
+from functools import lru_cache
 from src.config import MAX_SEQ_LENGTH_EMBEDDING
+from src.process_pool import get_process_pool
+
+@dataclass(slots=True)
+class ChunkBatch:
+    """
+    Column-wise (structure-of-arrays) batch of child chunks.
+
+    Embedding only needs `texts`, so it is handed over as-is instead of being re-extracted
+    from a list of dicts. `parent_metadata` holds one shared dict per parent, referenced by
+    each of its children, not one copy per child.
+    """
+    texts: List[str]
+    sources: List[Optional[str]]
+    parent_ids: np.ndarray
+    child_ids: np.ndarray
+    parent_metadata: List[Dict[str, Any]]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def as_dicts(self) -> List[Dict[str, Any]]:
+        """Row-wise {'text', 'metadata'} chunks, as `TextChunker.split_children` returns them."""
+        return [
+            {"text": text, "metadata": ChainMap({"child_id": child_id}, parent_meta)}
+            for text, child_id, parent_meta in zip(self.texts, self.child_ids.tolist(), self.parent_metadata)
+        ]
+
+@lru_cache(maxsize=32)
+def _compile_separators(separators: Tuple[str, ...]) -> re.Pattern:
+    """Compile (once per process) the alternation regex for a separator tuple."""
+    # longest first so "\n\n" is not matched as two "\n"
+    ordered = sorted(separators, key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, ordered)))
+
+class RegexTextSplitter:
+    """
+    Recursive separator splitter driven by a single precompiled regex.
+
+    Follows the same rules as LangChain's RecursiveCharacterTextSplitter (separators kept at
+    the start of the following piece, whitespace stripped, higher-priority separators preferred)
+    and finds every separator position in one `finditer` pass, packing chunks by jumping between
+    boundary offsets instead of splitting and re-merging strings. Chunks respect `chunk_size`
+    but are not identical to LangChain's: boundaries and overlaps often differ and a text
+    usually yields a few more chunks, so documents ingested with the LangChain splitter
+    chunk differently when re-uploaded.
+
+    Args:
+        chunk_size (int): Maximum chunk length in characters. A piece with no separator
+            inside the window is kept whole.
+        chunk_overlap (int): Target number of trailing characters repeated at the start of the next chunk.
+        separators (List[str]): Separators in priority order, e.g. ["\n\n", "\n", "."].
+    """
+    def __init__(self, chunk_size: int, chunk_overlap: int, separators: List[str]):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(separators)
+        self._sep_re = _compile_separators(tuple(self.separators))
+        self._priority = {sep: i for i, sep in enumerate(self.separators)}
+
+    def _boundaries(self, text: str) -> List[np.ndarray]:
+        """For each priority level, sorted int64 start offsets of separators at that level or higher."""
+        # one linear scan fills a (n, 2) array of (offset, level) without an intermediate list
+        priority = self._priority
+        matches = np.fromiter(((m.start(), priority[m.group()]) for m in self._sep_re.finditer(text)),
+                              dtype=np.dtype((np.int64, 2)))
+        offsets, levels = matches[:, 0], matches[:, 1]
+        return [offsets[levels <= level] for level in range(len(self.separators))]
+
+    def split_spans(self, text: str) -> np.ndarray:
+        """Chunk boundaries as an (n, 2) int64 array of [start, end) offsets into `text`.
+
+        Each chunk end is found with `np.searchsorted` over the boundary offsets, so the
+        Python loop runs once per chunk rather than once per separator or character, and
+        no substrings are built. Spans are unstripped and may cover whitespace only.
+        """
+        n = len(text)
+        levels = self._boundaries(text)
+        all_boundaries = levels[-1] if levels else np.empty(0, dtype=np.int64)
+        spans = []
+        start = 0
+        while start < n:
+            limit = start + self.chunk_size
+            end = n
+            if limit < n:
+                end = None
+                for boundaries in levels:
+                    i = int(np.searchsorted(boundaries, limit, side="right")) - 1
+                    if i >= 0 and boundaries[i] > start:
+                        end = int(boundaries[i])
+                        break
+                if end is None:
+                    # no separator fits: keep the oversized piece up to the next separator
+                    i = int(np.searchsorted(all_boundaries, limit, side="right"))
+                    end = int(all_boundaries[i]) if i < len(all_boundaries) else n
+            spans.append((start, end))
+            if end >= n:
+                break
+            # next chunk starts at the earliest boundary inside the overlap window
+            i = int(np.searchsorted(all_boundaries, end - self.chunk_overlap, side="left"))
+            next_start = int(all_boundaries[i]) if i < len(all_boundaries) else end
+            start = next_start if start < next_start < end else end
+        return np.array(spans, dtype=np.int64).reshape(-1, 2)
+
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks of at most `chunk_size` characters where separators allow."""
+        chunks = (text[start:end].strip() for start, end in self.split_spans(text).tolist())
+        return [chunk for chunk in chunks if chunk]
+
+@lru_cache(maxsize=8)
+def _worker_chunker(params: Tuple[Tuple[str, Any], ...]) -> "TextChunker":
+    """Per-process TextChunker for a given parameter set, reused across `_split_one` calls."""
+    return TextChunker(**dict(params))
+
+def _split_one(args: Tuple[Dict[str, Any], str, str, Optional[Dict[str, Any]]]) -> Tuple[List[Dict], List[Dict]]:
+    """Split one (source, text) document into parents and children inside a worker process.
+
+    The chunker is rebuilt from its constructor parameters so no compiled state is pickled,
+    and is built only once per worker process.
+    """
+    chunker_params, source, text, base_metadata = args
+    chunker = _worker_chunker(tuple(
+        (k, tuple(v) if isinstance(v, list) else v) for k, v in chunker_params.items()
+    ))
+    metadata = base_metadata.copy() if base_metadata else {}
+    metadata["source"] = source
+    parent_chunks = chunker.split_text(text, metadata)
+    return parent_chunks, chunker.split_children(parent_chunks)
 
 class TextChunker:
     def __init__(
@@ -20,6 +154,16 @@ class TextChunker:
         self.child_chunk_overlap = child_chunk_overlap
         self.parent_separators = parent_separators or ["\n\n", "\n", "."]
         self.child_separators = child_separators or ["\n\n", "\n", "."]
+        self._parent_splitter = RegexTextSplitter(
+            chunk_size=self.parent_chunk_size,
+            chunk_overlap=self.parent_chunk_overlap,
+            separators=self.parent_separators
+        )
+        self._child_splitter = RegexTextSplitter(
+            chunk_size=self.child_chunk_size,
+            chunk_overlap=self.child_chunk_overlap,
+            separators=self.child_separators
+        )
     
     def split_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Split raw text into parent chunks.
@@ -30,12 +174,7 @@ class TextChunker:
             List[Dict[str, Any]]:  Each chunk is represented as a dictionary with 'text' and 'metadata' keys.
         If metadata is provided, it is included in each chunk's metadata.
         """
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.parent_chunk_size,
-            chunk_overlap=self.parent_chunk_overlap,
-            separators=self.parent_separators
-        )
-        chunks = splitter.split_text(text)
+        chunks = self._parent_splitter.split_text(text)
         docs = []
         for idx, chunk in enumerate(chunks):
             md = metadata.copy() if metadata else {}
@@ -43,50 +182,79 @@ class TextChunker:
             docs.append({"text": chunk, "metadata": md})
         return docs
 
-    def split_children(self, parent_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def split_children(self, parent_chunks: List[Dict[str, Any]], start_child_id: int = 0) -> List[Dict[str, Any]]:
         """Split parent chunks into child chunks
         Args:
             parent_chunks (List[Dict[str, Any]]): List of parent chunks, each represented as a dictionary with 'text' and 'metadata' keys.
+            start_child_id (int): First child_id to assign. Lets a document be split in several batches without id collisions.
         Returns:
             List[Dict[str, Any]]: List of child chunks, each represented as a dictionary with 'text' and 'metadata' keys.
-        Each child chunk's metadata includes a reference to its parent chunk's ID.
+        Each child chunk's metadata includes a reference to its parent chunk's ID. The metadata is a
+        ChainMap over one dict shared by all children of the same parent; use dict() to materialize it.
         """
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.child_chunk_size,
-            chunk_overlap=self.child_chunk_overlap,
-            separators=self.child_separators
-        )
-    
-        child_chunks = []
-        child_id = 0
+        return self.split_children_batch(parent_chunks, start_child_id).as_dicts()
+
+    def split_children_batch(self, parent_chunks: List[Dict[str, Any]], start_child_id: int = 0) -> ChunkBatch:
+        """Split parent chunks into child chunks, column-wise.
+        Args:
+            parent_chunks (List[Dict[str, Any]]): List of parent chunks, each represented as a dictionary with 'text' and 'metadata' keys.
+            start_child_id (int): First child_id to assign.
+        Returns:
+            ChunkBatch: Child texts with their sources, parent ids, child ids and shared parent metadata.
+        """
+        texts = []
+        parent_metadata = []
         for parent in parent_chunks:
-            chunks = text_splitter.split_text(parent["text"])
-            for chunk in chunks:
-                # keep parent info + parent_id
-                metadata = parent["metadata"].copy()
-                metadata["parent_id"] = metadata.pop("id", None) # rename id as parent_id
-                metadata["child_id"] = child_id
-                child_id += 1
-                child_chunks.append({
-                    "text": chunk,
-                    "metadata": metadata
-                })
-            # child_id += 1
-        return child_chunks
+            chunks = self._child_splitter.split_text(parent["text"])
+            # keep parent info + parent_id, built once per parent
+            parent_meta = {**parent["metadata"], "parent_id": parent["metadata"].get("id")}
+            parent_meta.pop("id", None) # rename id as parent_id
+            texts.extend(chunks)
+            parent_metadata.extend([parent_meta] * len(chunks))
+        return ChunkBatch(
+            texts=texts,
+            sources=[meta.get("source") for meta in parent_metadata],
+            parent_ids=np.fromiter((meta["parent_id"] if meta["parent_id"] is not None else -1
+                                    for meta in parent_metadata), dtype=np.int64, count=len(texts)),
+            child_ids=np.arange(start_child_id, start_child_id + len(texts), dtype=np.int64),
+            parent_metadata=parent_metadata,
+        )
         
+    def _params(self) -> Dict[str, Any]:
+        return {
+            "parent_chunk_size": self.parent_chunk_size,
+            "parent_chunk_overlap": self.parent_chunk_overlap,
+            "child_chunk_size": self.child_chunk_size,
+            "child_chunk_overlap": self.child_chunk_overlap,
+            "parent_separators": self.parent_separators,
+            "child_separators": self.child_separators,
+        }
+
     def parent_child_splitter(self,
                             texts: List[Tuple[str, str]], 
-                            base_metadata: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict], List[Dict]]:
+                            base_metadata: Optional[Dict[str, Any]] = None,
+                            max_workers: Optional[int] = None) -> Tuple[List[Dict], List[Dict]]:
         """Orchestrates splitting of multiple texts into parent and child chunks.
+        Documents are split in-process unless `max_workers` opts into the shared spawn-context worker pool.
         Args:
             texts (List[Tuple[str, str]]): List of tuples where each tuple contains (source, text).
             base_metadata (Optional[Dict[str, Any]]): Optional base metadata to include with each chunk.
+            max_workers (Optional[int]): Number of worker processes for large batches of documents.
+                None or 1 splits in-process. Defaults to None.
         Returns:
             Tuple[List[Dict], List[Dict]]: A tuple containing two lists - the first is the list of parent chunks,
             and the second is the list of child chunks. Each chunk is represented as a dictionary with 'text' and 'metadata' keys.  
         """
         parents = []
         children = []
+        if max_workers and max_workers > 1 and len(texts) > 1:
+            params = self._params()
+            jobs = [(params, source, text, base_metadata) for source, text in texts]
+            for parent_chunks, child_chunks in get_process_pool(max_workers).map(_split_one, jobs, chunksize=4):
+                parents.extend(parent_chunks)
+                children.extend(child_chunks)
+            return parents, children
+
         for source, text in texts:
             metadata = base_metadata.copy() if base_metadata else {}
             metadata["source"] = source
@@ -97,6 +265,56 @@ class TextChunker:
     
         return parents, children 
 
+    async def aparent_child_batches(self,
+                                    texts: List[Tuple[str, str]],
+                                    base_metadata: Optional[Dict[str, Any]] = None,
+                                    parents_per_batch: int = 32,
+                                    max_prefetch: int = 2) -> AsyncIterator[Tuple[List[Dict], ChunkBatch]]:
+        """Asynchronously split texts, yielding (parents, children) batches while chunking runs ahead.
+
+        Splitting happens in worker threads in a background task that stays up to `max_prefetch`
+        batches ahead of the consumer, so the next batch (or document) is being chunked while
+        the caller embeds and indexes the current one.
+        Args:
+            texts (List[Tuple[str, str]]): List of tuples where each tuple contains (source, text).
+            base_metadata (Optional[Dict[str, Any]]): Optional base metadata to include with each chunk.
+            parents_per_batch (int): Number of parent chunks per yielded batch. Defaults to 32.
+            max_prefetch (int): Maximum number of chunked batches waiting for the consumer. Defaults to 2.
+        Yields:
+            Tuple[List[Dict], ChunkBatch]: A batch of parent chunks of one document and their child chunks.
+            Child ids continue across the batches of a document.
+        """
+        queue = asyncio.Queue(maxsize=max_prefetch)
+
+        async def produce():
+            try:
+                for source, text in texts:
+                    metadata = base_metadata.copy() if base_metadata else {}
+                    metadata["source"] = source
+                    parent_chunks = await asyncio.to_thread(self.split_text, text, metadata)
+                    child_id = 0
+                    for i in range(0, len(parent_chunks), parents_per_batch):
+                        batch = parent_chunks[i:i + parents_per_batch]
+                        child_chunks = await asyncio.to_thread(self.split_children_batch, batch, child_id)
+                        child_id += len(child_chunks)
+                        await queue.put((batch, child_chunks))
+            except asyncio.CancelledError:
+                raise   # the consumer has stopped; nobody is waiting for the sentinel
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (item := await queue.get()) is not None:
+                yield item
+            await producer  # re-raise splitting errors
+        finally:
+            producer.cancel()
+            # wait for the producer to finish unwinding so no task outlives the generator
+            await asyncio.gather(producer, return_exceptions=True)
+
 if __name__ == "__main__":
     from config import MAX_SEQ_LENGTH_EMBEDDING
     from rag_utils import load_files
@@ -1,63 +1,182 @@
 from dotenv import load_dotenv, find_dotenv
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
 import os
 import sys
 sys.path.append(os.path.abspath("../src"))
 load_dotenv(find_dotenv(), override=True)
 
-LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
-
-API_KEY = os.environ.get("API_KEY")
-MODEL = os.environ.get("MODEL")
-
-TEMP_FILE_DOWNLOAD_DIR = os.environ.get("TEMP_FILE_DOWNLOAD_DIR")
-
-DENSE_EMBEDDING_MODEL = os.environ.get("DENSE_EMBEDDING_MODEL")
-SPARSE_EMBEDDING_MODEL = os.environ.get("SPARSE_EMBEDDING_MODEL")
-MAX_SEQ_LENGTH_EMBEDDING = int(os.environ.get("MAX_SEQ_LENGTH_EMBEDDING"))
-CROSS_ENCODER_MODEL= os.environ.get("CROSS_ENCODER_MODEL")
-
-QDRANT_HOST = os.environ.get("QDRANT_HOST")
-QDRANT_PORT = os.environ.get("QDRANT_PORT")
-COLLECTION = os.environ.get("COLLECTION")
-resources_string = os.environ.get("COLLECTION_RESOURCES")
-COLLECTION_RESOURCES = [item.strip() for item in resources_string.split(",") if item.strip()]
-DISTANCE = os.environ.get("DISTANCE")
-SPARSE_MODIFIER=os.environ.get("SPARSE_MODIFIER")
-DENSE_VECTOR_NAME=os.environ.get("DENSE_VECTOR_NAME")
-SPARSE_VECTOR_NAME=os.environ.get("SPARSE_VECTOR_NAME")
-UPSERT_BATCH_SIZE=int(os.environ.get("UPSERT_BATCH_SIZE"))
-
-DOCSTORE_USER = os.getenv("DOCSTORE_USER")
-DOCSTORE_PASSWORD = os.getenv("DOCSTORE_PASSWORD")
-DOCSTORE_HOST = os.getenv("DOCSTORE_HOST")
-DOCSTORE_PORT = os.getenv("DOCSTORE_PORT")
-DOCSTORE_NAME = os.getenv("DOCSTORE_NAME")
-
-CHAINLIT_DB_NAME = os.getenv("CHAINLIT_DB_NAME")
-
-PARENT_CHUNK_SIZE = int(os.environ.get("PARENT_CHUNK_SIZE"))
-PARENT_CHUNK_OVERLAP = int(os.environ.get("PARENT_CHUNK_OVERLAP"))
-CHILD_CHUNK_SIZE = int(os.environ.get("CHILD_CHUNK_SIZE"))
-CHILD_CHUNK_OVERLAP = int(os.environ.get("CHILD_CHUNK_OVERLAP"))
-GET_NEIGHBORS = bool(os.environ.get("GET_NEIGHBORS"))
-
-MINIO_ENDPOINT = os.environ.get("MINIO_ENDPOINT")      # S3 API port
-MINIO_ACCESS_KEY = os.environ.get("MINIO_ROOT_USER")
-MINIO_SECRET_KEY = os.environ.get("MINIO_ROOT_PASSWORD")
-MINIO_BUCKET = os.environ.get("MINIO_BUCKET")
-
-SYSTEM_PROMPT_PATH = os.environ.get("SYSTEM_PROMPT_PATH")
-REWRITE_QUERY_PROMPT_PATH = os.environ.get("REWRITE_QUERY_PROMPT_PATH")
-CONTEXT_RELEVANCE_PROMPT_PATH = os.environ.get("CONTEXT_RELEVANCE_PROMPT_PATH")
-
-REDIS_HOST=os.environ.get("REDIS_HOST")
-REDIS_PORT=int(os.environ.get("REDIS_PORT"))
-REDIS_DB=int(os.environ.get("REDIS_DB"))
-REDIS_PASSWORD=os.environ.get("REDIS_PASSWORD")
-INDEX_NAME=os.environ.get("INDEX_NAME")
-CACHE_TOP_K=int(os.environ.get("CACHE_TOP_K"))
-DISTANCE_THRESHOLD=float(os.environ.get("DISTANCE_THRESHOLD"))
-CACHE_TTL=int(os.environ.get("CACHE_TTL"))  # Cache time-to-live in seconds (e.g., 86400 seconds = 1 day)
+_ENV = dict(os.environ)  # one snapshot after .env is loaded; fields below read from it once
+
+
+def _get(key: str, default: Optional[str] = None) -> Optional[str]:
+    return _ENV.get(key, default)
+
+
+def _csv(value: Optional[str]) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Process-wide settings parsed from the environment once at import time.
+
+    The module-level constants below are plain reads from the `CFG` instance, so
+    existing `from src.config import NAME` imports keep working.
+    """
+    LOG_LEVEL: str = _get("LOG_LEVEL", "INFO")
+
+    API_KEY: Optional[str] = _get("API_KEY")
+    MODEL: Optional[str] = _get("MODEL")
+    HTTP_MAX_CONNECTIONS: int = int(_get("HTTP_MAX_CONNECTIONS", 100))  # shared outbound HTTP pool size
+    HTTP_MAX_KEEPALIVE: int = int(_get("HTTP_MAX_KEEPALIVE", 20))  # idle connections kept open for reuse
+    LLM_CACHE_TTL: int = int(_get("LLM_CACHE_TTL", 0))  # seconds exact LLM responses stay cached in Redis; 0 disables it
+    LLM_MAX_INFLIGHT: int = int(_get("LLM_MAX_INFLIGHT", 32))  # concurrent async LLM API calls per process
+
+    TEMP_FILE_DOWNLOAD_DIR: Optional[str] = _get("TEMP_FILE_DOWNLOAD_DIR")
+
+    DENSE_EMBEDDING_MODEL: Optional[str] = _get("DENSE_EMBEDDING_MODEL")
+    SPARSE_EMBEDDING_MODEL: Optional[str] = _get("SPARSE_EMBEDDING_MODEL")
+    EMBEDDING_CACHE_PATH: Optional[str] = _get("EMBEDDING_CACHE_PATH")  # SQLite file caching document embeddings across re-indexing; unset disables it
+    MAX_SEQ_LENGTH_EMBEDDING: int = int(_get("MAX_SEQ_LENGTH_EMBEDDING"))
+    CROSS_ENCODER_MODEL: Optional[str] = _get("CROSS_ENCODER_MODEL")
+
+    QDRANT_HOST: Optional[str] = _get("QDRANT_HOST")
+    QDRANT_PORT: Optional[str] = _get("QDRANT_PORT")
+    QDRANT_GRPC_PORT: int = int(_get("QDRANT_GRPC_PORT", 6334))
+    COLLECTION: Optional[str] = _get("COLLECTION")
+    COLLECTION_RESOURCES: Tuple[str, ...] = _csv(_get("COLLECTION_RESOURCES"))
+    DISTANCE: Optional[str] = _get("DISTANCE")
+    SPARSE_MODIFIER: Optional[str] = _get("SPARSE_MODIFIER")
+    DENSE_VECTOR_NAME: Optional[str] = _get("DENSE_VECTOR_NAME")
+    SPARSE_VECTOR_NAME: Optional[str] = _get("SPARSE_VECTOR_NAME")
+    DENSE_VECTOR_DATATYPE: Optional[str] = _get("DENSE_VECTOR_DATATYPE") or None  # opt-in storage type of new collections' dense vectors, e.g. "float16"; unset keeps float32
+    DENSE_VECTORS_ON_DISK: bool = _get("DENSE_VECTORS_ON_DISK", "false").lower() == "true"  # opt-in: keep new collections' original dense vectors on disk; int8 copies stay in RAM
+    QDRANT_MAX_INFLIGHT: int = int(_get("QDRANT_MAX_INFLIGHT", 64))  # concurrent async Qdrant searches per process
+    UPSERT_BATCH_SIZE: int = int(_get("UPSERT_BATCH_SIZE"))
+    RERANK_SKIP_MARGIN: float = float(_get("RERANK_SKIP_MARGIN", 0.15))  # dense cosine lead over the k-th candidate that skips the cross-encoder
+    RERANK_MIN_DENSE_SCORE: float = float(_get("RERANK_MIN_DENSE_SCORE", 0.2))  # candidates below this dense cosine are not reranked
+
+    DOCSTORE_USER: Optional[str] = _get("DOCSTORE_USER")
+    DOCSTORE_PASSWORD: Optional[str] = _get("DOCSTORE_PASSWORD")
+    DOCSTORE_HOST: Optional[str] = _get("DOCSTORE_HOST")
+    DOCSTORE_PORT: Optional[str] = _get("DOCSTORE_PORT")
+    DOCSTORE_NAME: Optional[str] = _get("DOCSTORE_NAME")
+    DOCSTORE_POOL_SIZE: int = int(_get("DOCSTORE_POOL_SIZE", 10))  # sync engine pool; per worker, keep workers * (size + overflow) under max_connections
+    DOCSTORE_MAX_OVERFLOW: int = int(_get("DOCSTORE_MAX_OVERFLOW", 5))
+    DOCSTORE_ASYNC_POOL_SIZE: int = int(_get("DOCSTORE_ASYNC_POOL_SIZE", 5))
+    DOCSTORE_ASYNC_MAX_OVERFLOW: int = int(_get("DOCSTORE_ASYNC_MAX_OVERFLOW", 10))
+    DOCSTORE_POOL_TIMEOUT: int = int(_get("DOCSTORE_POOL_TIMEOUT", 10))  # seconds to wait for a connection before failing
+    DOCSTORE_POOL_RECYCLE: int = int(_get("DOCSTORE_POOL_RECYCLE", 1800))
+
+    CHAINLIT_DB_NAME: Optional[str] = _get("CHAINLIT_DB_NAME")
+
+    PARENT_CHUNK_SIZE: int = int(_get("PARENT_CHUNK_SIZE"))
+    PARENT_CHUNK_OVERLAP: int = int(_get("PARENT_CHUNK_OVERLAP"))
+    CHILD_CHUNK_SIZE: int = int(_get("CHILD_CHUNK_SIZE"))
+    CHILD_CHUNK_OVERLAP: int = int(_get("CHILD_CHUNK_OVERLAP"))
+    GET_NEIGHBORS: bool = bool(_get("GET_NEIGHBORS"))
+
+    MINIO_ENDPOINT: Optional[str] = _get("MINIO_ENDPOINT")      # S3 API port
+    MINIO_ACCESS_KEY: Optional[str] = _get("MINIO_ROOT_USER")
+    MINIO_SECRET_KEY: Optional[str] = _get("MINIO_ROOT_PASSWORD")
+    MINIO_BUCKET: Optional[str] = _get("MINIO_BUCKET")
+
+    SYSTEM_PROMPT_PATH: Optional[str] = _get("SYSTEM_PROMPT_PATH")
+    REWRITE_QUERY_PROMPT_PATH: Optional[str] = _get("REWRITE_QUERY_PROMPT_PATH")
+    CONTEXT_RELEVANCE_PROMPT_PATH: Optional[str] = _get("CONTEXT_RELEVANCE_PROMPT_PATH")
+
+    REDIS_HOST: Optional[str] = _get("REDIS_HOST")
+    REDIS_PORT: int = int(_get("REDIS_PORT"))
+    REDIS_DB: int = int(_get("REDIS_DB"))
+    REDIS_PASSWORD: Optional[str] = _get("REDIS_PASSWORD")
+    INDEX_NAME: Optional[str] = _get("INDEX_NAME")
+    CACHE_TOP_K: int = int(_get("CACHE_TOP_K"))
+    DISTANCE_THRESHOLD: float = float(_get("DISTANCE_THRESHOLD"))
+    CACHE_QUANTIZE: bool = _get("CACHE_QUANTIZE", "false").lower() == "true"  # opt-in int8 prompt vectors; needs Redis 8+ and a recreated llmcache index
+    CACHE_ONNX_FILE_NAME: Optional[str] = _get("CACHE_ONNX_FILE_NAME") or None  # opt-in int8 ONNX graph for cache prompt embeddings, e.g. "onnx/model_qint8_avx512_vnni.onnx"; its vectors differ from PyTorch's, so flush the cache index when switching
+    LOCAL_CACHE_SIZE: int = int(_get("LOCAL_CACHE_SIZE", 1024))  # entries held in the in-process cache index
+    RESPONSE_DISTANCE_THRESHOLD: float = float(_get("RESPONSE_DISTANCE_THRESHOLD", 0.15))  # query-to-query threshold for cached responses
+    CACHE_TTL: int = int(_get("CACHE_TTL"))  # Cache time-to-live in seconds (e.g., 86400 seconds = 1 day)
+    REWRITE_CACHE_TTL: float = float(_get("REWRITE_CACHE_TTL", 0))  # seconds a query rewrite is reused in-process; 0 disables
+
+
+CFG = Config()
+
+# module-level names for existing imports
+LOG_LEVEL = CFG.LOG_LEVEL
+API_KEY = CFG.API_KEY
+MODEL = CFG.MODEL
+HTTP_MAX_CONNECTIONS = CFG.HTTP_MAX_CONNECTIONS
+HTTP_MAX_KEEPALIVE = CFG.HTTP_MAX_KEEPALIVE
+LLM_CACHE_TTL = CFG.LLM_CACHE_TTL
+LLM_MAX_INFLIGHT = CFG.LLM_MAX_INFLIGHT
+TEMP_FILE_DOWNLOAD_DIR = CFG.TEMP_FILE_DOWNLOAD_DIR
+DENSE_EMBEDDING_MODEL = CFG.DENSE_EMBEDDING_MODEL
+SPARSE_EMBEDDING_MODEL = CFG.SPARSE_EMBEDDING_MODEL
+EMBEDDING_CACHE_PATH = CFG.EMBEDDING_CACHE_PATH
+MAX_SEQ_LENGTH_EMBEDDING = CFG.MAX_SEQ_LENGTH_EMBEDDING
+CROSS_ENCODER_MODEL = CFG.CROSS_ENCODER_MODEL
+QDRANT_HOST = CFG.QDRANT_HOST
+QDRANT_PORT = CFG.QDRANT_PORT
+QDRANT_GRPC_PORT = CFG.QDRANT_GRPC_PORT
+COLLECTION = CFG.COLLECTION
+COLLECTION_RESOURCES = list(CFG.COLLECTION_RESOURCES)
+DISTANCE = CFG.DISTANCE
+SPARSE_MODIFIER = CFG.SPARSE_MODIFIER
+DENSE_VECTOR_NAME = CFG.DENSE_VECTOR_NAME
+SPARSE_VECTOR_NAME = CFG.SPARSE_VECTOR_NAME
+DENSE_VECTOR_DATATYPE = CFG.DENSE_VECTOR_DATATYPE
+DENSE_VECTORS_ON_DISK = CFG.DENSE_VECTORS_ON_DISK
+QDRANT_MAX_INFLIGHT = CFG.QDRANT_MAX_INFLIGHT
+UPSERT_BATCH_SIZE = CFG.UPSERT_BATCH_SIZE
+RERANK_SKIP_MARGIN = CFG.RERANK_SKIP_MARGIN
+RERANK_MIN_DENSE_SCORE = CFG.RERANK_MIN_DENSE_SCORE
+DOCSTORE_USER = CFG.DOCSTORE_USER
+DOCSTORE_PASSWORD = CFG.DOCSTORE_PASSWORD
+DOCSTORE_HOST = CFG.DOCSTORE_HOST
+DOCSTORE_PORT = CFG.DOCSTORE_PORT
+DOCSTORE_NAME = CFG.DOCSTORE_NAME
+DOCSTORE_POOL_SIZE = CFG.DOCSTORE_POOL_SIZE
+DOCSTORE_MAX_OVERFLOW = CFG.DOCSTORE_MAX_OVERFLOW
+DOCSTORE_ASYNC_POOL_SIZE = CFG.DOCSTORE_ASYNC_POOL_SIZE
+DOCSTORE_ASYNC_MAX_OVERFLOW = CFG.DOCSTORE_ASYNC_MAX_OVERFLOW
+DOCSTORE_POOL_TIMEOUT = CFG.DOCSTORE_POOL_TIMEOUT
+DOCSTORE_POOL_RECYCLE = CFG.DOCSTORE_POOL_RECYCLE
+CHAINLIT_DB_NAME = CFG.CHAINLIT_DB_NAME
+PARENT_CHUNK_SIZE = CFG.PARENT_CHUNK_SIZE
+PARENT_CHUNK_OVERLAP = CFG.PARENT_CHUNK_OVERLAP
+CHILD_CHUNK_SIZE = CFG.CHILD_CHUNK_SIZE
+CHILD_CHUNK_OVERLAP = CFG.CHILD_CHUNK_OVERLAP
+GET_NEIGHBORS = CFG.GET_NEIGHBORS
+MINIO_ENDPOINT = CFG.MINIO_ENDPOINT
+MINIO_ACCESS_KEY = CFG.MINIO_ACCESS_KEY
+MINIO_SECRET_KEY = CFG.MINIO_SECRET_KEY
+MINIO_BUCKET = CFG.MINIO_BUCKET
+SYSTEM_PROMPT_PATH = CFG.SYSTEM_PROMPT_PATH
+REWRITE_QUERY_PROMPT_PATH = CFG.REWRITE_QUERY_PROMPT_PATH
+CONTEXT_RELEVANCE_PROMPT_PATH = CFG.CONTEXT_RELEVANCE_PROMPT_PATH
+REDIS_HOST = CFG.REDIS_HOST
+REDIS_PORT = CFG.REDIS_PORT
+REDIS_DB = CFG.REDIS_DB
+REDIS_PASSWORD = CFG.REDIS_PASSWORD
+INDEX_NAME = CFG.INDEX_NAME
+CACHE_TOP_K = CFG.CACHE_TOP_K
+DISTANCE_THRESHOLD = CFG.DISTANCE_THRESHOLD
+CACHE_QUANTIZE = CFG.CACHE_QUANTIZE
+CACHE_ONNX_FILE_NAME = CFG.CACHE_ONNX_FILE_NAME
+LOCAL_CACHE_SIZE = CFG.LOCAL_CACHE_SIZE
+RESPONSE_DISTANCE_THRESHOLD = CFG.RESPONSE_DISTANCE_THRESHOLD
+CACHE_TTL = CFG.CACHE_TTL
+REWRITE_CACHE_TTL = CFG.REWRITE_CACHE_TTL
+
+
+@lru_cache(maxsize=1)
+def get_system_prompt() -> str:
+    """Read the system prompt file on first use instead of at import time."""
+    with open(SYSTEM_PROMPT_PATH) as f:
+        return f.read()
 
 if __name__ == "__main__":
     import os
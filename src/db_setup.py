@@ -1,8 +1,69 @@
+from sqlalchemy import text
 from sqlalchemy.ext.declarative import declarative_base
-from src.docstore.session import sync_engine
+from src.docstore.session import sync_engine, async_engine
 
 # Shared Base for all models to inherit from
 Base = declarative_base()
 
+# Postgres advisory lock key that serializes schema creation across processes/workers
+INIT_DB_LOCK_KEY = 4242
+
+def _ensure_docstore_unique(conn):
+    """
+    Add the (source, parent_id) unique index to a docstore table created before it existed.
+
+    create_all does not alter existing tables, and without the index the parent inserts'
+    ON CONFLICT (source, parent_id) has no arbiter. Duplicate parents left by older inserts
+    are removed first, keeping the oldest row of each.
+    """
+    if conn.execute(text("SELECT to_regclass('uq_docstore_source_parent')")).scalar() is not None:
+        return
+    conn.execute(text(
+        "DELETE FROM docstore a USING docstore b "
+        "WHERE a.source = b.source AND a.parent_id = b.parent_id AND a.id > b.id"
+    ))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_docstore_source_parent ON docstore (source, parent_id)"))
+
+def _migrate_docstore_schema(conn):
+    """
+    Bring tables created by older releases up to the current models.
+
+    The metadata columns were JSON before they became JSONB, and ix_docstore_file_parent
+    used to lead with parent_id. Each step checks the catalog first, so a current schema
+    is left untouched.
+    """
+    for table, column in (("files", "file_metadata"), ("docstore", "chunk_metadata")):
+        data_type = conn.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"
+        ), {"table": table, "column": column}).scalar()
+        if data_type == "json":
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb"))
+    leading_column = conn.execute(text(
+        "SELECT a.attname FROM pg_index i "
+        "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] "
+        "WHERE i.indexrelid = to_regclass('ix_docstore_file_parent')"
+    )).scalar()
+    if leading_column != "file_id":
+        conn.execute(text("DROP INDEX IF EXISTS ix_docstore_file_parent"))
+        conn.execute(text("CREATE INDEX ix_docstore_file_parent ON docstore (file_id, parent_id)"))
+
 def init_db():
-    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": INIT_DB_LOCK_KEY})
+        Base.metadata.create_all(bind=conn)
+        _migrate_docstore_schema(conn)
+        _ensure_docstore_unique(conn)
+
+async def async_init_db():
+    """
+    Create all tables registered on `Base` using the async engine.
+
+    Concurrent workers are serialized by a transaction-scoped advisory lock, so only one
+    runs the DDL at a time and the rest find the tables already present.
+    """
+    async with async_engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": INIT_DB_LOCK_KEY})
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_migrate_docstore_schema)
+        await conn.run_sync(_ensure_docstore_unique)
@@ -1,19 +1,164 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import select
-from typing import List, Dict
+from sqlalchemy import select, tuple_, literal_column, and_, func, cast, bindparam, true, Integer, String, Text
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by, ARRAY, JSONB
+from typing import Any, List, Dict, Optional, Tuple
+import json
 import logging
+from src.config import COLLECTION
 from src.docstore.models import Docstore, File
+from src.docstore.files_crud import _memo_invalidate
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
+def _parent_rows(new_entries: list, file_id_map: Optional[dict], id_key: str) -> List[Dict]:
+    """
+    Docstore column values for each entry, first occurrence of a (source, parent_id) wins.
+    file_id is None when no file_id_map is given (the id comes from the files CTE instead).
+    """
+    rows = {}
+    for entry in new_entries:
+        source = entry["metadata"]["source"]
+        parent_id = entry["metadata"][id_key]
+        rows.setdefault((source, parent_id), {
+            "file_id": file_id_map[source] if file_id_map is not None else None,
+            "source": source,
+            "parent_id": parent_id,
+            "text": entry["text"],
+            "chunk_metadata": entry.get("metadata", {})
+        })
+    return list(rows.values())
+
+# INSERT ... ON CONFLICT DO NOTHING RETURNING id, executed with a list of rows (executemany).
+# The engines' insertmanyvalues_page_size batches it into multi-row INSERTs of 1000 rows.
+# Duplicates are caught by the (source, parent_id) unique constraint, so no existence check is needed.
+# The conflict target is explicit so a table missing that constraint errors instead of duplicating rows.
+INSERT_PARENTS = pg_insert(Docstore).on_conflict_do_nothing(index_elements=["source", "parent_id"]).returning(Docstore.id)
+
+def _file_with_parents_query(minio_metadata: Dict[str, Any], rows: List[Dict]):
+    """
+    Single statement staging a files row and all its parent chunks:
+
+        WITH f AS (INSERT INTO files ... RETURNING id),
+             d AS (INSERT INTO docstore (...) SELECT f.id, v.* FROM f JOIN unnest(...) AS v ON true
+                   ON CONFLICT (source, parent_id) DO NOTHING RETURNING id)
+        SELECT (SELECT id FROM f), (SELECT count(*) FROM d)
+
+    Parent columns are bound as one array each, so the statement size does not grow with the
+    number of parents. Metadata travels as json text and is cast to jsonb server side.
+    """
+    f = (
+        pg_insert(File)
+        .values(name=minio_metadata["object_name"], file_metadata=minio_metadata, qdrant_collection=COLLECTION)
+        .returning(File.id)
+        .cte("f")
+    )
+    v = func.unnest(
+        bindparam("sources", [r["source"] for r in rows], type_=ARRAY(String)),
+        bindparam("parent_ids", [r["parent_id"] for r in rows], type_=ARRAY(Integer)),
+        bindparam("texts", [r["text"] for r in rows], type_=ARRAY(Text)),
+        bindparam("metas", [json.dumps(r["chunk_metadata"]) for r in rows], type_=ARRAY(Text)),
+    ).table_valued("source", "parent_id", "text", "meta").render_derived(name="v")
+    d = (
+        pg_insert(Docstore)
+        .from_select(
+            ["file_id", "source", "parent_id", "text", "chunk_metadata"],
+            # f has exactly one row; the explicit ON true join pairs it with every parent
+            select(f.c.id, v.c.source, v.c.parent_id, v.c.text, cast(v.c.meta, JSONB)).select_from(f.join(v, true())),
+        )
+        .on_conflict_do_nothing(index_elements=["source", "parent_id"])
+        .returning(Docstore.id)
+        .cte("d")
+    )
+    return select(
+        select(f.c.id).scalar_subquery(),
+        select(func.count()).select_from(d).scalar_subquery(),
+    )
+
+def _unique_keys(points):
+    """Yield each parent's (source, parent_id) once, in hit order, touching each payload once."""
+    seen = set()
+    add = seen.add
+    for point in points:
+        metadata = point.payload["metadata"]
+        key = (metadata["source"], metadata["parent_id"])
+        if key not in seen:
+            add(key)
+            yield key
+
+# (source, parent_id) IN (SELECT * FROM unnest(:sources, :parent_ids)). The keys are bound as two
+# arrays, so the SQL text is the same for any number of hits and is compiled once per engine.
+# Only the columns _parent_chunk needs are selected (no id, file_id, created_date).
+_parent_keys = func.unnest(
+    bindparam("sources", type_=ARRAY(String)), bindparam("parent_ids", type_=ARRAY(Integer))
+).table_valued("src", "pid").render_derived(name="parent_keys")
+PARENTS_BY_KEY = select(
+    Docstore.text, Docstore.source, Docstore.parent_id, Docstore.chunk_metadata
+).where(tuple_(Docstore.source, Docstore.parent_id).in_(select(_parent_keys.c.src, _parent_keys.c.pid)))
+
+def _parent_key_params(keys: List[tuple]) -> Dict[str, list]:
+    return {"sources": [src for src, _ in keys], "parent_ids": [pid for _, pid in keys]}
+
+def _parent_chunk(parent) -> Dict:
+    return {
+        "text": parent.text,
+        "metadata": {
+            "source": parent.source,
+            "id": parent.parent_id,
+            **(parent.chunk_metadata or {})
+        }
+    }
+
+# The [parent_id - 1, parent_id + 1] window of every requested doc, concatenated server side
+# with string_agg(text, ' ' ORDER BY parent_id): one (idx, text) row per doc. The docs are
+# bound as arrays carrying their input position and left joined to docstore.
+_neighbor_window = func.unnest(
+    bindparam("idxs", type_=ARRAY(Integer)),
+    bindparam("sources", type_=ARRAY(String)),
+    bindparam("parent_ids", type_=ARRAY(Integer)),
+).table_valued("idx", "src", "pid").render_derived(name="neighbor_window")
+NEIGHBOR_WINDOW = (
+    select(
+        _neighbor_window.c.idx,
+        # ORDER BY parent_id inside the aggregate ensures correct sequence
+        func.string_agg(Docstore.text, aggregate_order_by(literal_column("' '"), Docstore.parent_id)),
+    )
+    .select_from(_neighbor_window)
+    .outerjoin(Docstore, and_(
+        Docstore.source == _neighbor_window.c.src,
+        Docstore.parent_id.between(_neighbor_window.c.pid - 1, _neighbor_window.c.pid + 1),
+    ))
+    .group_by(_neighbor_window.c.idx)
+)
+
+def _neighbor_window_params(docs: List[Dict]):
+    """NEIGHBOR_WINDOW parameters for the docs with an id and source. Returns (params, positions of valid docs)."""
+    requested = []
+    for idx, doc in enumerate(docs):
+        parent_id = doc.get("metadata", {}).get("id")
+        source = doc.get("metadata", {}).get("source")
+        if parent_id is None or source is None:
+            continue
+        requested.append((idx, source, parent_id))
+    if not requested:
+        return None, []
+    positions = [idx for idx, _, _ in requested]
+    params = {
+        "idxs": positions,
+        "sources": [src for _, src, _ in requested],
+        "parent_ids": [pid for _, _, pid in requested],
+    }
+    return params, positions
+
+def _group_neighbors(docs: List[Dict], positions: List[int], rows) -> List[Dict]:
+    """Map the (idx, window text) rows back to docs, preserving the order of `docs`."""
+    texts = dict(rows)
+    return [
+        {"text": texts.get(idx) or "", "metadata": {"source": docs[idx]["metadata"]["source"]}}
+        for idx in positions
+    ]
+
 def upsert_parents_to_docstore(
         new_entries: list,
         session: Session,
@@ -33,28 +178,15 @@ def upsert_parents_to_docstore(
     """
     saved = 0
     if not session:
-        logger.debug(f"No database session for docstore is provided.")
+        logger.debug("No database session for docstore is provided.")
         return saved
     
     try:
-        for entry in new_entries:
-            source = entry["metadata"]["source"]
-            parent_id = entry["metadata"]["parent_id"]
-
-            # check if the same parent chunk already exists
-            exists = session.query(Docstore).filter_by(source=source, parent_id=parent_id).first()
-            if not exists:
-                doc = Docstore(
-                    file_id=file_id_map[source],
-                    source=source,
-                    parent_id=parent_id,
-                    text=entry["text"],
-                    chunk_metadata=entry.get("metadata", {})
-                )
-                session.add(doc)
-                saved +=1
-        
-        logger.debug(f"{saved} new parent chunks added to docstore")
+        rows = _parent_rows(new_entries, file_id_map, id_key="parent_id")
+        if rows:
+            saved = len(session.execute(INSERT_PARENTS, rows).all())
+
+        logger.debug("%s new parent chunks added to docstore", saved)
         return saved
             
     except SQLAlchemyError as e:
@@ -84,30 +216,11 @@ async def async_upsert_parents_to_docstore(
         return saved
 
     try:
-        for entry in new_entries:
-            source = entry["metadata"]["source"]
-            parent_id = entry["metadata"]["id"]
-
-            # check if the same parent chunk already exists
-            result = await session.execute(
-                Docstore.__table__.select().where(
-                    Docstore.source == source,
-                    Docstore.parent_id == parent_id
-                )
-            )
-            exists = result.scalar_one_or_none()
-
-            if not exists:
-                doc = Docstore(
-                    file_id=file_id_map[source],
-                    source=source,
-                    parent_id=parent_id,
-                    text=entry["text"],
-                    chunk_metadata=entry.get("metadata", {})
-                )
-                session.add(doc)
-                saved += 1
-        logger.debug(f"{saved} new parent chunks added to docstore")
+        rows = _parent_rows(new_entries, file_id_map, id_key="id")
+        if rows:
+            result = await session.execute(INSERT_PARENTS, rows)
+            saved = len(result.all())
+        logger.debug("%s new parent chunks added to docstore", saved)
         return saved
             
     except SQLAlchemyError as e:
@@ -115,6 +228,65 @@ async def async_upsert_parents_to_docstore(
             raise RuntimeError (f"Failed to save parents to docstore: {e}")
     
 
+def stage_file_with_parents(
+        minio_metadata: Dict[str, Any],
+        new_entries: list,
+        session: Session
+) -> Tuple[int, int]:
+    """
+    Stages the files row and inserts its parent chunks in one round trip, skipping duplicates.
+    Use instead of stage_file_rows + upsert_parents_to_docstore when all entries belong to one file.
+    Does not commit the transaction.
+
+    Args:
+        minio_metadata (dict): File metadata, must contain "object_name"
+        new_entries (list): List of dicts with keys: source, id, text, metadata
+        session (Session): SQLAlchemy session
+
+    Returns:
+        Tuple[int, int]: id of the staged file, number of new parent chunks saved
+    """
+    try:
+        rows = _parent_rows(new_entries, None, id_key="parent_id")
+        file_id, saved = session.execute(_file_with_parents_query(minio_metadata, rows)).one()
+        _memo_invalidate(minio_metadata["object_name"])
+        logger.debug("Staged file %s (id: %s) with %s new parent chunks", minio_metadata['object_name'], file_id, saved)
+        return file_id, saved
+
+    except SQLAlchemyError as e:
+            logger.error("Failed to stage file and parents")
+            raise RuntimeError (f"Failed to stage {minio_metadata.get('object_name')} and its parents: {e}")
+
+async def async_stage_file_with_parents(
+        minio_metadata: Dict[str, Any],
+        new_entries: list,
+        session: AsyncSession
+) -> Tuple[int, int]:
+    """
+    Async version: Stages the files row and inserts its parent chunks in one round trip, skipping duplicates.
+    Use instead of stage_file_rows + upsert_parents_to_docstore when all entries belong to one file.
+    Does not commit the transaction.
+
+    Args:
+        minio_metadata (dict): File metadata, must contain "object_name"
+        new_entries (list): List of dicts with keys: source, id, text, metadata
+        session (AsyncSession): SQLAlchemy async session
+
+    Returns:
+        Tuple[int, int]: id of the staged file, number of new parent chunks saved
+    """
+    try:
+        rows = _parent_rows(new_entries, None, id_key="id")
+        result = await session.execute(_file_with_parents_query(minio_metadata, rows))
+        file_id, saved = result.one()
+        _memo_invalidate(minio_metadata["object_name"])
+        logger.debug("Staged file %s (id: %s) with %s new parent chunks", minio_metadata['object_name'], file_id, saved)
+        return file_id, saved
+
+    except SQLAlchemyError as e:
+            logger.error("Failed to stage file and parents")
+            raise RuntimeError (f"Failed to stage {minio_metadata.get('object_name')} and its parents: {e}")
+
 def retrieve_parent_chunks_from_docstore(hits: list, session: Session) -> list:
     """
     Fetch unique parent chunks from the docstore table based on child hits.
@@ -128,33 +300,17 @@ def retrieve_parent_chunks_from_docstore(hits: list, session: Session) -> list:
     """
 
     if not session:
-        logger.debug(f"No database session for docstore is provided.")
+        logger.debug("No database session for docstore is provided.")
         return []
     
-    seen_keys = set()
-    parent_chunks = []
-
-    for hit in hits.points:
-        source = hit.payload["metadata"]["source"]
-        parent_id = hit.payload["metadata"]["parent_id"]
-
-        key = (source, parent_id)
-        if key in seen_keys:
-            continue
-
-        # Fetch parent chunk from DB
-        parent = session.query(Docstore).filter_by(source=source, parent_id=parent_id).first()
-        if parent:
-            parent_chunks.append({
-                "text": parent.text,
-                "metadata": {
-                    "source": parent.source,
-                    "id": parent.parent_id,
-                    **(parent.chunk_metadata or {})
-                }
-            })
-            seen_keys.add(key)
-    logger.debug(f"Retrieved {len(parent_chunks)} unique parent chunks from docstore")
+    # one round trip for all hits instead of one SELECT per parent
+    keys = list(_unique_keys(hits.points))
+    by_key = {}
+    if keys:
+        for parent in session.execute(PARENTS_BY_KEY, _parent_key_params(keys)).all():
+            by_key[(parent.source, parent.parent_id)] = parent
+    parent_chunks = [_parent_chunk(by_key[key]) for key in keys if key in by_key]
+    logger.debug("Retrieved %s unique parent chunks from docstore", len(parent_chunks))
     return parent_chunks
 
 async def async_retrieve_parent_chunks_from_docstore(hits: list, session: AsyncSession) -> List[Dict[str,str]]:
@@ -172,39 +328,16 @@ async def async_retrieve_parent_chunks_from_docstore(hits: list, session: AsyncS
         logger.debug("No database session for docstore is provided.")
         return []
 
-    seen_keys = set()
-    parent_chunks = []
-
-    for hit in hits.points:
-        source = hit.payload["metadata"]["source"]
-        parent_id = hit.payload["metadata"]["parent_id"]
-
-        key = (source, parent_id)
-        if key in seen_keys:
-            continue
+    # one round trip for all hits instead of one SELECT per parent
+    keys = list(_unique_keys(hits.points))
+    by_key = {}
+    if keys:
+        result = await session.execute(PARENTS_BY_KEY, _parent_key_params(keys))
+        for parent in result.all():
+            by_key[(parent.source, parent.parent_id)] = parent
+    parent_chunks = [_parent_chunk(by_key[key]) for key in keys if key in by_key]
 
-        # Async query for the parent chunk
-        result = await session.execute(
-            select(Docstore).where(
-            Docstore.source == source,
-            Docstore.parent_id == parent_id
-            )
-        )
-        
-        parent = result.scalar_one_or_none()
-
-        if parent:
-            parent_chunks.append({
-                "text": parent.text,
-                "metadata": {
-                    "source": parent.source,
-                    "id": parent.parent_id,
-                    **(parent.chunk_metadata or {})
-                }
-            })
-            seen_keys.add(key)
-
-    logger.debug(f"Retrieved {len(parent_chunks)} unique parent chunks from docstore (async)")
+    logger.debug("Retrieved %s unique parent chunks from docstore (async)", len(parent_chunks))
     return parent_chunks
 
 def retrieve_parent_neighbors(docs, session: Session):
@@ -226,43 +359,17 @@ def retrieve_parent_neighbors(docs, session: Session):
         - The resulting list preserves the order of the input `docs`.
     """
     if not session:
-        logger.debug(f"No database session for docstore is provided.")
+        logger.debug("No database session for docstore is provided.")
         return []
 
     if not docs:
         logger.warning("No documents provided to retrieve neighbors.")
         return []
     
-    neighbors = []
-
-    for doc in docs:
-        parent_id = doc.get("metadata", {}).get("id")
-        source = doc.get("metadata", {}).get("source")
-
-        if parent_id is None or source is None:
-            continue
-
-        # Query only the needed neighbors (prev, current, next)
-        neighbor_ids = [parent_id - 1, parent_id, parent_id + 1]
-
-        rows = (
-            session.execute(
-                select(Docstore)
-                .where(
-                    Docstore.source == source,
-                    Docstore.parent_id.in_(neighbor_ids),
-                )
-                .order_by(Docstore.parent_id)  # ensures correct sequence
-            )
-            .scalars()
-            .all()
-        )
-
-        concatenated_neighbors = " ".join([row.text for row in rows])
-        neighbors.append({
-            "text": concatenated_neighbors,
-            "metadata": {"source": source}
-        })
+    # one windowed query for all docs instead of one SELECT per doc
+    params, positions = _neighbor_window_params(docs)
+    rows = session.execute(NEIGHBOR_WINDOW, params).all() if params is not None else []
+    neighbors = _group_neighbors(docs, positions, rows)
 
     return neighbors
 
@@ -286,37 +393,18 @@ async def async_retrieve_parent_neighbors(docs, session: AsyncSession) -> list:
         - The resulting list preserves the order of the input `docs`.
     """
     if not session:
-        logger.debug(f"No database session for docstore is provided.")
+        logger.debug("No database session for docstore is provided.")
         return []
         
     if not docs:
         logger.warning("No documents provided to retrieve neighbors.")
         return []
 
-    neighbors = []
-
-    for doc in docs:
-        parent_id = doc.get("metadata", {}).get("id")
-        source = doc.get("metadata", {}).get("source")
-
-        if parent_id is None or source is None:
-            continue
-
-        neighbor_ids = [parent_id - 1, parent_id, parent_id + 1]
-
-        result = await session.execute(
-            select(Docstore)
-            .where(Docstore.source == source, Docstore.parent_id.in_(neighbor_ids))
-            .order_by(Docstore.parent_id)
-        )
-        rows = result.scalars().all()
-
-        concatenated_neighbors = " ".join([row.text for row in rows])
-        neighbors.append({
-            "text": concatenated_neighbors,
-            "metadata": {"source": source}
-        })
+    # one windowed query for all docs instead of one SELECT per doc
+    params, positions = _neighbor_window_params(docs)
+    rows = (await session.execute(NEIGHBOR_WINDOW, params)).all() if params is not None else []
+    neighbors = _group_neighbors(docs, positions, rows)
 
-    logger.debug(f"Retrieved {len(neighbors)} parent neighbors (async)")
+    logger.debug("Retrieved %s parent neighbors (async)", len(neighbors))
     return neighbors
 
@@ -1,22 +1,43 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, delete, bindparam
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import UploadFile, HTTPException
 import logging
-from src.docstore.models import File
+from src.docstore.models import File, Docstore
 from typing import List, Dict, Any, Optional, Union
 from src.config import COLLECTION
+from src.docstore.session import request_file_cache
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
+# Prebuilt lookups by name; the statement objects are reused so each call only binds :name
+FILE_ID_BY_NAME = select(File.id).where(File.name == bindparam("name"))
+FILE_BY_NAME = select(File).where(File.name == bindparam("name"))
+# listings project only the name column: no File hydration, no file_metadata JSON decoding
+COLLECTION_FILE_NAMES = select(File.name).where(File.qdrant_collection == COLLECTION)
+ALL_FILE_NAMES = select(File.name)
+
+_MISS = object()
+
+def _memo_get(key: tuple):
+    """Value memoized for `key` in the current request, or _MISS."""
+    cache = request_file_cache.get()
+    return _MISS if cache is None else cache.get(key, _MISS)
+
+def _memo_set(key: tuple, value) -> None:
+    cache = request_file_cache.get()
+    if cache is not None:
+        cache[key] = value
+
+def _memo_invalidate(filename: str) -> None:
+    """Drop memoized lookups for `filename` after it is staged or deleted."""
+    cache = request_file_cache.get()
+    if cache is not None:
+        cache.pop(("exists", filename), None)
+        cache.pop(("file", filename), None)
+
 # func to check if a file name already exists in the files table
 def ensure_unique_filenames(session: Session, file: UploadFile) -> None:
     """
@@ -37,15 +58,18 @@ def ensure_unique_filenames(session: Session, file: UploadFile) -> None:
         logger.debug("No file provided.")
         raise HTTPException(status_code=400, detail="No file provided.")
        
-    # check if file already exists
-    existing_file = session.query(File).filter(File.name==file_name).first()
-    if existing_file:
-        logger.debug(f"File {file_name} already exists in DB")
+    # check if file already exists; only the indexed id is fetched, once per request
+    exists = _memo_get(("exists", file_name))
+    if exists is _MISS:
+        exists = session.scalar(FILE_ID_BY_NAME, {"name": file_name}) is not None
+        _memo_set(("exists", file_name), exists)
+    if exists:
+        logger.debug("File %s already exists in DB", file_name)
         raise HTTPException(
             status_code=400,
             detail=f"File {file_name} already exists. Delete it first before re-uploading."
             )   
-    logger.debug(f"File {file_name} is unique and safe to insert.")
+    logger.debug("File %s is unique and safe to insert.", file_name)
 
 async def async_ensure_unique_filenames(session: AsyncSession, file: UploadFile) -> None:
     """
@@ -66,17 +90,75 @@ async def async_ensure_unique_filenames(session: AsyncSession, file: UploadFile)
         logger.debug("No file provided.")
         raise HTTPException(status_code=400, detail="No file provided.")
     
-    # check if file already exists
-    result = await session.execute(select(File).where(File.name==file_name))
-    existing_file = result.scalar_one_or_none()
-    if existing_file:
-        logger.debug(f"File {file_name} already exists in DB")
+    # check if file already exists; only the indexed id is fetched, once per request
+    exists = _memo_get(("exists", file_name))
+    if exists is _MISS:
+        exists = await session.scalar(FILE_ID_BY_NAME, {"name": file_name}) is not None
+        _memo_set(("exists", file_name), exists)
+    if exists:
+        logger.debug("File %s already exists in DB", file_name)
         raise HTTPException(
             status_code=400,
             detail=f"File {file_name} already exists. Delete it first before re-uploading."
             ) 
     else:
-        logger.debug(f"File {file_name} is unique and safe to insert.")
+        logger.debug("File %s is unique and safe to insert.", file_name)
+
+def _check_batch_names(files: List[UploadFile]) -> List[str]:
+    """Names of a batch upload; raises if one is missing or repeats within the batch."""
+    names = [file.filename for file in files]
+    if not names or not all(names):
+        logger.debug("No file provided.")
+        raise HTTPException(status_code=400, detail="No file provided.")
+    repeated = sorted({name for name in names if names.count(name) > 1})
+    if repeated:
+        raise HTTPException(status_code=400, detail=f"Files uploaded more than once in this batch: {', '.join(repeated)}")
+    return names
+
+def _raise_if_existing(names: List[str], existing: List[str]) -> None:
+    existing = set(existing)
+    for name in names:
+        _memo_set(("exists", name), name in existing)
+    if existing:
+        logger.debug("Files %s already exist in DB", sorted(existing))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Files {', '.join(sorted(existing))} already exist. Delete them first before re-uploading."
+            )
+    logger.debug("%s files are unique and safe to insert.", len(names))
+
+def ensure_unique_filenames_batch(session: Session, files: List[UploadFile]) -> None:
+    """
+    Ensure that none of the uploaded files' names exist in the database, with one IN query for the whole batch.
+
+    Args:
+        session (Session): SQLAlchemy session used to query the database.
+        files (List[UploadFile]): FastAPI UploadFile objects to check.
+
+    Raises:
+        HTTPException: If a name is missing, repeats within the batch, or already exists; all
+            existing names are listed at once.
+    """
+    names = _check_batch_names(files)
+    existing = session.scalars(select(File.name).where(File.name.in_(names))).all()
+    _raise_if_existing(names, existing)
+
+async def async_ensure_unique_filenames_batch(session: AsyncSession, files: List[UploadFile]) -> None:
+    """
+    Ensure that none of the uploaded files' names exist in the database, with one IN query for the whole batch.
+    Uses AsyncSession.
+
+    Args:
+        session (AsyncSession): SQLAlchemy session used to query the database.
+        files (List[UploadFile]): FastAPI UploadFile objects to check.
+
+    Raises:
+        HTTPException: If a name is missing, repeats within the batch, or already exists; all
+            existing names are listed at once.
+    """
+    names = _check_batch_names(files)
+    existing = (await session.scalars(select(File.name).where(File.name.in_(names)))).all()
+    _raise_if_existing(names, existing)
 
 # stage file names in files table
 def stage_file_rows(session: Session, minio_metadata: Dict[str, Any]) -> File:
@@ -90,11 +172,12 @@ def stage_file_rows(session: Session, minio_metadata: Dict[str, Any]) -> File:
         )
         session.add(new_file)
         session.flush()
-        logger.debug(f"Staged file {new_file.name} in DB (id: {new_file.id}).")
+        _memo_invalidate(new_file.name)
+        logger.debug("Staged file %s in DB (id: %s).", new_file.name, new_file.id)
         return new_file
     
     except Exception as e:
-        logger.exception(f"Failed to stage file {minio_metadata.get('object_name')}")
+        logger.exception("Failed to stage file %s", minio_metadata.get('object_name'))
         raise RuntimeError(
             f"Failed to add a row for {minio_metadata.get('object_name')} in table files: {str(e)}"
         )
@@ -110,15 +193,52 @@ async def async_stage_file_rows(session: AsyncSession, minio_metadata: Dict[str,
         )
         session.add(new_file)
         await session.flush()
-        logger.debug(f"Staged file {new_file.name} in DB (id: {new_file.id}).")
+        _memo_invalidate(new_file.name)
+        logger.debug("Staged file %s in DB (id: %s).", new_file.name, new_file.id)
         return new_file
 
     except Exception as e:
-        logger.exception(f"Failed to stage file {minio_metadata.get('object_name')}")
+        logger.exception("Failed to stage file %s", minio_metadata.get('object_name'))
         raise RuntimeError(
             f"Failed to add a row for {minio_metadata.get('object_name')} in table files: {str(e)}"
         )
 
+def _file_rows(metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"name": meta["object_name"], "file_metadata": meta, "qdrant_collection": COLLECTION}
+        for meta in metadatas
+    ]
+
+def stage_file_rows_bulk(session: Session, metadatas: List[Dict[str, Any]]) -> List[File]:
+    """Add several File rows with one INSERT ... RETURNING. Not visible until commit."""
+    if not metadatas:
+        return []
+    try:
+        files = list(session.scalars(insert(File).returning(File), _file_rows(metadatas)).all())
+        for file in files:
+            _memo_invalidate(file.name)
+        logger.debug("Staged %s files in DB.", len(files))
+        return files
+
+    except Exception as e:
+        logger.exception("Failed to stage %s files", len(metadatas))
+        raise RuntimeError(f"Failed to add rows for {len(metadatas)} files in table files: {str(e)}")
+
+async def async_stage_file_rows_bulk(session: AsyncSession, metadatas: List[Dict[str, Any]]) -> List[File]:
+    """Add several File rows with one INSERT ... RETURNING. Not visible until commit. Using Async session"""
+    if not metadatas:
+        return []
+    try:
+        files = list((await session.scalars(insert(File).returning(File), _file_rows(metadatas))).all())
+        for file in files:
+            _memo_invalidate(file.name)
+        logger.debug("Staged %s files in DB.", len(files))
+        return files
+
+    except Exception as e:
+        logger.exception("Failed to stage %s files", len(metadatas))
+        raise RuntimeError(f"Failed to add rows for {len(metadatas)} files in table files: {str(e)}")
+
 def commit_session(session: Session, file: File) -> File:
     """
     Commit all staged changes in the current DB session.
@@ -127,12 +247,12 @@ def commit_session(session: Session, file: File) -> File:
     """
     try:
         session.commit()
-        logger.debug(f"Committed pipeline for file: {file.name}, id: {file.id} to the docstore database")
+        logger.debug("Committed pipeline for file: %s, id: %s to the docstore database", file.name, file.id)
         return file
     
     except SQLAlchemyError as e:
         session.rollback()
-        logger.exception(f"Failed to commit pipeline file: {getattr(file, 'name', None)} to the docstore database")
+        logger.exception("Failed to commit pipeline file: %s to the docstore database", getattr(file, 'name', None))
         raise RuntimeError(f"DB commit failed for file {getattr(file, 'name', None)}: {str(e)}")
 
 async def async_commit_session(session: AsyncSession, file: File) -> File:
@@ -143,16 +263,79 @@ async def async_commit_session(session: AsyncSession, file: File) -> File:
     """
     try:
         await session.commit()
-        logger.debug(f"Committed pipeline for file: {file.name}, id: {file.id} to the docstore database")
+        logger.debug("Committed pipeline for file: %s, id: %s to the docstore database", file.name, file.id)
         return file
     except SQLAlchemyError as e:
         await session.rollback()
-        logger.exception(f"Failed to commit pipeline for file: {getattr(file, 'name', None)} to the docstore database")
+        logger.exception("Failed to commit pipeline for file: %s to the docstore database", getattr(file, 'name', None))
         raise RuntimeError(f"DB commit failed for file {getattr(file, 'name', None)}: {str(e)}")
 
+def _delete_files_stmt(filenames: List[str]):
+    """
+    One DELETE of the named file rows, with their docstore rows removed in a data-modifying CTE.
+    Both run in the same statement, so the file_id foreign key is checked only after both are gone.
+    The statement's rowcount is the number of file rows deleted.
+    """
+    docstore_deleted = (
+        delete(Docstore)
+        .where(Docstore.file_id.in_(select(File.id).where(File.name.in_(filenames))))
+        .cte("docstore_deleted")
+    )
+    return delete(File).where(File.name.in_(filenames)).add_cte(docstore_deleted)
+
+def delete_file_rows(filenames: List[str], session: Session, commit: bool = True) -> int:
+    """
+    Delete several file rows and all their docstore entries in a single DELETE statement.
+
+    Args:
+        filenames (List[str]): Names of the files to delete
+        session (Session): SQLAlchemy session
+        commit (bool): Whether to commit immediately
+
+    Returns:
+        int: Number of file rows deleted
+    """
+    if not filenames:
+        return 0
+    # One round trip, without loading file or docstore rows into the session
+    result = session.execute(_delete_files_stmt(filenames))
+    for filename in filenames:
+        _memo_invalidate(filename)
+
+    deleted = result.rowcount
+    if deleted and commit:
+        session.commit()
+    logger.debug("%s of %s files and related docstore rows deleted.", deleted, len(filenames))
+    return deleted
+
+async def async_delete_file_rows(filenames: List[str], session: AsyncSession, commit: bool = True) -> int:
+    """
+    Delete several file rows and all their docstore entries in a single DELETE statement. Uses AsyncSession
+
+    Args:
+        filenames (List[str]): Names of the files to delete
+        session (AsyncSession): SQLAlchemy session
+        commit (bool): Whether to commit immediately
+
+    Returns:
+        int: Number of file rows deleted
+    """
+    if not filenames:
+        return 0
+    # One round trip, without loading file or docstore rows into the session
+    result = await session.execute(_delete_files_stmt(filenames))
+    for filename in filenames:
+        _memo_invalidate(filename)
+
+    deleted = result.rowcount
+    if deleted and commit:
+        await session.commit()   # commit to DB
+    logger.debug("%s of %s files and related docstore rows deleted (async).", deleted, len(filenames))
+    return deleted
+
 def delete_file_row(filename: str, session: Session, commit: bool = True) -> bool:
     """
-    Delete a file row and all related docstore entries (via cascade).
+    Delete a file row and all related docstore entries. Thin wrapper over delete_file_rows.
     
     Args:
         filename (str): Name of the file to delete
@@ -162,23 +345,11 @@ def delete_file_row(filename: str, session: Session, commit: bool = True) -> boo
     Returns:
         bool: True if deleted, False if file not found
     """
-    # Fetch the file row
-    file = session.query(File).filter_by(name=filename).first()
-
-    if not file:
-        logger.debug(f"File {filename} not found in docstore.")
-        return False
-    logger.debug(f"Fetched file for deletion: {file}")
-
-    session.delete(file)
-    if commit:
-        session.commit()
-    logger.debug(f"File {filename} and related docstore rows deleted.")
-    return True   
+    return delete_file_rows([filename], session, commit=commit) > 0
 
 async def async_delete_file_row(filename: str, session: AsyncSession, commit: bool = True) -> bool:
     """
-    Delete a file row and all related docstore entries (via cascade). Uses AsyncSession
+    Delete a file row and all related docstore entries. Thin wrapper over async_delete_file_rows.
     
     Args:
         filename (str): Name of the file to delete
@@ -188,20 +359,7 @@ async def async_delete_file_row(filename: str, session: AsyncSession, commit: bo
     Returns:
         bool: True if deleted, False if file not found
     """
-    # Fetch the file row
-    result = await session.execute(select(File).where(File.name == filename))
-    file = result.scalar_one_or_none()  # gets the single object or None      
-    if not file:
-        logger.debug(f"File {filename} not found in docstore.")
-        return False
-    
-    logger.debug(f"Fetched file for deletion: {file}")
-
-    await session.delete(file)      # schedule deletion
-    if commit:
-        await session.commit()   # commit to DB  
-    logger.debug(f"File {filename} and related docstore rows deleted (async).")
-    return True
+    return await async_delete_file_rows([filename], session, commit=commit) > 0
     
 def list_files(session: Session) -> List[str]:
     """
@@ -215,17 +373,17 @@ def list_files(session: Session) -> List[str]:
         List[str]: List of file names
     """
     try:
-        files = session.query(File).filter(File.qdrant_collection==COLLECTION).all()
-        if not files:
-            logger.debug(f"No files found in {COLLECTION} collection")
+        # only the name column is fetched; no ORM objects or JSON metadata
+        filenames = list(session.scalars(COLLECTION_FILE_NAMES))
+        if not filenames:
+            logger.debug("No files found in %s collection", COLLECTION)
             return []
         
-        filenames = [f.name for f in files]
-        logger.debug(f"Found {len(filenames)} files in {COLLECTION} collection")
+        logger.debug("Found %s files in %s collection", len(filenames), COLLECTION)
         return filenames
     
     except SQLAlchemyError as e:
-        logger.exception(f"Could not list files from docstore for {COLLECTION} collection")
+        logger.exception("Could not list files from docstore for %s collection", COLLECTION)
         raise RuntimeError(f"Failed to list files in {COLLECTION} collection: {e}")
 
 async def async_list_files(session: AsyncSession) -> List[str]:
@@ -240,17 +398,16 @@ async def async_list_files(session: AsyncSession) -> List[str]:
         List[str]: List of file names
     """
     try:
-        results = await session.execute(select(File).where(File.qdrant_collection==COLLECTION))
-        files = results.scalars().all()
-        if not files:
-            logger.debug(f"No files found in {COLLECTION} collection")
+        # only the name column is fetched; no ORM objects or JSON metadata
+        filenames = list(await session.scalars(COLLECTION_FILE_NAMES))
+        if not filenames:
+            logger.debug("No files found in %s collection", COLLECTION)
             return []
-        filenames = [f.name for f in files]
-        logger.debug(f"Found {len(filenames)} files in {COLLECTION} collection")
+        logger.debug("Found %s files in %s collection", len(filenames), COLLECTION)
         return filenames
     
     except SQLAlchemyError as e:
-        logger.exception(f"Could not list files from docstore for {COLLECTION} collection")
+        logger.exception("Could not list files from docstore for %s collection", COLLECTION)
         raise RuntimeError(f"Failed to list files in {COLLECTION} collection: {e}")
 
 def list_all_files(session: Session) -> List[str]:
@@ -264,17 +421,17 @@ def list_all_files(session: Session) -> List[str]:
         List[str]: List of file names
     """
     try:
-        files = session.query(File).all()
-        if not files:
-            logger.debug(f"No files found in docstore DB")
+        # only the name column is fetched; no ORM objects or JSON metadata
+        filenames = list(session.scalars(ALL_FILE_NAMES))
+        if not filenames:
+            logger.debug("No files found in docstore DB")
             return []
         
-        filenames = [f.name for f in files]
-        logger.debug(f"Found {len(filenames)} files in docstore DB")
+        logger.debug("Found %s files in docstore DB", len(filenames))
         return filenames
     
     except SQLAlchemyError as e:
-        logger.exception(f"Could not list files from docstore DB")
+        logger.exception("Could not list files from docstore DB")
         raise RuntimeError(f"Failed to list files from docstore DB:  {e}")
 
 async def async_list_all_files(session: AsyncSession) -> List[str]:
@@ -288,17 +445,16 @@ async def async_list_all_files(session: AsyncSession) -> List[str]:
         List[str]: List of file names
     """
     try:
-        results = await session.execute(select(File))
-        files = results.scalars().all()
-        if not files:
-            logger.debug(f"No files found in docstore DB")
+        # only the name column is fetched; no ORM objects or JSON metadata
+        filenames = list(await session.scalars(ALL_FILE_NAMES))
+        if not filenames:
+            logger.debug("No files found in docstore DB")
             return []
-        filenames = [f.name for f in files]
-        logger.debug(f"Found {len(filenames)} files in docstore DB")
+        logger.debug("Found %s files in docstore DB", len(filenames))
         return filenames
     
     except SQLAlchemyError as e:
-        logger.exception(f"Could not list files from docstore DB")
+        logger.exception("Could not list files from docstore DB")
         raise RuntimeError(f"Failed to list files from docstore DB: {e}")
 
 def get_file(filename: str, session: Session) -> Optional[File]:
@@ -314,16 +470,19 @@ def get_file(filename: str, session: Session) -> Optional[File]:
     """
 
     try:
-        file = session.query(File).filter(File.name == filename).first()
+        file = _memo_get(("file", filename))
+        if file is _MISS:
+            file = session.scalar(FILE_BY_NAME, {"name": filename})
+            _memo_set(("file", filename), file)
         if not file:
-            logger.debug(f"No file named {filename} found")
+            logger.debug("No file named %s found", filename)
             return None
 
-        logger.debug(f"File {filename} found")
+        logger.debug("File %s found", filename)
         return file
     
     except SQLAlchemyError as e:
-        logger.debug(f"Could not fetch file {filename}")
+        logger.debug("Could not fetch file %s", filename)
         raise RuntimeError(f"Could not fetch file {filename}: {e}")
 
 async def async_get_file(filename: str, session: AsyncSession) -> Optional[File]:
@@ -339,17 +498,19 @@ async def async_get_file(filename: str, session: AsyncSession) -> Optional[File]
     """
 
     try:
-        result = await session.execute(select(File).where(File.name == filename))
-        file = result.scalar_one_or_none()
+        file = _memo_get(("file", filename))
+        if file is _MISS:
+            file = await session.scalar(FILE_BY_NAME, {"name": filename})
+            _memo_set(("file", filename), file)
         if not file:
-            logger.debug(f"No file named {filename} found")
+            logger.debug("No file named %s found", filename)
             return None
 
-        logger.debug(f"File {filename} found")
+        logger.debug("File %s found", filename)
         return file
     
     except SQLAlchemyError as e:
-        logger.debug(f"Could not fetch file {filename}")
+        logger.debug("Could not fetch file %s", filename)
         raise RuntimeError(f"Could not fetch file {filename}: {e}")
 
 
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, JSON, Text,  DateTime, func, ForeignKey, Index, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text,  DateTime, func, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
 # from sqlalchemy.ext.declarative import declarative_base
 
 # Base = declarative_base()
@@ -13,7 +14,7 @@ class File(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False, unique=True)   # "contract_123.pdf"
-    file_metadata = Column(JSON, nullable=False)              # {"path": "..."}
+    file_metadata = Column(JSONB, nullable=False)              # {"path": "..."}
     created_date = Column(DateTime, server_default=func.now())
     created_by = Column(String, nullable=True)    # e.g. "sana", "system", or a user id
     qdrant_collection = Column(String, nullable=True)
@@ -37,15 +38,19 @@ class Docstore(Base):
     source = Column(String, nullable=False)
     parent_id = Column(Integer, nullable=False)
     text = Column(Text, nullable=False)
-    chunk_metadata = Column(JSON, nullable=True)
+    chunk_metadata = Column(JSONB, nullable=True)   # binary json: no re-parse of the text on every read
     created_date = Column(DateTime, server_default=func.now())
 
     # Back reference to File
     file = relationship("File", back_populates="docstore_entries")
 
     __table_args__ = (
-        # Index to have fast lookups by (file_id, parent_id)
-        Index("ix_docstore_file_parent", "parent_id", "file_id"),
+        # Index to have fast lookups by (file_id, parent_id); file_id leads so the
+        # delete-orphan cascade (WHERE file_id = ?) can use it
+        Index("ix_docstore_file_parent", "file_id", "parent_id"),
+        # a parent chunk is stored once per source; lets inserts use ON CONFLICT DO NOTHING.
+        # Its (source, parent_id) index also serves the parent and neighbor-window lookups.
+        UniqueConstraint("source", "parent_id", name="uq_docstore_source_parent"),
     )
     def __repr__(self):
         return f"<Docstore id={self.id}, parent_id={self.parent_id}, source={self.source}>"
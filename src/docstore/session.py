@@ -1,24 +1,83 @@
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Optional
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from src.config import (
     DOCSTORE_HOST,
     DOCSTORE_PORT,
     DOCSTORE_USER,
     DOCSTORE_PASSWORD,
-    DOCSTORE_NAME
+    DOCSTORE_NAME,
+    DOCSTORE_POOL_SIZE,
+    DOCSTORE_MAX_OVERFLOW,
+    DOCSTORE_ASYNC_POOL_SIZE,
+    DOCSTORE_ASYNC_MAX_OVERFLOW,
+    DOCSTORE_POOL_TIMEOUT,
+    DOCSTORE_POOL_RECYCLE,
 )
 
 POSTGRES_URL = f"{DOCSTORE_USER}:{DOCSTORE_PASSWORD}@{DOCSTORE_HOST}:{DOCSTORE_PORT}/{DOCSTORE_NAME}"
 sync_conninfo = f"postgresql+psycopg2://{POSTGRES_URL}"
 async_conninfo = f"postgresql+asyncpg://{POSTGRES_URL}"
 
-pool_size = 10
-pool_timeout = 30
-max_overflow = 5
-pool_recycle = 1800
+pool_size = DOCSTORE_POOL_SIZE
+pool_timeout = DOCSTORE_POOL_TIMEOUT  # fail fast instead of queueing requests behind a saturated pool
+max_overflow = DOCSTORE_MAX_OVERFLOW
+pool_recycle = DOCSTORE_POOL_RECYCLE
 pool_pre_ping = True
 echo = False
+# rows per multi-row INSERT when executemany batches ORM/Core inserts (insertmanyvalues)
+insertmanyvalues_page_size = 1000
+# compiled statements kept per engine; the hot lookups are all bound-parameter statements and hit it
+query_cache_size = 1200
+
+# Async pool: small steady-state pool with headroom for bursts
+async_pool_size = DOCSTORE_ASYNC_POOL_SIZE
+async_max_overflow = DOCSTORE_ASYNC_MAX_OVERFLOW
+# hand out the most recently returned connection so idle ones can be recycled
+async_pool_use_lifo = True
+# asyncpg connections: keep prepared statements per connection (SQLAlchemy's adapter cache,
+# default 100) and turn off JIT, which only adds planning time to these short OLTP queries
+async_connect_args = {
+    "prepared_statement_cache_size": 2048,
+    "server_settings": {"jit": "off", "application_name": "hybrid-rag"},
+}
+
+# Per-request memo of file lookups (see files_crud), reset by the session dependencies.
+# None outside a request, so scripts and background tasks always hit the database.
+request_file_cache: ContextVar[Optional[dict]] = ContextVar("request_file_cache", default=None)
+
+# Rolling window of connection checkout latencies (seconds) for the async pool
+checkout_latencies = deque(maxlen=1000)
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each connection checkout waits."""
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_latencies.append(time.perf_counter() - start)
+
+def pool_stats() -> Dict[str, object]:
+    """
+    Returns the async pool status and the p50/p95 checkout latency (ms) over the rolling window.
+    """
+    latencies = sorted(checkout_latencies)
+    def percentile(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+    return {
+        "status": async_engine.pool.status(),
+        "samples": len(latencies),
+        "checkout_p50_ms": percentile(0.50),
+        "checkout_p95_ms": percentile(0.95),
+    }
 
 # Sync engine, session factory, and dependence injection
 sync_engine = create_engine(
@@ -28,14 +87,17 @@ sync_engine = create_engine(
     max_overflow=max_overflow,
     pool_recycle=pool_recycle,
     pool_pre_ping=pool_pre_ping,
+    insertmanyvalues_page_size=insertmanyvalues_page_size,
+    query_cache_size=query_cache_size,
     echo=echo,
 )
 # Session Factory
-SessionLocal = sessionmaker(bind=sync_engine, autoflush=False, autocommit=False)
+SessionLocal = sessionmaker(bind=sync_engine, autoflush=False, autocommit=False, expire_on_commit=False)
 
 # Sync Dependency to get DB session per request
 def get_sync_session():
     session = SessionLocal()
+    request_file_cache.set({})
     try:
         yield session
     finally:
@@ -44,11 +106,16 @@ def get_sync_session():
 # Async engine, async session factory and Dependency
 async_engine = create_async_engine(
     async_conninfo,
-    pool_size=pool_size,
+    poolclass=TimedAsyncAdaptedQueuePool,
+    pool_size=async_pool_size,
     pool_timeout=pool_timeout,
-    max_overflow=max_overflow,
+    max_overflow=async_max_overflow,
+    pool_use_lifo=async_pool_use_lifo,
+    connect_args=async_connect_args,
     pool_recycle=pool_recycle,
     pool_pre_ping=pool_pre_ping,
+    insertmanyvalues_page_size=insertmanyvalues_page_size,
+    query_cache_size=query_cache_size,
     echo=echo,
 )
 # Session Factory
@@ -56,5 +123,6 @@ AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_
 
 # Async dependency to get a session
 async def get_async_session():
+    request_file_cache.set({})
     async with AsyncSessionLocal() as session:
         yield session
\ No newline at end of file
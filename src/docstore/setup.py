@@ -1,6 +1,5 @@
-from src.docstore.models import Base
-from src.docstore.session import sync_engine
-
-def init_db():
-    Base.metadata.create_all(bind=sync_engine)
+# Schema creation lives in src.db_setup (single engine pair from src.docstore.session,
+# advisory-locked create_all); re-exported here for existing imports.
+from src.db_setup import init_db, async_init_db
 
+__all__ = ["init_db", "async_init_db"]
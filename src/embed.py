@@ -1,21 +1,205 @@
 import numpy as np
 import logging
-from typing import List, Optional, Union
-from fastembed import TextEmbedding, SparseTextEmbedding
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from fastembed import TextEmbedding, SparseTextEmbedding, SparseEmbedding
 from src.config import DENSE_EMBEDDING_MODEL, SPARSE_EMBEDDING_MODEL
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 
+class AsyncBatcher:
+    """
+    Coalesces concurrent single-item calls into one batched call.
+
+    Items submitted within `max_wait_ms` of the first pending item (or until
+    `max_batch_size` items are pending) are passed together to `batch_fn`, which runs
+    in a worker thread. Each caller awaits its own future and receives its own result.
+
+    Args:
+        batch_fn (Callable[[List[Any]], List[Any]]): Function mapping a list of items to a list of results of the same length.
+        max_batch_size (int): Flush as soon as this many items are pending. Defaults to 32.
+        max_wait_ms (float): Maximum time (ms) an item waits for a batch to fill. Defaults to 5.
+    """
+    def __init__(self,
+                 batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0
+                 ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running = set()   # strong references to in-flight batch tasks
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item for the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await asyncio.to_thread(self.batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        logger.debug(f"Embedded a coalesced batch of {len(batch)} items")
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in a SQLite file, keyed by sha256(model_name + "\\0" + text).
+
+    Re-indexing unchanged chunks then reads their vectors back instead of running the model.
+    Values are opaque bytes; the embedder supplies the encode/decode pair.
+
+    Args:
+        path (str): SQLite database file. Created if missing; several embedders can share it.
+        model_name (str): Model whose embeddings are stored; part of every key.
+    """
+    # keys per SELECT ... IN (...), below SQLite's bound-parameter limit
+    LOOKUP_BATCH_SIZE = 500
+
+    def __init__(self, path: str, model_name: str):
+        self.model_name = model_name
+        # embed() runs in worker threads (asyncio.to_thread), so the connection is shared under a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb_cache ("
+                "hash BLOB NOT NULL, model TEXT NOT NULL, value BLOB NOT NULL, "
+                "PRIMARY KEY (hash, model)) WITHOUT ROWID"
+            )
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256((self.model_name + "\0" + text).encode()).digest()
+
+    def _get_many(self, keys: List[bytes]) -> Dict[bytes, bytes]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), self.LOOKUP_BATCH_SIZE):
+                batch = keys[i:i + self.LOOKUP_BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT hash, value FROM emb_cache WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    (self.model_name, *batch),
+                )
+                found.update(rows)
+        return found
+
+    def _put_many(self, items: List[Tuple[bytes, bytes]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO emb_cache (hash, model, value) VALUES (?, ?, ?)",
+                [(key, self.model_name, value) for key, value in items],
+            )
+
+    def get_or_compute(self,
+                       texts: List[str],
+                       compute: Callable[[List[str]], List[Any]],
+                       encode: Callable[[Any], bytes],
+                       decode: Callable[[bytes], Any]
+                       ) -> List[Any]:
+        """
+        Embeddings for `texts` in order; only texts missing from the cache are passed to `compute`.
+
+        Args:
+            texts (List[str]): Texts to embed.
+            compute (Callable[[List[str]], List[Any]]): Embeds a list of texts, one result per text.
+            encode (Callable[[Any], bytes]): Serializes one embedding for storage.
+            decode (Callable[[bytes], Any]): Restores one embedding from storage.
+
+        Returns:
+            List[Any]: One embedding per input text.
+        """
+        keys = [self._key(text) for text in texts]
+        found = self._get_many(list(dict.fromkeys(keys)))
+        results = {key: decode(value) for key, value in found.items()}
+
+        # embed each missing text once, even if it repeats in the input
+        missing = {key: text for key, text in zip(keys, texts) if key not in results}
+        if missing:
+            fresh = compute(list(missing.values()))
+            results.update(zip(missing.keys(), fresh))
+            self._put_many([(key, encode(results[key])) for key in missing])
+        logger.debug(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return [results[key] for key in keys]
+
+
+def _encode_dense(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+def _decode_dense(value: bytes) -> np.ndarray:
+    return np.frombuffer(value, dtype=np.float32)
+
+def _encode_sparse(embedding: SparseEmbedding) -> bytes:
+    # int64 indices followed by float32 values; n is recovered from the length (12 bytes per entry)
+    return np.asarray(embedding.indices, dtype=np.int64).tobytes() + np.asarray(embedding.values, dtype=np.float32).tobytes()
+
+def _decode_sparse(value: bytes) -> SparseEmbedding:
+    n = len(value) // 12
+    return SparseEmbedding(
+        values=np.frombuffer(value, dtype=np.float32, offset=8 * n),
+        indices=np.frombuffer(value, dtype=np.int64, count=n),
+    )
+
+
+# model name -> function embedding one query with that model; filled in by the embedders
+_query_embedders: Dict[str, Callable[[str], Any]] = {}
+
+@lru_cache(maxsize=4096)
+def _embed_query_cached(model_id: str, text: str) -> Any:
+    """
+    Embed a single query with the registered model, memoized per (model_id, text).
+
+    The returned arrays are shared by every caller hitting the same entry, so they are made read-only.
+    """
+    embedding = _query_embedders[model_id](text)
+    if isinstance(embedding, SparseEmbedding):
+        embedding.indices.setflags(write=False)
+        embedding.values.setflags(write=False)
+    else:
+        embedding.setflags(write=False)
+    return embedding
+
+
+def _length_order(texts: List[str]) -> np.ndarray:
+    """Indices that sort `texts` by length (stable), used to batch similar lengths together."""
+    return np.argsort(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)), kind="stable")
+
+
 class DenseEmbedder:
     def __init__(self, 
                  embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2", 
+                 cache_path: Optional[str] = None,
+                 parallel_min_texts: int = 2048,
                  ):
         """
         Initialize the DenseEmbedder with a FastEmbed TextEmbedding model.
@@ -24,6 +208,11 @@ class DenseEmbedder:
             embedding_model_name (str): Name of the embedding model. By default, 
                 a sentence-transformers model is used. FastEmbed's TextEmbedding 
                 is loaded with this model name.
+            cache_path (Optional[str]): SQLite file for the persistent document embedding cache.
+                None disables it. Single query strings are memoized in memory instead (`_embed_query_cached`).
+            parallel_min_texts (int): Document batches at least this large are embedded with FastEmbed's
+                data-parallel workers (one per core). Smaller inputs and all queries run in-process, so
+                no worker pool is started per call.
 
         Notes:
             - FastEmbed automatically normalizes embeddings. 
@@ -35,6 +224,15 @@ class DenseEmbedder:
         self.embedding_dim = self.model.embedding_size
         logger.debug(f"Dense Embedder initialized with embedding_dim={self.embedding_dim}")
 
+        # coalesces concurrent single-query embeddings into one model call
+        self.query_batcher = AsyncBatcher(self._embed_query_batch)
+
+        self.cache = EmbeddingCache(cache_path, embedding_model_name) if cache_path else None
+        self.parallel_min_texts = parallel_min_texts
+
+        self.model_name = embedding_model_name
+        _query_embedders[embedding_model_name] = lambda text: next(iter(self.model.query_embed(text, parallel=None))).astype(np.float32, copy=False)
+
     def normalize_embed(self, vector: np.ndarray) -> np.ndarray:
         """
         Normalize a vector or array of vectors to unit length.
@@ -43,17 +241,27 @@ class DenseEmbedder:
             vector (np.ndarray): The input vector or array of vectors to normalize.
 
         Returns:
-            np.ndarray: Normalized vector(s) with unit L2 norm. 
-                - If the input vector has zero norm, it is returned unchanged.
+            np.ndarray: Normalized vector(s) with unit L2 norm, one norm per row for a 2-D array.
+                Normalized in place when the input is a writable float32 array.
+                - Rows with zero norm are returned unchanged.
 
         Notes:
             Normalization is useful when embeddings need to be compared using 
             cosine similarity, ensuring that all vectors lie on the unit hypersphere.
         """
-        norm = np.linalg.norm(vector)
-        return  vector / norm if norm != 0 else vector
+        vector = np.asarray(vector, dtype=np.float32)
+        if not vector.flags.writeable:
+            vector = vector.copy()
+        norms = np.linalg.norm(vector, axis=-1, keepdims=True)
+        np.divide(vector, norms, out=vector, where=norms != 0)
+        return vector
 
-    def embed(self, text: Union[str, List[str]], doc_type: str, is_normalize: bool = False) -> np.ndarray:
+    def embed(self,
+              text: Union[str, List[str]],
+              doc_type: str,
+              is_normalize: bool = False,
+              output_dtype: Optional[np.dtype] = None
+              ) -> np.ndarray:
         """
         Embed text using the dense model.
 
@@ -62,9 +270,12 @@ class DenseEmbedder:
             doc_type (str): Either "query" or "documents". Determines which embedding method to use.
             is_normalize (bool): Whether to normalize the resulting embedding vectors. 
                 - The DenseEmbedder creates a fastembed TextEmbedding object, for which the embeddings are already normalized, so this can typically be left as False.
+            output_dtype (Optional[np.dtype]): Cast the result, e.g. np.float16 to halve the memory held
+                between embedding and upsert for a float16 collection. None returns float32.
 
         Returns:
-            np.ndarray: Embedding vector(s) as a numpy array.
+            np.ndarray: Embedding vector(s) as a numpy array. A single query string gives one vector,
+                a list of queries gives one row per query.
         """
 
         if not text:
@@ -76,16 +287,26 @@ class DenseEmbedder:
                 error_msg = "Invalid document type for embedding. Should be one of: ['query', 'documents']"
                 logger.error(error_msg)
                 raise ValueError(error_msg)
+
+            if doc_type == "query" and isinstance(text, str):
+                # single query: the cached vector itself, no (1, dim) batch array around it
+                embedding = _embed_query_cached(self.model_name, text)
+                if is_normalize:
+                    embedding = self.normalize_embed(embedding)
+                return embedding.astype(output_dtype, copy=False) if output_dtype is not None else embedding
             
             if doc_type == "documents":
                 if not isinstance(text, list):
                     text = [text]
-                embeddings = list(self.model.passage_embed(text))
+                if self.cache is not None:
+                    embeddings = self._fill(
+                        self.cache.get_or_compute(text, self._passage_embed, _encode_dense, _decode_dense), len(text)
+                    )
+                else:
+                    embeddings = self._passage_embed(text)
             
-            else: # embed query
-                embeddings = list(self.model.query_embed(text))
-            
-            embeddings = np.array(embeddings)
+            else: # embed a list of queries
+                embeddings = self._fill(self.model.query_embed(text, parallel=None), len(text))
             
             if is_normalize:
                 logger.debug("Normalizing embeddings")
@@ -94,27 +315,96 @@ class DenseEmbedder:
             else:
                 logger.debug("NOT Normalizing embeddings")
 
+            if output_dtype is not None:
+                embeddings = embeddings.astype(output_dtype, copy=False)
+
             logger.info(f"Dense Embeddings successfully created with shape {embeddings.shape}")
-            if doc_type == "documents":
-                return embeddings
-            else:
-                return embeddings[0]
+            return embeddings
             
         except Exception as e:
-            logger.error(f"Failed to create dense embeddings.")
+            logger.error("Failed to create dense embeddings.")
             raise RuntimeError(f"Dense embeddings not created due to : {e}")
 
+    async def aembed(self,
+                     text: Union[str, List[str]],
+                     doc_type: str,
+                     is_normalize: bool = False,
+                     output_dtype: Optional[np.dtype] = None
+                     ) -> np.ndarray:
+        """
+        Asynchronously embed text using the dense model.
+
+        Runs `embed` in a worker thread so model inference does not block the event loop
+        and can overlap with other I/O (e.g. sparse embedding or cache lookups).
+        Single query strings from concurrent requests are coalesced into one batched
+        model call by `query_batcher`.
+
+        Parameters:
+            text (str or List[str]): Text or list of texts to embed.
+            doc_type (str): Either "query" or "documents".
+            is_normalize (bool): Whether to normalize the resulting embedding vectors.
+            output_dtype (Optional[np.dtype]): Cast the result to this dtype. None returns float32.
+
+        Returns:
+            np.ndarray: Embedding vector(s) as a numpy array.
+        """
+        if doc_type == "query" and isinstance(text, str) and text:
+            try:
+                embedding = await self.query_batcher.submit(text)
+            except Exception as e:
+                logger.error("Failed to create dense embeddings.")
+                raise RuntimeError(f"Dense embeddings not created due to : {e}")
+            embedding = self.normalize_embed(embedding) if is_normalize else embedding
+            return embedding.astype(output_dtype, copy=False) if output_dtype is not None else embedding
+        return await asyncio.to_thread(self.embed, text, doc_type, is_normalize, output_dtype)
+
+    def _embed_query_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed a batch of queries, returning one vector per query; repeated queries come from the in-memory cache."""
+        return [_embed_query_cached(self.model_name, text) for text in texts]
+
+    def _fill(self, vectors, n: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Copy `n` vectors, as they are produced, into one preallocated (n, embedding_dim) float32 array.
+        The i-th vector goes to row rows[i] (row i when `rows` is None).
+        """
+        out = np.empty((n, self.embedding_dim), dtype=np.float32)
+        if rows is None:
+            rows = range(n)
+        for row, vector in zip(rows, vectors):
+            out[row] = vector
+        return out
+
+    def _passage_embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed documents in-process; only large ingests pay for FastEmbed's worker processes,
+        whose start-up (a model load per worker) is amortized over the batch.
+        """
+        parallel = 0 if len(texts) >= self.parallel_min_texts else None
+        # shortest first, so each model batch pads to a similar length; rows land back in input order
+        order = _length_order(texts)
+        return self._fill(self.model.passage_embed([texts[i] for i in order], parallel=parallel), len(texts), rows=order)
+
 class SparseEmbedder:
     def __init__(
             self, 
-            embedding_model_name: str = "Qdrant/bm25"
+            embedding_model_name: str = "Qdrant/bm25",
+            cache_path: Optional[str] = None
     ):
         """
         Parameters:
         - model_name: name of sentence-transformers model
+        - cache_path: SQLite file for the persistent embedding cache of list inputs (documents); None disables it
         """
         self.model = SparseTextEmbedding(embedding_model_name)
-        logger.debug(f"Sparse Embedder initialized")
+        logger.debug("Sparse Embedder initialized")
+
+        self.model_name = embedding_model_name
+        _query_embedders[embedding_model_name] = lambda text: next(iter(self.model.embed(text)))
+
+        # coalesces concurrent single-text embeddings into one worker thread hop; repeated texts come from the in-memory cache
+        self.batcher = AsyncBatcher(lambda texts: [_embed_query_cached(self.model_name, text) for text in texts])
+
+        self.cache = EmbeddingCache(cache_path, embedding_model_name) if cache_path else None
 
     def embed(self, text: Union[str, List[str]]) -> list:
         """
@@ -132,15 +422,47 @@ class SparseEmbedder:
             return []
 
         try:
-            embeddings = list(self.model.embed(text))
+            if self.cache is not None and isinstance(text, list):
+                embeddings = self.cache.get_or_compute(text, self._embed_list, _encode_sparse, _decode_sparse)
+            elif isinstance(text, list):
+                embeddings = self._embed_list(text)
+            else:
+                embeddings = [_embed_query_cached(self.model_name, text)]
             logger.info("Sparse embeddings created successfully")
             # return np.array(embeddings)
             return embeddings
         
         except Exception as e:
-            logger.error(f"Unable to create sparse embeddings")
+            logger.error("Unable to create sparse embeddings")
             raise RuntimeError(f"Sparse embeddings not created due to : {e}")
 
+    def _embed_list(self, texts: List[str]) -> list:
+        """Embed texts sorted by length (less padding for transformer models), returned in input order."""
+        order = _length_order(texts)
+        embeddings = [None] * len(texts)
+        for i, embedding in zip(order, self.model.embed([texts[i] for i in order])):
+            embeddings[i] = embedding
+        return embeddings
+
+    async def aembed(self, text: Union[str, List[str]]) -> list:
+        """
+        Asynchronously create sparse embeddings by running `embed` in a worker thread.
+        Single strings from concurrent requests are coalesced into one batched model call.
+
+        Args:
+            text (str | List[str]): A single string or list of strings to embed.
+
+        Returns:
+            list: List of sparse embeddings.
+        """
+        if isinstance(text, str) and text:
+            try:
+                return [await self.batcher.submit(text)]
+            except Exception as e:
+                logger.error("Unable to create sparse embeddings")
+                raise RuntimeError(f"Sparse embeddings not created due to : {e}")
+        return await asyncio.to_thread(self.embed, text)
+
         
 if __name__ == "__main__":
     from config import DENSE_EMBEDDING_MODEL, SPARSE_EMBEDDING_MODEL
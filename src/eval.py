@@ -1,7 +1,9 @@
 from datasets import load_dataset
 import pandas as pd
+import numpy as np
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from config import (
                     DENSE_EMBEDDING_MODEL,
                     SPARSE_EMBEDDING_MODEL,
@@ -17,6 +19,8 @@ ds = load_dataset("hotpotqa/hotpot_qa", "distractor")
 train, dev = ds["train"], ds["validation"]
 
 collection_name = "eval"
+# only the keys needed to map a hit back to its parent chunk
+HIT_PAYLOAD_KEYS = ["metadata.source", "metadata.parent_id"]
 data_dir = "../data/hotpot_paragraphs"
 os.makedirs(data_dir, exist_ok=True)
 
@@ -75,13 +79,8 @@ parent_chunks, child_chunks = parent_child_splitter(
                                                     child_chunk_overlap=50,                                                       
 
                                              )
-parent_map = {}
-for p in parent_chunks:
-    meta = p.get("metadata", {})
-    src = meta.get("source", "")
-    pid = meta.get("id", None)
-    if src and pid is not None:
-        parent_map[(src, int(pid))] = p
+# the splitter always sets source and id on parent metadata
+parent_map = {(p["metadata"]["source"], int(p["metadata"]["id"])): p for p in parent_chunks}
 
 os.makedirs("../eval", exist_ok=True)  
 with open("../eval/parents.json", "w") as f:
@@ -96,9 +95,11 @@ sparse_embedder = SparseEmbedder(SPARSE_EMBEDDING_MODEL)
 qstore = QdrantStore(vector_size=dense_embedder.embedding_dim, collection_name=collection_name)
 reranker = Rerank(CROSS_ENCODER_MODEL)
 
-# 1. create embeddings of text
-dense_embeds = dense_embedder.embed(text=chunks, doc_type="documents")
-sparse_embeds = sparse_embedder.embed(chunks)
+# 1. create embeddings of text; dense (ONNX) and sparse (tokenizer + IDF) run side by side
+with ThreadPoolExecutor(2) as ex:
+    dense_future = ex.submit(dense_embedder.embed, chunks, "documents")
+    sparse_future = ex.submit(sparse_embedder.embed, chunks)
+    dense_embeds, sparse_embeds = dense_future.result(), sparse_future.result()
 
 payload = []
 for i in range(len(chunks)):
@@ -106,28 +107,34 @@ for i in range(len(chunks)):
 
 qstore.upsert(dense_embeds, sparse_embeds, payload, upsert_batch_size=500)
 
-recall_list = []
+# embed all questions in one call per model instead of one call per sample
+queries = [sample["question"] for sample in question_answer]
+with ThreadPoolExecutor(2) as ex:
+    dense_future = ex.submit(dense_embedder.embed, queries, "query")
+    sparse_future = ex.submit(sparse_embedder.embed, queries)
+    all_dense, all_sparse = dense_future.result(), sparse_future.result()
+
+retrieved_sources, relevant_sources = [], []
 for n, sample in enumerate(question_answer):
     query = sample["question"]
     answer = sample["answer"]
     relevant_docs = sample["supporting_facts"]
 
-    dense_query_embed = dense_embedder.embed(query, doc_type="query")[0]
-    sparse_query_embed = sparse_embedder.embed(query)
+    dense_query_embed = all_dense[n]
+    sparse_query_embed = [all_sparse[n]]
 
-    hits = qstore.search(dense_query_vector=dense_query_embed, sparse_query_vector=sparse_query_embed, hybrid=True, top_k=50)
-    retrieved_parents = []
-    seen_keys = set()
+    hits = qstore.search(dense_query_vector=dense_query_embed, sparse_query_vector=sparse_query_embed, hybrid=True, top_k=50,
+                         with_payload=HIT_PAYLOAD_KEYS)
 
-    for hit in hits.points:
-        m = hit.payload.get("metadata", {})
-        key = (m.get("source", "")), int(m.get("parent_id", -1))
-        if key in seen_keys:
-            continue  # avoid duplicates if multiple child-chunks from same parent are returned
-        parent = parent_map.get(key)
-        if parent is not None:
-            retrieved_parents.append(parent)
-            seen_keys.add(key)
+    # (source, parent_id) columns; np.unique keeps the first child-chunk of each parent
+    metas = [hit.payload["metadata"] for hit in hits.points]
+    srcs = np.array([m["source"] for m in metas], dtype=str)
+    pids = np.array([m["parent_id"] for m in metas], dtype=np.int64)
+    keys = np.empty(len(metas), dtype=[("source", srcs.dtype), ("parent_id", np.int64)])
+    keys["source"], keys["parent_id"] = srcs, pids
+    _, first = np.unique(keys, return_index=True)
+    first.sort()  # back to hit (rank) order
+    retrieved_parents = [parent_map[key] for key in zip(srcs[first].tolist(), pids[first].tolist()) if key in parent_map]
 
     print(f"retrieved_parents: {retrieved_parents[0]}")
     ranks = reranker.rerank(query, retrieved_parents, get_all=False, top_k=20)
@@ -139,24 +146,30 @@ for n, sample in enumerate(question_answer):
     print(f"query: {query}")
     print(f"context:{context}")
 
-    retrieved_top_k_sources = []
-    for entry in context:
-        retrieved_top_k_sources.append(entry["metadata"]["source"].replace(".txt",""))
-    
-    retrieved_top_k_sources = set(retrieved_top_k_sources)
-    relevant_docs = set(relevant_docs)
+    retrieved_top_k_sources = list(dict.fromkeys(entry["metadata"]["source"].replace(".txt","") for entry in context))
+    relevant_docs = list(dict.fromkeys(relevant_docs))
     print(f"retrieved_top_k_sources {retrieved_top_k_sources}")
     print(f"relevant_docs: {relevant_docs}")
-    relevant_retrieved = retrieved_top_k_sources.intersection(relevant_docs)
-    print(relevant_retrieved)
-    recall_k = len(relevant_retrieved)/len(relevant_docs)
-    recall_list.append({"item_id": n, "recall_k": recall_k})
-    
-total_recall = 0.0
-for item in recall_list:
-    total_recall += item["recall_k"]
-    
-avg_recall = total_recall / len(recall_list)
+    retrieved_sources.append(retrieved_top_k_sources)
+    relevant_sources.append(relevant_docs)
+
+# recall for all samples at once: pad both source lists into (n_samples, width) arrays and count
+# the relevant docs found among the retrieved ones (both lists are duplicate-free)
+def _pad(rows):
+    out = np.full((len(rows), max(map(len, rows), default=0)), None, dtype=object)
+    for i, row in enumerate(rows):
+        out[i, :len(row)] = row
+    return out
+
+retrieved = _pad(retrieved_sources)
+relevant = _pad(relevant_sources)
+rel_counts = np.fromiter(map(len, relevant_sources), dtype=np.int64, count=len(relevant_sources))
+found = (relevant[:, :, None] == retrieved[:, None, :]).any(axis=2)
+found &= np.arange(relevant.shape[1]) < rel_counts[:, None]   # ignore padding
+recall_k = found.sum(axis=1) / rel_counts
+
+recall_list = [{"item_id": n, "recall_k": r} for n, r in enumerate(recall_k.tolist())]
+avg_recall = recall_k.mean()
 print(recall_list)
 print(avg_recall)
   
@@ -1,8 +1,17 @@
 # file_loader.py
 
-from typing import List, Tuple, Union
+import io
+import mmap
+from typing import List, Optional, Tuple, Union
 import os
 import fitz  # for PDF reading
+from src.process_pool import get_process_pool
+
+# Plain extraction for indexing: keep whitespace and clip to the page, but let ligatures expand to
+# their letters (default "text" flags preserve them) so "ﬁ" is indexed as "fi"
+PDF_TEXT_FLAGS = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+# .txt files at least this large are read through a read-only memory map instead of a read() copy
+MMAP_MIN_BYTES = 1 << 20
 
 class FileLoader:
     """Handles loading text from local file or a directory.(txt/pdf). Can be extended for cloud sources.
@@ -10,7 +19,10 @@ class FileLoader:
     """
 
     @staticmethod
-    def load_files(path: Union[str, os.PathLike]) -> List[Tuple[str, str]]:
+    def load_files(path: Union[str, os.PathLike], max_workers: Optional[int] = None) -> List[Tuple[str, str]]:
+        """Loads one file, or every file of a directory. Directory files are parsed in-process unless
+           `max_workers` > 1 opts into the shared spawn-context worker pool (PDF text extraction is CPU-bound).
+        """
         texts = []
         if not os.path.exists(path):
             raise FileNotFoundError(f"Path does not exist: {path}")
@@ -18,32 +30,93 @@ class FileLoader:
         if os.path.isfile(path):
             texts.append(FileLoader._load_single_file(path))
         elif os.path.isdir(path):
-            for file in os.listdir(path):
-                file_path = os.path.join(path, file)
-                try:
-                    texts.append(FileLoader._load_single_file(file_path))
-                except Exception as e:
-                    print(f"Error reading file {file}: {e}")
+            # scandir's entries carry the file type, so subdirectories are skipped without a stat per file
+            with os.scandir(path) as entries:
+                file_paths = [entry.path for entry in entries if entry.is_file()]
+            if max_workers and max_workers > 1 and len(file_paths) > 1:
+                texts.extend(get_process_pool(max_workers).map(FileLoader._try_load_single_file, file_paths))
+            else:
+                texts.extend(map(FileLoader._try_load_single_file, file_paths))
         else:
             raise ValueError(f"Path is neither a file nor a directory: {path}")
 
         return [t for t in texts if t is not None]
 
+    @staticmethod
+    def load_bytes(filename: str, content: bytes) -> List[Tuple[str, str]]:
+        """Loads text from an in-memory file (txt/pdf), e.g. an upload that is already in memory.
+           Returns a list with a single (source, text) entry, or an empty list for unsupported types.
+        """
+        ext = os.path.splitext(filename)[1].lower()
+
+        if ext in [".txt", ""]:
+            return [(filename, content.decode("utf-8"))]
+        elif ext == ".pdf":
+            with fitz.open(stream=content, filetype="pdf") as pdf_doc:
+                return [(filename, FileLoader._pdf_text(pdf_doc))]
+        else:
+            print(f"Skipping unsupported file type: {filename}")
+            return []
+
+    @staticmethod
+    def _pdf_text(pdf_doc) -> str:
+        """Page texts joined by newlines, written into one buffer instead of a list of page strings plus a join.
+           Zero-area and textless pages are skipped.
+        """
+        buf = io.StringIO()
+        wrote = False
+        for page in pdf_doc:
+            if page.rect.is_empty:
+                continue
+            text = page.get_text("text", flags=PDF_TEXT_FLAGS, sort=False)
+            if not text:
+                continue
+            if wrote:
+                buf.write("\n")
+            buf.write(text)
+            wrote = True
+        return buf.getvalue()
+
+    @staticmethod
+    def _try_load_single_file(path: str) -> Optional[Tuple[str, str]]:
+        """_load_single_file that reports and skips unreadable files, so one bad file does not fail the directory."""
+        try:
+            return FileLoader._load_single_file(path)
+        except Exception as e:
+            print(f"Error reading file {os.path.basename(path)}: {e}")
+            return None
+
+    @staticmethod
+    def _read_text(path: str) -> str:
+        """Reads a UTF-8 text file in one sequential pass (memory-mapped from MMAP_MIN_BYTES up).
+           Newlines are normalized to "\\n" as in text-mode open().
+        """
+        with open(path, "rb") as f:
+            fd = f.fileno()
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)   # larger readahead (Linux)
+            if os.fstat(fd).st_size >= MMAP_MIN_BYTES:
+                with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                    has_cr = mm.find(b"\r") != -1
+                    text = str(mm, "utf-8")   # decoded straight from the mapped pages
+            else:
+                data = f.read()
+                has_cr = b"\r" in data
+                text = data.decode("utf-8")
+        if has_cr:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
+
     @staticmethod
     def _load_single_file(path: str) -> Tuple[str, str]:
         filename = os.path.basename(path)
         ext = os.path.splitext(filename)[1].lower()
 
         if ext in [".txt", ""]:
-            with open(path, "r", encoding="utf-8") as f:
-                text = f.read()
-            return filename, text
+            return filename, FileLoader._read_text(path)
         elif ext == ".pdf":
-            pdf_text = []
             with fitz.open(path) as pdf_doc:
-                for page in pdf_doc:
-                    pdf_text.append(page.get_text("text"))
-            return filename, "\n".join(pdf_text)
+                return filename, FileLoader._pdf_text(pdf_doc)
         else:
             print(f"Skipping unsupported file type: {filename}")
             return None
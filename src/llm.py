@@ -1,16 +1,98 @@
 from openai import OpenAI, AsyncOpenAI
-import asyncio
-from typing import List, AsyncGenerator
+import hashlib
+import httpx
+import json
+import logging
+from redis import Redis, RedisError
+from redis.asyncio import Redis as AsyncRedis
+from typing import List, AsyncGenerator, Iterator, Optional
+from contextlib import nullcontext
+from src.admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+# Fixed seed for every completion; it also makes cached responses valid to replay
+SEED = 42
+# Characters per chunk when a cached response is replayed through stream/async_stream
+REPLAY_CHUNK_CHARS = 80
 
 class LLM:
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
-        """Initialize with required API key and model name. 
+    def __init__(self,
+                 api_key: str,
+                 model: str = "gpt-3.5-turbo",
+                 http_client: Optional[httpx.AsyncClient] = None,
+                 response_cache: Optional[Redis] = None,
+                 async_response_cache: Optional[AsyncRedis] = None,
+                 cache_ttl: Optional[int] = None,
+                 admission: Optional[AdmissionController] = None):
+        """Initialize with required API key and model name.
         Args:
             api_key (str): OpenAI API key
             model (str): Default model to use (e.g., "gpt-4", "gpt-3.5-turbo"). Default set to gpt-3.5-turbo
-        """  
+            http_client (httpx.AsyncClient, optional): Shared connection pool for the async client. The caller owns its lifecycle.
+            response_cache (Redis, optional): Redis client caching complete responses of `invoke`/`stream`, keyed by
+                a hash of (model, messages, seed). None disables caching for the sync methods.
+            async_response_cache (redis.asyncio.Redis, optional): The same cache for `async_invoke`/`async_stream`.
+            cache_ttl (int, optional): Seconds a cached response is kept. None keeps it until evicted.
+            admission (AdmissionController, optional): Bounds concurrent `async_invoke`/`async_stream` API calls.
+                A stream holds its slot until it is fully consumed. None leaves them unbounded.
+        """
         self.llm = OpenAI(api_key=api_key)
+        self.async_llm = AsyncOpenAI(api_key=api_key, http_client=http_client)
         self.model = model
+        self.response_cache = response_cache
+        self.async_response_cache = async_response_cache
+        self.cache_ttl = cache_ttl or None
+        self.admission = admission
+
+    def _cache_key(self, messages: List[dict]) -> str:
+        """Content address of a request: BLAKE2b of the canonical JSON of (model, messages, seed)."""
+        payload = json.dumps({"m": self.model, "msgs": messages, "seed": SEED}, sort_keys=True)
+        return "llm:" + hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Cached response for `key`, or None on a miss. Redis errors are logged and treated as a miss."""
+        if self.response_cache is None:
+            return None
+        try:
+            value = self.response_cache.get(key)
+        except RedisError as e:
+            logger.warning("LLM response cache lookup failed: %s", e)
+            return None
+        return value.decode("utf-8") if value is not None else None
+
+    def _cache_set(self, key: str, content: str) -> None:
+        if self.response_cache is None or not content:
+            return
+        try:
+            self.response_cache.set(key, content, ex=self.cache_ttl)
+        except RedisError as e:
+            logger.warning("LLM response cache write failed: %s", e)
+
+    async def _acache_get(self, key: str) -> Optional[str]:
+        """Async `_cache_get`."""
+        if self.async_response_cache is None:
+            return None
+        try:
+            value = await self.async_response_cache.get(key)
+        except RedisError as e:
+            logger.warning("LLM response cache lookup failed: %s", e)
+            return None
+        return value.decode("utf-8") if value is not None else None
+
+    async def _acache_set(self, key: str, content: str) -> None:
+        if self.async_response_cache is None or not content:
+            return
+        try:
+            await self.async_response_cache.set(key, content, ex=self.cache_ttl)
+        except RedisError as e:
+            logger.warning("LLM response cache write failed: %s", e)
+
+    @staticmethod
+    def _replay(content: str) -> Iterator[str]:
+        """Yield a cached response in small pieces so streaming callers still render it incrementally."""
+        for i in range(0, len(content), REPLAY_CHUNK_CHARS):
+            yield content[i:i + REPLAY_CHUNK_CHARS]
 
     def invoke(self, messages: list) -> str:
         """Get complete response.
@@ -18,12 +100,17 @@ class LLM:
             messages (list): List of messages in the chat format.
         returns: str: Complete response from the LLM
         """
-        response = self.llm.chat.completions.create( 
+        key = self._cache_key(messages)
+        if (cached := self._cache_get(key)) is not None:
+            return cached
+        response = self.llm.chat.completions.create(
         model=self.model,
         messages=messages,
-        seed=42
+        seed=SEED
     )
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        self._cache_set(key, content)
+        return content
 
     def stream(self, messages: list):
         """Stream response token by token.
@@ -31,15 +118,23 @@ class LLM:
             messages (list): List of messages in the chat format.
         yields: str: Yields response token by token.
         """
+        key = self._cache_key(messages)
+        if (cached := self._cache_get(key)) is not None:
+            yield from self._replay(cached)
+            return
         stream = self.llm.chat.completions.create(
             model=self.model,
             messages=messages,
             stream=True,
-            seed=42
+            seed=SEED
         )
+        parts = []
         for chunk in stream:
             if content := chunk.choices[0].delta.content:
+                parts.append(content)
                 yield content
+        # only a fully consumed stream is cached
+        self._cache_set(key, "".join(parts))
 
     async def async_invoke(self, messages: List[dict]) -> str:
         """
@@ -48,33 +143,46 @@ class LLM:
             messages (list): List of messages in the chat format.
         returns: str: Complete response from the LLM
         """
-        loop = asyncio.get_event_loop()
-        # Run blocking invoke in threadpool
-        return await loop.run_in_executor(None, self.invoke, messages)
+        key = self._cache_key(messages)
+        if (cached := await self._acache_get(key)) is not None:
+            return cached
+        # Awaited on the event loop with the AsyncOpenAI client: no worker thread per request
+        async with self.admission or nullcontext():
+            response = await self.async_llm.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                seed=SEED
+            )
+        content = response.choices[0].message.content
+        await self._acache_set(key, content)
+        return content
 
     async def async_stream(self, messages: List[dict]) -> AsyncGenerator[str, None]:
         """Asynchronously stream response token by token.
+        Uses the AsyncOpenAI client so tokens are consumed on the event loop
+        without blocking other coroutines between chunks.
         Args:
             messages (list): List of messages in the chat format.
         yields: str: Yields response token by token.
         """
-        loop = asyncio.get_event_loop()
-        # Create a queue to buffer the streaming results
-        queue = asyncio.Queue()
-
-        def _stream():
-            for chunk in self.stream(messages):
-                asyncio.run_coroutine_threadsafe(queue.put(chunk), loop)
-            asyncio.run_coroutine_threadsafe(queue.put(None), loop)  # signal completion
-
-        # Run blocking stream in executor
-        asyncio.get_running_loop().run_in_executor(None, _stream)
-
-        while True:
-            chunk = await queue.get()
-            if chunk is None:
-                break
-            yield chunk
+        key = self._cache_key(messages)
+        if (cached := await self._acache_get(key)) is not None:
+            for piece in self._replay(cached):
+                yield piece
+            return
+        parts = []
+        async with self.admission or nullcontext():
+            stream = await self.async_llm.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=True,
+                seed=SEED
+            )
+            async for chunk in stream:
+                if chunk.choices and (content := chunk.choices[0].delta.content):
+                    parts.append(content)
+                    yield content
+        await self._acache_set(key, "".join(parts))
 
 if __name__ == "__main__":
     from config import API_KEY
@@ -1,49 +1,44 @@
 from minio import Minio
 from fastapi import File, UploadFile
 import os
-import io
+import asyncio
 import logging
 # from builder import build_minio_client
 from src.config import MINIO_BUCKET
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 # minio_client = build_minio_client()
 
+# Multipart part size for streamed uploads (MinIO's minimum is 5 MiB)
+MINIO_PART_SIZE = 10 * 1024 * 1024
+# Read/write size for downloads; large chunks amortize the per-chunk read and write syscalls
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
 def upload_file_to_minio(minio_client: Minio, file: UploadFile, minio_bucket:str=MINIO_BUCKET) -> dict:
     """
     Uploads a FastAPI UploadFile to MinIO.
+    The upload's spooled temporary file is streamed in MINIO_PART_SIZE parts, so at most one part is held in memory.
     Returns metadata dict with bucket and object path.
     """
-    content = file.read()  # read bytes
+    file.file.seek(0)
     minio_client.put_object(
         bucket_name=minio_bucket,
         object_name=file.filename,
-        data=io.BytesIO(content),  # reset stream
-        length=len(content),
+        data=file.file,
+        length=-1,  # unknown length: multipart upload, one part in memory at a time
+        part_size=MINIO_PART_SIZE,
     )
     return {"bucket": MINIO_BUCKET, "object_name": file.filename, "minio_path": MINIO_BUCKET + "/" + file.filename}
 
 
 async def async_upload_file_to_minio(minio_client: Minio, file: UploadFile, minio_bucket: str=MINIO_BUCKET) -> dict:
     """
-    Uploads a FastAPI UploadFile to MinIO.
+    Uploads a FastAPI UploadFile to MinIO without blocking the event loop.
+    The blocking streamed PUT of `upload_file_to_minio` runs in a worker thread.
     Returns metadata dict with bucket and object path.
     """
-    content = await file.read()  # read bytes
-    minio_client.put_object(
-        bucket_name=minio_bucket,
-        object_name=file.filename,
-        data=io.BytesIO(content),  # reset stream
-        length=len(content),
-    )
-    return {"bucket": MINIO_BUCKET, "object_name": file.filename, "minio_path": MINIO_BUCKET + "/" + file.filename}
+    return await asyncio.to_thread(upload_file_to_minio, minio_client, file, minio_bucket)
 
 def download_file(minio_client: Minio, object_name: str, local_dir: str, minio_bucket: str=MINIO_BUCKET) -> str:
     """
@@ -54,25 +49,24 @@ def download_file(minio_client: Minio, object_name: str, local_dir: str, minio_b
     local_path = os.path.join(local_dir, object_name)
 
     response = minio_client.get_object(minio_bucket, object_name)
-    with open(local_path, "wb") as f:
-        for chunk in response.stream(32*1024):
-            f.write(chunk)
+    try:
+        with open(local_path, "wb") as f:
+            for chunk in response.stream(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+    finally:
+        # hand the connection back to the pool
+        response.close()
+        response.release_conn()
 
     return local_path
 
 async def async_download_file(minio_client: Minio, object_name: str, local_dir: str, minio_bucket: str=MINIO_BUCKET) -> str:
     """
-    Downloads a file from MinIO to local_dir.
+    Downloads a file from MinIO to local_dir without blocking the event loop.
+    The whole blocking GET and disk write of `download_file` run in one worker thread,
+    rather than one thread hop per chunk.
     Returns the local path.
     """
-    os.makedirs(local_dir, exist_ok=True)
-    local_path = os.path.join(local_dir, object_name)
-
-    response = minio_client.get_object(minio_bucket, object_name)
-    with open(local_path, "wb") as f:
-        for chunk in response.stream(32*1024):
-            f.write(chunk)
-
-    return local_path
+    return await asyncio.to_thread(download_file, minio_client, object_name, local_dir, minio_bucket)
 
 
@@ -0,0 +1,35 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# One pool per worker count, kept for the life of the process
+_POOLS: Dict[int, ProcessPoolExecutor] = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Return the process-wide pool with `max_workers` workers, creating it on first use.
+
+    Workers are started with the "spawn" method, so they do not inherit the server's threads,
+    locks and open connections as forked children would. The pool is reused across calls,
+    so the worker start-up (interpreter plus imports) is paid once, not per call.
+
+    Args:
+        max_workers (int): Number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor: The shared pool.
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.get(max_workers)
+        if pool is None:
+            pool = _POOLS[max_workers] = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.debug("Started a process pool with %s spawn workers", max_workers)
+        return pool
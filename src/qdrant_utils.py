@@ -1,28 +1,88 @@
+import asyncio
 import numpy as np
-from typing import List, Dict, Any, Optional
+from contextlib import nullcontext
+from collections.abc import Mapping
+from typing import List, Dict, Any, Optional, Union
 from fastembed import SparseEmbedding
 from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http.models import (
                                         VectorParams,
+                                        Datatype,
                                         SparseVectorParams, 
                                         # Distance, 
-                                        PointStruct, 
+                                        Batch,
                                         SparseVector, 
                                         FusionQuery, 
                                         Fusion, 
                                         Prefetch, 
+                                        QueryRequest,
                                         Filter, 
                                         FilterSelector,
                                         FieldCondition, 
                                         MatchValue, 
-                                        MatchAny
+                                        MatchAny,
+                                        HnswConfigDiff,
+                                        ScalarQuantization,
+                                        ScalarQuantizationConfig,
+                                        ScalarType,
+                                        SearchParams,
+                                        QuantizationSearchParams
                                     )
 import logging
+import os
 import uuid
+from src.admission import AdmissionController
 
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+
+
+def _materialize_payload(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a chunk record into a plain JSON-serializable payload.
+
+    Child chunks carry their metadata as a ChainMap over the shared parent metadata;
+    it is flattened into a dict only here, at serialization time.
+    """
+    metadata = record.get("metadata")
+    if isinstance(metadata, Mapping) and not isinstance(metadata, dict):
+        return {**record, "metadata": dict(metadata)}
+    return record
+
+
+def _random_point_ids(n: int) -> List[str]:
+    """Generate n random UUID4 point ids from a single urandom read instead of one per point."""
+    raw = np.frombuffer(os.urandom(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    return [str(uuid.UUID(bytes=row)) for row in map(bytes, raw)]
+
+
+# One client per Qdrant endpoint, shared by every QdrantStore in the process
+_CLIENTS: Dict[str, QdrantClient] = {}
+_ASYNC_CLIENTS: Dict[tuple, AsyncQdrantClient] = {}
+
+def get_qdrant_client(url: str) -> QdrantClient:
+    """
+    Return the process-wide client for `url`, creating it on first use.
+
+    Args:
+        url (str): Qdrant REST URL, e.g. "http://localhost:6333".
+
+    Returns:
+        QdrantClient: Client whose connection pool is reused across stores.
+    """
+    client = _CLIENTS.get(url)
+    if client is None:
+        client = _CLIENTS.setdefault(url, QdrantClient(url=url))
+    return client
+
+def get_async_qdrant_client(url: str, prefer_grpc: bool = False, grpc_port: int = 6334) -> AsyncQdrantClient:
+    """Async counterpart of `get_qdrant_client`; one client per (url, transport)."""
+    key = (url, prefer_grpc, grpc_port)
+    client = _ASYNC_CLIENTS.get(key)
+    if client is None:
+        client = _ASYNC_CLIENTS.setdefault(key, AsyncQdrantClient(url=url, prefer_grpc=prefer_grpc, grpc_port=grpc_port))
+    return client
 
 
 class QdrantStore:
@@ -38,10 +98,18 @@ class QdrantStore:
         sparse_modifier: str = "idf",
         dense_vector_name: str = "dense",
         sparse_vector_name: str = "sparse",
+        hnsw_m: int = 32,
+        hnsw_ef_construct: int = 256,
+        hnsw_ef: int = 128,
+        quantize: bool = True,
+        quantization_oversampling: float = 2.0,
+        dense_datatype: Optional[str] = None,
+        dense_on_disk: bool = False,
+        admission: Optional[AdmissionController] = None,
 ):      
         try:
-            self.client = client or QdrantClient(url=f"http://{host}:{port}")
-            self.async_client = async_client or AsyncQdrantClient(url=f"http://{host}:{port}")
+            self.client = client or get_qdrant_client(f"http://{host}:{port}")
+            self.async_client = async_client or get_async_qdrant_client(f"http://{host}:{port}")
         except Exception as e:
             logger.error("Unable to create Qdrant client")
             raise RuntimeError(f"Unable to create Qdrant client: {e}")
@@ -51,6 +119,21 @@ class QdrantStore:
         self.sparse_modifier = sparse_modifier
         self.dense_vector_name = dense_vector_name
         self.sparse_vector_name = sparse_vector_name
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.quantize = quantize
+        # storage type of the original dense vectors (e.g. "float16"); None keeps Qdrant's float32
+        self.dense_datatype = Datatype(dense_datatype) if dense_datatype else None
+        # original dense vectors on disk (memmapped); with quantize the int8 copies searched first stay in RAM,
+        # so only the oversampled candidates' originals are read back for rescoring
+        self.dense_on_disk = dense_on_disk
+        # bounds concurrent async searches; None leaves them unbounded
+        self.admission = admission
+        # applied to every dense query; int8 candidates are oversampled and rescored against the original vectors
+        self.dense_search_params = SearchParams(
+            hnsw_ef=hnsw_ef,
+            quantization=QuantizationSearchParams(rescore=True, oversampling=quantization_oversampling) if quantize else None
+        )
 
         self.create_collection_if_needed(self.collection_name) # calling it here so a collection can be created at the time of initialization
 
@@ -72,11 +155,16 @@ class QdrantStore:
                     self.client.create_collection(
                              collection_name=self.collection_name,
                              vectors_config={
-                                  self.dense_vector_name: VectorParams(size=self.vector_size, distance=self.distance)
+                                  self.dense_vector_name: VectorParams(size=self.vector_size, distance=self.distance,
+                                                                       datatype=self.dense_datatype, on_disk=self.dense_on_disk)
                              },
                              sparse_vectors_config={
                                   self.sparse_vector_name: SparseVectorParams(modifier=self.sparse_modifier)
-                             })
+                             },
+                             hnsw_config=HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct),
+                             quantization_config=ScalarQuantization(
+                                  scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+                             ) if self.quantize else None)
                     logger.info(f"Successfully created collection {self.collection_name}")
                         
                 except Exception as e:
@@ -85,6 +173,37 @@ class QdrantStore:
         else:
               logger.info(f"Using existing collection {collection_name}")
 
+    def _build_batches(self,
+                       dense_embeddings: Optional[np.ndarray],
+                       sparse_embeddings: Optional[List[SparseVectorParams]],
+                       metadatas: List[Dict[str, Any]],
+                       batch_size: int
+                       ) -> List[Batch]:
+        """
+        Column-oriented upsert batches of at most `batch_size` points: ids, vectors per vector name and payloads
+        as parallel lists, instead of one PointStruct (plus vector dict) per point.
+        """
+        if dense_embeddings is not None:
+            dense_embeddings = np.asarray(dense_embeddings)
+        ids = _random_point_ids(len(metadatas))
+        batches = []
+        for start in range(0, len(metadatas), batch_size):
+            end = start + batch_size
+            vectors = {}
+            if dense_embeddings is not None:
+                # float32 slices are not copied; narrower ones (float16) are widened one batch at a time
+                vectors[self.dense_vector_name] = dense_embeddings[start:end].astype(np.float32, copy=False).tolist()
+            if sparse_embeddings is not None:
+                vectors[self.sparse_vector_name] = [
+                    SparseVector(indices=sparse.indices, values=sparse.values) for sparse in sparse_embeddings[start:end]
+                ]
+            batches.append(Batch(
+                ids=ids[start:end],
+                vectors=vectors,
+                payloads=[_materialize_payload(metadata) for metadata in metadatas[start:end]]
+            ))
+        return batches
+
     def upsert(
         self,
         dense_embeddings: Optional[np.ndarray],
@@ -107,7 +226,7 @@ class QdrantStore:
             RuntimeError: If Qdrant upsert fails for any reason.
 
         Notes:
-            - The method constructs Qdrant PointStruct objects for each point.
+            - Points are sent as column-oriented Qdrant Batch objects (ids, vectors, payloads lists), one per upsert call.
             - Supports both dense and sparse embeddings simultaneously.
             - Batches are used to prevent memory or network issues for large datasets.
         """
@@ -118,38 +237,18 @@ class QdrantStore:
         if sparse_embeddings is not None and len(sparse_embeddings) != n_points:
             raise ValueError("Sparse embeddings and metadata length must match!")
 
-        # create a list of data points in accordance with Qdrant format (PointStruct objects)
-        points = []
-        for idx in range(n_points):
-            vector = {} 
-            if dense_embeddings is not None:
-                vector[self.dense_vector_name] = dense_embeddings[idx].astype(np.float32)
-
-            if sparse_embeddings is not None:
-                indices = sparse_embeddings[idx].indices
-                values = sparse_embeddings[idx].values
-                vector[self.sparse_vector_name] = SparseVector(indices=indices, values=values)
-            
-            point = PointStruct(
-                id = str(uuid.uuid4()),
-                vector=vector,
-                payload=metadatas[idx]
-            )
-
-            points.append(point)
-        logger.info(f"Upserting {len(points)} points to Qdrant collection {self.collection_name}")
+        # column-oriented Batch objects in accordance with Qdrant format
+        batches = self._build_batches(dense_embeddings, sparse_embeddings, metadatas, upsert_batch_size)
+        logger.info(f"Upserting {n_points} points to Qdrant collection {self.collection_name}")
 
         try:
             
-            for i in range(0, len(points), upsert_batch_size):
-                 batch_points = points[i: i+upsert_batch_size]
-
+            for batch in batches:
                  self.client.upsert(
                     collection_name=self.collection_name,
-                    points=batch_points
-                    # points=points
+                    points=batch
         )
-            logger.info(f"Upserted {len(points)} points to {self.collection_name}")
+            logger.info(f"Upserted {n_points} points to {self.collection_name}")
         except Exception as e:
             logger.error(f"Upsert to Qdrant failed: {e}")
             raise RuntimeError(f"Upsert to Qdrant failed: {e}")
@@ -159,7 +258,8 @@ class QdrantStore:
                 dense_embeddings: Optional[np.ndarray],
                 sparse_embeddings: Optional[List[SparseVectorParams]],
                 metadatas: List[Dict[str, Any]],
-                upsert_batch_size: int = 500
+                upsert_batch_size: int = 256,
+                max_concurrent_batches: int = 4
                     # metadatas = [{"text": "chunktext", metadata:{id:0,...}]
             ) -> None:
         """
@@ -169,16 +269,19 @@ class QdrantStore:
             dense_embeddings (np.ndarray, optional): Dense embedding vectors of shape (n_points, dim).
             sparse_embeddings (List[SparseVectorParams], optional): Sparse embedding vectors.
             metadatas (List[Dict[str, Any]]): List of metadata dictionaries for each point.
-            upsert_batch_size (int, optional): Number of points to upsert per batch. Default is 500.
+            upsert_batch_size (int, optional): Number of points to upsert per batch. Default is 256.
+            max_concurrent_batches (int, optional): Maximum number of batches in flight at once. Default is 4.
 
         Raises:
             ValueError: If the number of embeddings does not match the number of metadata entries.
             RuntimeError: If Qdrant upsert fails for any reason.
 
         Notes:
-            - The method constructs Qdrant PointStruct objects for each point.
+            - Points are sent as column-oriented Qdrant Batch objects (ids, vectors, payloads lists), one per upsert call.
             - Supports both dense and sparse embeddings simultaneously.
-            - Batches are used to prevent memory or network issues for large datasets.
+            - All batches but the last are sent concurrently without waiting for them to be applied;
+              the last batch is sent afterwards with wait=True. Updates are applied in order, so
+              once it returns every point is searchable.
         """
         # Validate lengths
         n_points = len(metadatas)
@@ -187,38 +290,25 @@ class QdrantStore:
         if sparse_embeddings is not None and len(sparse_embeddings) != n_points:
             raise ValueError("Sparse embeddings and metadata length must match!")
 
-        # create a list of data points in accordance with Qdrant format (PointStruct objects)
-        points = []
-        for idx in range(n_points):
-            vector = {} 
-            if dense_embeddings is not None:
-                vector[self.dense_vector_name] = dense_embeddings[idx].astype(np.float32)
+        # column-oriented Batch objects in accordance with Qdrant format
+        batches = self._build_batches(dense_embeddings, sparse_embeddings, metadatas, upsert_batch_size)
+        logger.info(f"Upserting {n_points} points to Qdrant collection {self.collection_name}")
 
-            if sparse_embeddings is not None:
-                indices = sparse_embeddings[idx].indices
-                values = sparse_embeddings[idx].values
-                vector[self.sparse_vector_name] = SparseVector(indices=indices, values=values)
-            
-            point = PointStruct(
-                id = str(uuid.uuid4()),
-                vector=vector,
-                payload=metadatas[idx]
-            )
+        semaphore = asyncio.Semaphore(max_concurrent_batches)
 
-            points.append(point)
-        logger.info(f"Upserting {len(points)} points to Qdrant collection {self.collection_name}")
+        async def send(batch: Batch, wait: bool) -> None:
+            async with semaphore:
+                await self.async_client.upsert(
+                    collection_name=self.collection_name,
+                    points=batch,
+                    wait=wait
+                )
 
         try:
-            
-            for i in range(0, len(points), upsert_batch_size):
-                    batch_points = points[i: i+upsert_batch_size]
-
-                    await self.async_client.upsert(
-                    collection_name=self.collection_name,
-                    points=batch_points
-                    # points=points
-        )
-            logger.info(f"Upserted {len(points)} points to {self.collection_name}")
+            if batches:
+                await asyncio.gather(*(send(batch, wait=False) for batch in batches[:-1]))
+                await send(batches[-1], wait=True)
+            logger.info(f"Upserted {n_points} points to {self.collection_name}")
         except Exception as e:
             logger.error(f"Upsert to Qdrant failed: {e}")
             raise RuntimeError(f"Upsert to Qdrant failed: {e}")
@@ -248,13 +338,29 @@ class QdrantStore:
         except Exception as e:
              logger.debug(f"An exception occured while running similariy search, Exception: {e}")
     
+    def _separate_requests(self,
+                           dense_query_vector: np.ndarray,
+                           sparse_query_vector: SparseVector,
+                           query_filter: Optional[Filter],
+                           top_k: int,
+                           with_payload: Union[bool, List[str]]
+                           ) -> List[QueryRequest]:
+        """Dense and sparse requests for one `query_batch_points` call: a single round trip instead of two."""
+        common = {"filter": query_filter, "limit": top_k, "with_payload": with_payload, "with_vector": True}
+        return [
+            QueryRequest(query=np.asarray(dense_query_vector, dtype=np.float32).tolist(), using="dense",
+                         params=self.dense_search_params, **common),
+            QueryRequest(query=sparse_query_vector, using="sparse", **common),
+        ]
+
     def search(
         self,
         dense_query_vector: Optional[np.ndarray] = None,
         sparse_query_vector: Optional[List[SparseEmbedding]] = None,
         hybrid: bool = False,
         top_k: int = 50,
-        sources: Optional[List[str]] = None
+        sources: Optional[List[str]] = None,
+        with_payload: Union[bool, List[str]] = True
     ) -> Dict[str, Any]:
         """
         Perform a similarity search in the Qdrant collection using dense, sparse, or both types of embeddings.
@@ -265,6 +371,7 @@ class QdrantStore:
             hybrid (bool): If True and both vectors are provided, performs a hybrid search using FusionQuery (RRF). Default is False.
             top_k (int): Number of top results to retrieve. Default is 50.
             sources (list | None): List of source strings to filter results. Only documents with metadata.source in this list will be returned.
+            with_payload (bool | list): True for the full payload, or a list of payload keys (e.g. "metadata.source") to return only those fields. Default is True.
 
         Returns:
             dict: Dictionary containing search results with keys:
@@ -317,7 +424,7 @@ class QdrantStore:
             "collection_name": self.collection_name,
             "query_filter": query_filter,
             "limit": top_k,
-            "with_payload": True,
+            "with_payload": with_payload,
             "with_vectors": True
         }
         # if both dense and sparse vectors are provided
@@ -333,6 +440,7 @@ class QdrantStore:
                                 query=dense_query_vector,
                                 using="dense",
                                 limit=top_k,
+                                params=self.dense_search_params,
                             ),
                             Prefetch(
                                 query=sparse_query_vector,
@@ -350,17 +458,10 @@ class QdrantStore:
             else:
                 try:
                     
-                # SEPARATE SEARCH: perform separate dense and sparse queries
-                    dense_search_result = self.client.query_points(
-                    **common_params,
-                    query=dense_query_vector,
-                    using="dense"
-                    )
-
-                    sparse_search_result = self.client.query_points(
-                    **common_params,
-                    query=sparse_query_vector,
-                    using="sparse",
+                # SEPARATE SEARCH: dense and sparse queries sent together in one batch request
+                    dense_search_result, sparse_search_result = self.client.query_batch_points(
+                        collection_name=self.collection_name,
+                        requests=self._separate_requests(dense_query_vector, sparse_query_vector, query_filter, top_k, with_payload)
                     )
 
                     return {
@@ -377,7 +478,8 @@ class QdrantStore:
                 dense_search_result = self.client.query_points(
                     **common_params,
                     query=dense_query_vector,
-                    using="dense"
+                    using="dense",
+                    search_params=self.dense_search_params
                     )
                 return {"dense": dense_search_result, "sparse": None}
             except Exception as e:
@@ -399,12 +501,29 @@ class QdrantStore:
                     raise RuntimeError(f"Tried performing sparse search. Failed due to: {e}")
 
     async def async_search(
+        self,
+        dense_query_vector: Optional[np.ndarray] = None,
+        sparse_query_vector: Optional[List[SparseEmbedding]] = None,
+        hybrid: bool = True,
+        top_k: int = 50,
+        sources: Optional[List[str]] = None,
+        with_payload: Union[bool, List[str]] = True
+    ) -> Dict[str, Any]:
+        """
+        Async similarity search; see `_async_search` for parameters, results and errors.
+        Waits for a slot of `admission` (when set) so bursts do not flood Qdrant with concurrent queries.
+        """
+        async with self.admission or nullcontext():
+            return await self._async_search(dense_query_vector, sparse_query_vector, hybrid, top_k, sources, with_payload)
+
+    async def _async_search(
             self,
             dense_query_vector: Optional[np.ndarray] = None,
             sparse_query_vector: Optional[List[SparseEmbedding]] = None,
             hybrid: bool = True,
             top_k: int = 50,
-            sources: Optional[List[str]] = None
+            sources: Optional[List[str]] = None,
+            with_payload: Union[bool, List[str]] = True
         ) -> Dict[str, Any]:
             """
             Perform a similarity search in the Qdrant collection using dense, sparse, or both types of embeddings. Uses AsyncQdrantClient
@@ -415,6 +534,7 @@ class QdrantStore:
                 hybrid (bool): If True and both vectors are provided, performs a hybrid search using FusionQuery (RRF). Default is False.
                 top_k (int): Number of top results to retrieve. Default is 50.
                 sources (list | None): List of source strings to filter results. Only documents with metadata.source in this list will be returned.
+                with_payload (bool | list): True for the full payload, or a list of payload keys (e.g. "metadata.source") to return only those fields. Default is True.
 
             Returns:
                 dict: Dictionary containing search results with keys:
@@ -468,7 +588,7 @@ class QdrantStore:
                 "collection_name": self.collection_name,
                 "query_filter": query_filter,
                 "limit": top_k,
-                "with_payload": True,
+                "with_payload": with_payload,
                 "with_vectors": True
             }
         # HYBRID: if both dense and sparse vectors are provided
@@ -484,6 +604,7 @@ class QdrantStore:
                                     query=dense_query_vector,
                                     using="dense",
                                     limit=top_k,
+                                    params=self.dense_search_params,
                                 ),
                                 Prefetch(
                                     query=sparse_query_vector,
@@ -500,17 +621,10 @@ class QdrantStore:
                     
                 else:
                     try:
-                # SEPERATE DENSE AND SPARSE SEARCH: perform separate dense and sparse queries
-                        dense_search_result = await self.async_client.query_points(
-                        **common_params,
-                        query=dense_query_vector,
-                        using="dense"
-                        )
-
-                        sparse_search_result = self.client.query_points(
-                        **common_params,
-                        query=sparse_query_vector,
-                        using="sparse",
+                # SEPERATE DENSE AND SPARSE SEARCH: dense and sparse queries sent together in one batch request
+                        dense_search_result, sparse_search_result = await self.async_client.query_batch_points(
+                            collection_name=self.collection_name,
+                            requests=self._separate_requests(dense_query_vector, sparse_query_vector, query_filter, top_k, with_payload)
                         )
 
                         return {
@@ -527,7 +641,8 @@ class QdrantStore:
                     dense_search_result = await self.async_client.query_points(
                         **common_params,
                         query=dense_query_vector,
-                        using="dense"
+                        using="dense",
+                        search_params=self.dense_search_params
                         )
                     return {"dense": dense_search_result, "sparse": None}
                 except Exception as e:
@@ -582,6 +697,35 @@ class QdrantStore:
             points_selector=FilterSelector(filter=delete_filter)
         )
 
+    async def async_delete_points_by_source(self,
+        collection_name: str,
+        source: str,
+    ) -> None:
+        """
+        Delete points from the specified collection in Qdrant based on the 'source' field in their metadata.
+        Uses AsyncQdrantClient.
+        Parameters:
+            collection_name (str): Name of the collection from which to delete points.
+            source (str): The source value to match in the metadata for deletion.
+        Raises:
+            RuntimeError: If the deletion operation fails for any reason.
+        Returns:
+            None
+        """
+        delete_filter = Filter(
+            must=[
+                FieldCondition(
+                    key="metadata.source",
+                    match=MatchValue(value=source)
+                )
+            ]
+        )
+
+        await self.async_client.delete(
+            collection_name=collection_name,
+            points_selector=FilterSelector(filter=delete_filter)
+        )
+
     def clear_collection(self, collection_name: str = None) -> None:
         """
         Delete the specified collection in Qdrant. 
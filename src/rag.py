@@ -5,25 +5,33 @@ split, embed, index, retrieve, and generate responses using the LLM based on
 the context from the vector store.
 """
 import logging, os, asyncio
-from typing import Optional, List, Union, Tuple, Dict, Any, Awaitable, Generator
+import numpy as np
+from contextlib import aclosing
+from typing import Optional, List, Union, Tuple, Dict, Any, Awaitable, AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.file_loader import FileLoader
-from src.chunker import TextChunker
+from src.chunker import TextChunker, ChunkBatch
 
 from src.embed import DenseEmbedder, SparseEmbedder
 from src.rerank import Rerank
 from src.qdrant_utils import QdrantStore
+from qdrant_client.http.models import Datatype
 from src.llm import LLM 
 from src.config import *
 from src.docstore.session import AsyncSessionLocal
 from src.rag_utils import check_context_relevance
-from src.builder import *
 from src.cache import RagSemanticCache
 from src.docstore.docstore_crud import (async_retrieve_parent_chunks_from_docstore,
                                     async_retrieve_parent_neighbors)
 from src.docstore.files_crud import async_ensure_unique_filenames
 from src.logger import logger
 
+# retrieval-only cache entries (response="") live under their own keys, apart from the responses
+RETRIEVAL_CACHE_NAMESPACE = "retrieval"
+
+def _has_history(chat_history: Optional[str]) -> bool:
+    return bool(chat_history and chat_history.strip())
+
 class RagPipeline:
     def __init__(
             self,
@@ -39,6 +47,8 @@ class RagPipeline:
             context_relevance_prompt: str,
             context_relevance: bool = True,
             rag_cache: Optional[RagSemanticCache] = None,
+            rerank_skip_margin: Optional[float] = 0.15,
+            rerank_min_dense_score: Optional[float] = 0.2,
 
     ):
         self.loader = loader
@@ -53,6 +63,10 @@ class RagPipeline:
         self.context_relevance = context_relevance
         self.session = session
         self.rag_cache = rag_cache
+        # cross-encoder is skipped when the top dense cosine beats the rerank_top_k-th by this margin (None disables)
+        self.rerank_skip_margin = rerank_skip_margin
+        # candidates whose best dense cosine is below this are not sent to the cross-encoder (None disables)
+        self.rerank_min_dense_score = rerank_min_dense_score
 
     def load(self, path: Union[str, os.PathLike]) -> List[Tuple[str, str]]:
         """
@@ -65,6 +79,17 @@ class RagPipeline:
         text = self.loader.load_files(path=path)
         return text
     
+    def load_bytes(self, filename: str, content: bytes) -> List[Tuple[str, str]]:
+        """
+        Loads text from an in-memory file
+        Args:
+            filename: name of the file, used as the source and to detect the file type
+            content: raw file bytes
+        returns: 
+            List of tuples [(source, text)]
+        """
+        return self.loader.load_bytes(filename=filename, content=content)
+
     def split(self, texts: List[Tuple[str, str]],
                     base_metadata: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict], List[Dict]]:
         """
@@ -83,7 +108,7 @@ class RagPipeline:
             logger.exception(f"Splitting failed: {e}")
             raise RuntimeError(f"Splitting failed: {e}")
 
-    async def embed_and_index(self, texts: List[Dict], doc_type: str) -> None:
+    async def embed_and_index(self, texts: Union[List[Dict], ChunkBatch], doc_type: str) -> None:
         """Embeds and indexes documents into the vector store.
 
         The function extracts text from the provided documents, generates both dense
@@ -91,8 +116,8 @@ class RagPipeline:
         their metadata.
 
         Args:
-            texts (List[Dict]): 
-                A list of document dictionaries. Each dictionary must include a
+            texts (List[Dict] | ChunkBatch): 
+                A column-wise ChunkBatch, or a list of document dictionaries. Each dictionary must include a
                 "text" field and may include additional metadata fields.
                 Example:
                     {
@@ -112,24 +137,84 @@ class RagPipeline:
             RuntimeError: If no texts are provided or if embedding/indexing fails.
         """
         if not texts:
-            logger.warning(f"No text provided to embed")
+            logger.warning("No text provided to embed")
             raise RuntimeError(f"No text provided to embed. Len of texts {len(texts)}")
         
-        chunks = [c["text"] for c in texts]
+        if isinstance(texts, ChunkBatch):
+            chunks = texts.texts  # already a column, no per-chunk extraction
+            metadatas = texts.as_dicts()
+        else:
+            chunks = [c["text"] for c in texts]
+            metadatas = texts
         # Dense and Sparse Embed documents
         try:
-            dense_embeds = self.dense_embedder.embed(text=chunks, doc_type=doc_type)
-            sparse_embeds = self.sparse_embedder.embed(text=chunks)
+            # dense and sparse models run concurrently in worker threads
+            # a float16 collection gets float16 vectors, halving the matrix held until the upsert
+            output_dtype = np.float16 if self.vectorstore.dense_datatype == Datatype.FLOAT16 else None
+            dense_embeds, sparse_embeds = await asyncio.gather(
+                self.dense_embedder.aembed(text=chunks, doc_type=doc_type, output_dtype=output_dtype),
+                self.sparse_embedder.aembed(text=chunks)
+            )
             await self.vectorstore.async_upsert(
                                     dense_embeddings=dense_embeds,
                                     sparse_embeddings=sparse_embeds,
-                                    metadatas=texts
+                                    metadatas=metadatas
                                 )
             logger.debug(f"Data indexed in vector DB in collection {self.vectorstore.collection_name}")
         except Exception as e:
             logger.exception(f"Unable to index embeddings: {e}")
             raise RuntimeError(f"Unable to index embeddings: {e}")
         
+    async def split_and_index(self,
+                              texts: List[Tuple[str, str]],
+                              doc_type: str = "documents",
+                              base_metadata: Optional[Dict[str, Any]] = None,
+                              parents_per_batch: int = 32,
+                              max_pending_batches: int = 2
+                              ) -> List[Dict]:
+        """Splits texts into parent/child chunks and indexes the children, overlapping chunking with embedding.
+
+        The chunker's async batch generator splits in worker threads and stays up to
+        `max_pending_batches` batches ahead; each batch is embedded and indexed as it arrives.
+        While batch N is being embedded and upserted, batch N+1 is being chunked.
+
+        Args:
+            texts (List[Tuple[str, str]]): List of tuples [(source, text)].
+            doc_type (str): Document type passed to the embedder. Defaults to "documents".
+            base_metadata (Dict[str, Any], optional): Base metadata to include with each chunk.
+            parents_per_batch (int): Number of parent chunks split into children per batch. Defaults to 32.
+            max_pending_batches (int): Maximum number of chunked batches waiting to be indexed. Defaults to 2.
+
+        Returns:
+            List[Dict]: The parent chunks, to be stored in the docstore.
+
+        Raises:
+            RuntimeError: If splitting or indexing fails.
+        """
+        parent_chunks = []
+        batches = self.chunker.aparent_child_batches(texts=texts,
+                                                     base_metadata=base_metadata,
+                                                     parents_per_batch=parents_per_batch,
+                                                     max_prefetch=max_pending_batches)
+        async with aclosing(batches):
+            try:
+                async for parents, children in batches:
+                    parent_chunks.extend(parents)
+                    if children:
+                        await self.embed_and_index(texts=children, doc_type=doc_type)
+            except RuntimeError:
+                raise  # indexing failures are already wrapped by embed_and_index
+            except Exception as e:
+                logger.exception(f"Splitting failed: {e}")
+                raise RuntimeError(f"Splitting failed: {e}")
+
+        if not parent_chunks:
+            logger.warning("No text provided to split and index")
+            raise RuntimeError(f"No text provided to split and index. Len of texts {len(texts)}")
+
+        logger.debug(f"Indexed {len(parent_chunks)} parent chunks")
+        return parent_chunks
+
     async def retrieve(self, 
                         query: str,
                         top_k: int = 50,
@@ -180,14 +265,22 @@ class RagPipeline:
         Raises:
             RuntimeError: If the retrieval process fails at any stage.
         """
+        # Start dense and sparse query embeddings concurrently. They run while the cache
+        # is probed, so a cache miss does not pay the embedding latency on top of the lookup.
+        embed_task = asyncio.gather(
+            self.dense_embedder.aembed(text=query, doc_type="query"),
+            self.sparse_embedder.aembed(text=query)
+        )
         if cache and self.rag_cache:
             try:
-                cached_results = self.rag_cache.lookup(prompt=query, top_k=cache_top_k)
+                cached_results = await self.rag_cache.alookup(prompt=query, top_k=cache_top_k,
+                                                             namespace=RETRIEVAL_CACHE_NAMESPACE)
                 if cached_results:
                     logger.debug(f"Cache hit {cached_results[0]['prompt']}")
                     retrieved_parents = cached_results[0]["metadata"].get("sources", [])
                     if retrieved_parents:
                         logger.debug(f"Retrieved {len(retrieved_parents)} documents from cache")
+                        embed_task.cancel()
                         return retrieved_parents
                     else:
                         logger.debug("Cache hit but no sources found, proceeding with normal retrieval")
@@ -198,8 +291,7 @@ class RagPipeline:
  
         try:
             logger.debug("No cache hit, proceeding with normal retrieval")
-            dense_embeds = self.dense_embedder.embed(text=query, doc_type="query")
-            sparse_embeds = self.sparse_embedder.embed(text=query)
+            dense_embeds, sparse_embeds = await embed_task
             hits = await self.vectorstore.async_search(
                 dense_query_vector=dense_embeds,
                 sparse_query_vector=sparse_embeds,
@@ -215,19 +307,23 @@ class RagPipeline:
                 return retrieved_parents
             
             if rerank:
-                scores = self.reranker.rerank(query=query,
-                                   docs = retrieved_parents, 
-                                   top_k = rerank_top_k
-                                   )
-                retrieved_parents = self.reranker.get_ranked_docs(docs=retrieved_parents, scores=scores)
+                retrieved_parents = self._rerank(query=query,
+                                                 hits=hits,
+                                                 dense_query=dense_embeds,
+                                                 parents=retrieved_parents,
+                                                 rerank_top_k=rerank_top_k)
 
             if retrieve_neighbors:
                 async with self.session() as session:
                     retrieved_parents = await async_retrieve_parent_neighbors(docs=retrieved_parents, session=session)
             
             if retrieved_parents:
-                self.rag_cache.store(prompt=query, response="", metadata={"sources": retrieved_parents})
-                logger.debug("Cached the retrieved results")
+                try:
+                    await self.rag_cache.astore(prompt=query, response="", metadata={"sources": retrieved_parents},
+                                                namespace=RETRIEVAL_CACHE_NAMESPACE)
+                    logger.debug("Cached the retrieved results")
+                except Exception as e:
+                    logger.exception(f"Unable to cache retrieved results: {e}")
 
             logger.debug(f"Retrieved {len(retrieved_parents)} with rerank={rerank} and neighbors={retrieve_neighbors}")
             
@@ -237,6 +333,58 @@ class RagPipeline:
             logger.exception(f"Failed to retrieve parents: {e}")
             raise RuntimeError(f"Failed to retrieve parents: {e}")
         
+    def _dense_parent_scores(self, hits, dense_query) -> Dict[Tuple[str, int], float]:
+        """Best cosine similarity between the query and any child hit of each parent.
+
+        Uses the child vectors already returned with the hybrid search, so no extra
+        round trip is needed. Returns an empty dict if vectors are unavailable.
+        """
+        name = self.vectorstore.dense_vector_name
+        keys, vectors = [], []
+        for hit in getattr(hits, "points", []):
+            vector = hit.vector.get(name) if isinstance(hit.vector, dict) else None
+            if vector is None:
+                return {}
+            keys.append((hit.payload["metadata"]["source"], hit.payload["metadata"]["parent_id"]))
+            vectors.append(vector)
+        if not vectors:
+            return {}
+        matrix = np.asarray(vectors, dtype=np.float32)
+        query = np.asarray(dense_query, dtype=np.float32).ravel()
+        cosines = (matrix @ query) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        scores = {}
+        for key, score in zip(keys, cosines.tolist()):
+            if score > scores.get(key, -1.0):
+                scores[key] = score
+        return scores
+
+    def _rerank(self, query: str, hits, dense_query, parents: List[Dict], rerank_top_k: int) -> List[Dict]:
+        """Rerank parents with the cross-encoder, skipping it when dense scores already decide.
+
+        Parents below `rerank_min_dense_score` are dropped before scoring (unless that
+        would drop all of them). If the best dense score leads the `rerank_top_k`-th by
+        more than `rerank_skip_margin`, the top parents by dense score are returned as is.
+        """
+        dense_scores = self._dense_parent_scores(hits, dense_query)
+        if dense_scores and parents:
+            scored = [(dense_scores.get((p["metadata"]["source"], p["metadata"]["id"]), 0.0), p) for p in parents]
+            if self.rerank_min_dense_score is not None:
+                kept = [item for item in scored if item[0] >= self.rerank_min_dense_score]
+                if kept:
+                    scored = kept
+            scored.sort(key=lambda item: item[0], reverse=True)
+            parents = [p for _, p in scored]
+            if (self.rerank_skip_margin is not None and len(scored) > rerank_top_k
+                    and scored[0][0] - scored[rerank_top_k][0] > self.rerank_skip_margin):
+                logger.debug(f"rerank_skipped: dense margin {scored[0][0] - scored[rerank_top_k][0]:.3f}")
+                return parents[:rerank_top_k]
+
+        scores = self.reranker.rerank(query=query,
+                                      docs=parents,
+                                      top_k=rerank_top_k
+                                      )
+        return self.reranker.get_ranked_docs(docs=parents, scores=scores)
+
     def build_context(self, documents: List[Dict[str, str]]) -> List[str]:
         """Formats a list of document dictionaries into readable context strings.
 
@@ -269,12 +417,83 @@ class RagPipeline:
             formatted = f"[Source: {source}, ID: {id_}]\nText: {text}\n]"
             contexts.append(formatted)
         return contexts
+
+    async def lookup_response(self,
+                              query: str,
+                              top_k: int = 1,
+                              distance_threshold: Optional[float] = None,
+                              chat_history: Optional[str] = None
+                              ) -> Optional[Dict[str, Any]]:
+        """Looks up a previously generated response for a semantically similar query.
+
+        The semantic cache holds both retrieval entries (empty response, sources only)
+        and response entries. Only entries carrying a response are treated as a hit.
+        A message sent after earlier turns may depend on them ("tell me more"), so it is
+        never looked up as is; probe with the self-contained rewritten query instead.
+
+        Args:
+            query (str):
+                The user query: the raw message of a first turn, or the rewritten query.
+            top_k (int, optional):
+                Number of cached neighbours to inspect. Defaults to 1.
+            distance_threshold (float, optional):
+                Cosine distance threshold for the lookup. Query-to-query matching should
+                be stricter than the cache default. Defaults to the cache threshold.
+            chat_history (str, optional):
+                Conversation before `query`. When non-empty the lookup is skipped. Defaults to None.
+
+        Returns:
+            Optional[Dict[str, Any]]:
+                {"response": str, "sources": List[Dict]} on a hit, otherwise None.
+        """
+        if not self.rag_cache or _has_history(chat_history):
+            return None
+        try:
+            cached_results = await self.rag_cache.alookup(prompt=query, top_k=top_k,
+                                                          distance_threshold=distance_threshold,
+                                                          require_response=True)
+        except Exception as e:
+            logger.exception(f"Response cache lookup failed: {e}")
+            return None
+
+        for result in cached_results or []:
+            if result.get("response"):
+                logger.debug(f"Response cache hit {result['prompt']}")
+                return {
+                    "response": result["response"],
+                    "sources": (result.get("metadata") or {}).get("sources", [])
+                }
+        return None
+
+    async def cache_response(self,
+                             query: str,
+                             response: str,
+                             sources: List[Dict[str, Any]],
+                             chat_history: Optional[str] = None) -> None:
+        """Stores a generated response and its sources in the semantic cache.
+
+        Args:
+            query (str): The self-contained query the response was generated for: the raw message
+                of a first turn, or the rewritten query.
+            response (str): The full generated response.
+            sources (List[Dict[str, Any]]): The retrieved documents used as context.
+            chat_history (str, optional): Conversation before `query`. When non-empty nothing is stored,
+                since the answer depends on turns the cache key does not capture. Defaults to None.
+        """
+        if not self.rag_cache or not response or _has_history(chat_history):
+            return
+        try:
+            await self.rag_cache.astore(prompt=query, response=response, metadata={"sources": sources})
+            logger.debug("Cached the generated response")
+        except Exception as e:
+            logger.exception(f"Unable to cache response: {e}")
         
         
     async def generate_response(self,
                                 query: str,
                                 context: list,
-                                ) -> Union[Generator[str, None, None], str]:
+                                context_relevance: Optional[bool] = None,
+                                ) -> AsyncGenerator[str, None]:
         """Generates a response from the language model using a query and context.
 
         The function streams a response from the LLM by providing it with a system
@@ -289,13 +508,16 @@ class RagPipeline:
             context (list):
                 A list of context snippets (strings or structured content) to
                 provide additional background information for the query.
+            context_relevance (bool, optional):
+                Overrides the pipeline's `context_relevance` setting for this call.
+                None uses the pipeline setting.
 
         Returns:
-            Union[Generator[str, None, None], str]:
-                - A generator that streams response chunks from the LLM if the
+            AsyncGenerator[str, None]:
+                - An async generator that streams response chunks from the LLM if the
                 context is considered relevant or if context relevance is disabled.
-                - A fallback instructional string if the relevance score indicates
-                that the retrieved context is insufficient.
+                - An async generator yielding a fallback instructional message if the
+                relevance score indicates that the retrieved context is insufficient.
 
         Raises:
             RuntimeError: If an unexpected error occurs while generating the response.
@@ -312,10 +534,12 @@ class RagPipeline:
         messages.append({"role": "system", "content": self.system_prompt})
         messages.append({"role": "user", "content":f"User question:\n{query}\n\nContext snippets:\n{context}"})
     
-        if not self.context_relevance:
+        if context_relevance is None:
+            context_relevance = self.context_relevance
+        if not context_relevance:
             return stream_response(messages)
         try:
-            logger.debug(f"Checking relevance score")
+            logger.debug("Checking relevance score")
             relevance = await check_context_relevance(user_query=query,
                                                 context=context,
                                                 context_relevance_prompt=self.context_relevance_prompt,
@@ -364,7 +588,6 @@ if __name__ == "__main__":
     rewrite_query_prompt,
     context_relevance_prompt
     )
-    from docstore.session import AsyncSessionLocal
     from rag_utils import rewrite_query
 
     def path_to_uploadfile(path: str) -> UploadFile:
@@ -20,22 +20,57 @@ Attributes:
     context_relevance (bool): Whether to check context relevance before response generation.
     session (AsyncSessionLocal): Database session factory for retrieving parent chunks.
     rag_cache (SemanticCache, optional): Semantic cache for storing and retrieving previous queries.
+
+The pipeline is built on the first call to `get_pipeline()`.
 """
+import threading
+from functools import lru_cache
 from src.rag import RagPipeline
-from src.builder import *
-
-# Initialize Rag pipeline
-pipeline = RagPipeline(
-        loader=loader,
-        chunker=chunker,
-        dense_embedder=dense_embedder,
-        sparse_embedder=sparse_embedder,
-        vectorstore=qdrant_store,
-        reranker=reranker,
-        llm=llm,
-        system_prompt=system_prompt,
-        context_relevance_prompt=context_relevance_prompt,
-        context_relevance=True,
-        session=AsyncSessionLocal,
-        rag_cache=rag_cache
-    )
+from src.builder import (
+    get_loader,
+    get_chunker,
+    get_dense_embedder,
+    get_sparse_embedder,
+    get_qdrant_store,
+    get_reranker,
+    get_llm,
+    get_rag_cache,
+    load_prompt
+)
+from src.docstore.session import AsyncSessionLocal
+from src.config import get_system_prompt, CONTEXT_RELEVANCE_PROMPT_PATH, RERANK_SKIP_MARGIN, RERANK_MIN_DENSE_SCORE
+
+__all__ = ["get_pipeline"]
+
+# lru_cache does not stop two threads from building the pipeline concurrently on first use
+_pipeline_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _build_pipeline() -> RagPipeline:
+    return RagPipeline(
+            loader=get_loader(),
+            chunker=get_chunker(),
+            dense_embedder=get_dense_embedder(),
+            sparse_embedder=get_sparse_embedder(),
+            vectorstore=get_qdrant_store(),
+            reranker=get_reranker(),
+            llm=get_llm(),
+            system_prompt=get_system_prompt(),
+            context_relevance_prompt=load_prompt(CONTEXT_RELEVANCE_PROMPT_PATH),
+            context_relevance=True,
+            session=AsyncSessionLocal,
+            rag_cache=get_rag_cache(),
+            rerank_skip_margin=RERANK_SKIP_MARGIN,
+            rerank_min_dense_score=RERANK_MIN_DENSE_SCORE
+        )
+
+def get_pipeline() -> RagPipeline:
+    """Return the process-wide RAG pipeline, building it on first call."""
+    with _pipeline_lock:
+        return _build_pipeline()
+
+def __getattr__(name: str):
+    # keeps `from src.rag_pipeline import pipeline` working without building at import time
+    if name == "pipeline":
+        return get_pipeline()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
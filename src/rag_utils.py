@@ -1,5 +1,8 @@
-from typing import List, Union, Tuple, Dict
-import os, json, ast
+from typing import List, Union, Tuple, Dict, Optional
+import os, json, ast, hashlib, time
+from collections import OrderedDict
+from functools import lru_cache
+from string import Formatter
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi import UploadFile
@@ -94,6 +97,38 @@ def extract_json_str(text):
     except ValueError:
         return None
     
+@lru_cache(maxsize=None)
+def compile_prompt(template: str) -> Optional[Tuple[Tuple[str, Optional[str]], ...]]:
+    """
+    Pre-parse a `str.format` prompt template into (literal_text, field_name) parts.
+
+    Parsing (including `{{`/`}}` escapes) happens once per template, so rendering is a
+    plain join. Returns None for templates with conversions, format specs, positional
+    fields (`{}`, `{0}`) or attribute/index lookups (`{a.b}`, `{a[0]}`), which are
+    rendered with `str.format` instead.
+    """
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        if spec or conversion:
+            return None
+        if field is not None and not field.isidentifier():
+            return None
+        parts.append((literal, field))
+    return tuple(parts)
+
+def render_prompt(template: str, **values) -> str:
+    """Render a prompt template; equivalent to `template.format(**values)`."""
+    parts = compile_prompt(template)
+    if parts is None:
+        return template.format(**values)
+    return "".join(literal + (str(values[field]) if field is not None else "") for literal, field in parts)
+
+# Bounded LRU of rewrite results keyed on a digest of the rendered prompt and the user query,
+# so an identical message in an identical conversation state can skip the LLM round trip.
+# Entries are (expires_at, query, sources, output); only used when rewrite_query gets a cache_ttl.
+_rewrite_cache: "OrderedDict[bytes, Tuple[float, Optional[str], Tuple, Optional[str]]]" = OrderedDict()
+_rewrite_cache_size = 2048
+
 async def check_context_relevance(user_query: str, context: List[Dict], llm: LLM, context_relevance_prompt: str) -> Dict:
     """ 
     Assess the relevance of a given context with respect to a user query using an LLM.
@@ -113,13 +148,14 @@ async def check_context_relevance(user_query: str, context: List[Dict], llm: LLM
             }
     """
     messages = []
-    formatted_context_relevance_prompt = context_relevance_prompt.format(message=user_query, context=context)
+    formatted_context_relevance_prompt = render_prompt(context_relevance_prompt, message=user_query, context=context)
     messages.append({"role": "system", "content": formatted_context_relevance_prompt})
     relevance_response = await llm.async_invoke(messages)
     relevance = json.loads(relevance_response)
     return relevance
 
-async def rewrite_query(user_query: str, llm: LLM, rewrite_query_prompt: str, chat_history=[], collection_sources=[]) -> Tuple[str, List]:
+async def rewrite_query(user_query: str, llm: LLM, rewrite_query_prompt: str, chat_history=[], collection_sources=[],
+                        cache_ttl: float = 0) -> Tuple[str, List]:
     """
     Uses an LLM to rewrite a user query for better retrieval or execution, and optionally
     extract relevant sources. If the query is deemed invalid, an alternative output message
@@ -132,6 +168,8 @@ async def rewrite_query(user_query: str, llm: LLM, rewrite_query_prompt: str, ch
             rewrite the query and/or extract sources.
         chat_history (list, optional): Prior conversation history to provide context. Defaults to [].
         sources (list, optional): Existing sources to include in the prompt. Defaults to [].
+        cache_ttl (float, optional): Seconds an identical rewrite (same prompt, history and query) is
+            reused in-process instead of asking the LLM again. 0 disables it. Defaults to 0.
 
     Returns:
         Tuple[str, List, str]:
@@ -140,7 +178,18 @@ async def rewrite_query(user_query: str, llm: LLM, rewrite_query_prompt: str, ch
             - output (str or None): A fallback message provided by the LLM if the query is invalid.
 
     """
-    rewrite_query_prompt = rewrite_query_prompt.format(chat_history=chat_history, sources=collection_sources)
+    rewrite_query_prompt = render_prompt(rewrite_query_prompt, chat_history=chat_history, sources=collection_sources)
+    cache_key = hashlib.blake2b(f"{rewrite_query_prompt}\x00{user_query}".encode("utf-8"), digest_size=16).digest()
+    if cache_ttl > 0:
+        cached = _rewrite_cache.get(cache_key)
+        if cached is not None:
+            expires_at, query, sources, output = cached
+            if expires_at > time.monotonic():
+                _rewrite_cache.move_to_end(cache_key)
+                # a fresh list per caller, so mutating it cannot corrupt the cached entry
+                return query, list(sources), output
+            del _rewrite_cache[cache_key]
+
     messages = []
     messages.append({"role": "system", "content": rewrite_query_prompt})
     messages.append({"role": "user", "content": user_query})
@@ -158,6 +207,10 @@ async def rewrite_query(user_query: str, llm: LLM, rewrite_query_prompt: str, ch
     else:
         output = rewritten_res.get("output")
 
+    if cache_ttl > 0:
+        _rewrite_cache[cache_key] = (time.monotonic() + cache_ttl, query, tuple(sources), output)
+        if len(_rewrite_cache) > _rewrite_cache_size:
+            _rewrite_cache.popitem(last=False)
     return query, sources, output
 
 
@@ -1,31 +1,67 @@
 from sentence_transformers.cross_encoder import CrossEncoder
 from typing import List
 import logging
-# # Configure root logger
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", 
-    handlers=[logging.StreamHandler()]
-)
+import torch
 
 # Create a module logger
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 class Rerank:
     def __init__(
             self,
             reranking_model: str = "cross-encoder/ms-marco-MiniLM-L6-v2",
-            late_interaction: bool = False
+            late_interaction: bool = False,
+            compile_model: bool = True,
+            warmup_batch_size: int = 50
     ):
         """
         Parameters:
         - reranking_model: name of the reranking model - by default: cross-encoder/ms-marco-MiniLM-L6-v2
         - late_interaction: Whether to use late interaction or not. If False, reranking will be done using a cross-encoder
+        - compile_model: Whether to wrap the model with torch.compile on GPU. Ignored on CPU. Falls back to eager mode if compilation fails.
+        - warmup_batch_size: Number of pairs scored once at startup on GPU so compilation cost is not paid by the first request. 0 disables warmup.
         """
         if not late_interaction:
             self.rerank_model = CrossEncoder(reranking_model)
-        
+            on_gpu = self.rerank_model.device.type == "cuda"
+            self._optimize_model(compile_model and on_gpu)
+            if warmup_batch_size and on_gpu:
+                self._warmup(warmup_batch_size)
+
+    def _optimize_model(self, compile_model: bool):
+        """Cast to bfloat16 on GPU and compile the underlying transformer."""
+        model = self.rerank_model.model
+        if self.rerank_model.device.type == "cuda":
+            model = model.to(torch.bfloat16)
+        model.eval()
+        if compile_model:
+            try:
+                model = torch.compile(model, mode="reduce-overhead", fullgraph=False)
+            except Exception as e:
+                logger.warning(f"torch.compile unavailable, using eager reranker: {e}")
+        self.rerank_model.model = model
+
+    def _warmup(self, batch_size: int):
+        """Score a full-length batch once so compilation happens at startup."""
+        max_length = self.rerank_model.max_length or 512
+        long_text = " ".join(["warmup"] * max_length)
+        try:
+            with torch.inference_mode():
+                self.rerank_model.predict([(long_text, long_text)] * batch_size, batch_size=batch_size)
+            logger.debug(f"Reranker warmed up with batch_size={batch_size}")
+        except Exception as e:
+            # compiled graphs can fail on first use (e.g. missing C compiler); keep serving in eager mode
+            logger.warning(f"Reranker warmup failed, falling back to eager mode: {e}")
+            self._use_eager()
+
+    def _use_eager(self) -> bool:
+        """Swap a compiled model for its eager original. Returns False if the model was not compiled."""
+        original = getattr(self.rerank_model.model, "_orig_mod", None)
+        if original is None:
+            return False
+        self.rerank_model.model = original
+        return True
+
     def rerank(
             self,
             query: str,
@@ -53,7 +89,16 @@ class Rerank:
         
         rerank_corpus = [doc["text"] for doc in docs]
         try:
-            scores = self.rerank_model.rank(query, rerank_corpus)
+            try:
+                with torch.inference_mode():
+                    scores = self.rerank_model.rank(query, rerank_corpus, batch_size=len(rerank_corpus))
+            except Exception as e:
+                # a new input shape recompiles at request time and can fail there; retry once in eager mode
+                if not self._use_eager():
+                    raise
+                logger.warning(f"Compiled reranker failed, falling back to eager mode: {e}")
+                with torch.inference_mode():
+                    scores = self.rerank_model.rank(query, rerank_corpus, batch_size=len(rerank_corpus))
         except Exception as e:
             logger.debug(f"Reranking failed due to: {e}")
             raise RuntimeError(f"Reranking failed due to: {e}")
@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+import pytest
+
+# Minimal settings so src.config imports without a .env; a real .env overrides them.
+for key, value in {
+    "MAX_SEQ_LENGTH_EMBEDDING": "256",
+    "UPSERT_BATCH_SIZE": "64",
+    "COLLECTION_RESOURCES": "",
+    "PARENT_CHUNK_SIZE": "1000",
+    "PARENT_CHUNK_OVERLAP": "100",
+    "CHILD_CHUNK_SIZE": "200",
+    "CHILD_CHUNK_OVERLAP": "20",
+    "REDIS_PORT": "6379",
+    "REDIS_DB": "0",
+    "CACHE_TOP_K": "1",
+    "DISTANCE_THRESHOLD": "0.2",
+    "CACHE_TTL": "3600",
+    "DOCSTORE_USER": "docuser",
+    "DOCSTORE_PASSWORD": "docpass",
+    "DOCSTORE_HOST": "localhost",
+    "DOCSTORE_PORT": "5431",
+    "DOCSTORE_NAME": "docstore",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+@pytest.fixture(scope="session")
+def postgres_url():
+    """URL of a scratch Postgres database: $TEST_DATABASE_URL, or a throwaway pgserver instance."""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if url:
+        yield url
+        return
+    pgserver = pytest.importorskip("pgserver")
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = pgserver.get_server(data_dir, cleanup_mode="stop")
+        yield server.get_uri()
+        server.cleanup()
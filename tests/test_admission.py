@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from src.admission import AdmissionController
+
+
+def test_limit_bounds_inflight_calls():
+    async def main():
+        admission = AdmissionController(limit=2)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with admission:
+                peak = max(peak, admission.inflight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak, admission.inflight
+
+    assert asyncio.run(main()) == (2, 0)
+
+
+def test_cancelled_notified_waiter_passes_wakeup_on():
+    async def main():
+        admission = AdmissionController(limit=1)
+        await admission.acquire()
+        first = asyncio.create_task(admission.acquire())
+        second = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+
+        await admission.release()   # notifies `first`
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.wait_for(second, timeout=1)
+        return admission.inflight
+
+    assert asyncio.run(main()) == 1
+
+
+def test_raising_limit_wakes_waiters():
+    async def main():
+        admission = AdmissionController(limit=1)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await admission.set_limit(2)
+        await asyncio.wait_for(waiter, timeout=1)
+        return admission.inflight
+
+    assert asyncio.run(main()) == 2
+
+
+def test_limit_must_be_positive():
+    with pytest.raises(ValueError):
+        AdmissionController(limit=0)
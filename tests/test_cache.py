@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("redisvl")
+
+from redisvl.redis.utils import hashify
+
+from src.cache import LocalVectorIndex, LookupCoalescer, RagSemanticCache
+
+
+class FakeVectorizer:
+    dtype = "float32"
+
+
+class FakeAsyncIndex:
+    """Range search over stored vectors by raw cosine distance, as Redis evaluates it."""
+    def __init__(self, entries):
+        self.entries = entries  # list of (key, vector, response)
+        self.queries = []
+
+    async def batch_query(self, queries, batch_size):
+        self.queries.extend(queries)
+        results = []
+        for query in queries:
+            probe = np.asarray(query._vector, dtype=np.float32)
+            hits = []
+            for key, vector, response in self.entries:
+                distance = 1.0 - float(np.dot(probe, vector) / (np.linalg.norm(probe) * np.linalg.norm(vector)))
+                if distance <= query.distance_threshold:
+                    hits.append({"id": key, "response": response, "vector_distance": distance})
+            results.append(hits)
+        return results
+
+
+class FakeSemanticCache:
+    return_fields = ["response", "vector_distance"]
+    _ttl = None
+
+    def __init__(self, index):
+        self.index = index
+
+    async def _get_async_index(self):
+        return self.index
+
+    def _process_cache_results(self, results):
+        return [r["id"] for r in results], [{**r, "key": r["id"]} for r in results]
+
+    async def aexpire(self, key):
+        pass
+
+
+def make_cache(entries, distance_threshold=0.15):
+    rag_cache = RagSemanticCache(redis_client=object(), distance_threshold=distance_threshold)
+    rag_cache._vectorizer = FakeVectorizer()
+    rag_cache._cache = FakeSemanticCache(FakeAsyncIndex(entries))
+    return rag_cache
+
+
+def test_range_queries_keep_raw_cosine_threshold():
+    rag_cache = make_cache([])
+    queries = rag_cache._range_queries([[1.0, 0.0, 0.0]], top_k=1, distance_threshold=None)
+    assert queries[0].distance_threshold == pytest.approx(0.15)
+
+
+def test_range_queries_honour_a_zero_threshold():
+    rag_cache = make_cache([])
+    queries = rag_cache._range_queries([[1.0, 0.0, 0.0]], top_k=1, distance_threshold=0.0)
+    assert queries[0].distance_threshold == 0.0
+
+
+def test_async_remote_lookup_misses_unrelated_prompt():
+    stored = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    rag_cache = make_cache([("llmcache:1", stored, "cached answer")])
+
+    related, unrelated = [0.99, 0.1, 0.0], [0.0, 1.0, 0.0]
+    hits = asyncio.run(rag_cache._aremote_lookup([related, unrelated], 1, None))
+
+    assert [hit["response"] for hit in hits[0]] == ["cached answer"]
+    assert hits[1] == []
+
+
+def test_local_index_misses_unrelated_vector():
+    index = LocalVectorIndex(max_entries=4)
+    index.add("what is rag", [1.0, 0.0, 0.0], {"prompt": "what is rag", "response": "answer", "metadata": {}})
+
+    assert index.search([0.0, 1.0, 0.0], top_k=1, distance_threshold=0.15) == []
+    assert index.search([1.0, 0.05, 0.0], top_k=1, distance_threshold=0.15)[0]["response"] == "answer"
+
+
+def test_alookup_skips_retrieval_only_exact_hit_when_response_required():
+    rag_cache = make_cache([])
+    retrieval_only = [{"prompt": "what is rag", "response": "", "metadata": {"sources": ["doc"]}}]
+
+    async def exact_lookup(prompt, namespace=None):
+        return retrieval_only
+
+    async def embed(prompt):
+        return [1.0, 0.0, 0.0]
+
+    rag_cache._aexact_lookup = exact_lookup
+    rag_cache._aembed = embed
+    rag_cache.local_index.add("what's rag", [0.99, 0.1, 0.0],
+                              {"prompt": "what's rag", "response": "cached answer", "metadata": {}})
+
+    assert asyncio.run(rag_cache.alookup("what is rag")) == retrieval_only
+    hits = asyncio.run(rag_cache.alookup("what is rag", require_response=True))
+    assert [hit["response"] for hit in hits] == ["cached answer"]
+
+
+class HashSemanticCache(FakeSemanticCache):
+    """Keeps entries as Redis hashes under SemanticCache's deterministic keys."""
+    return_fields = ["prompt", "response"]
+
+    def __init__(self):
+        super().__init__(FakeAsyncIndex([]))
+        self.hashes = {}
+        self._index = self
+        self._async_redis_client = self
+
+    def key(self, entry_id):
+        return f"llmcache:{entry_id}"
+
+    def _make_entry_id(self, prompt, filters=None):
+        return hashify(prompt, filters)
+
+    async def astore(self, prompt, response, vector, metadata, filters=None):
+        self.hashes[self.key(self._make_entry_id(prompt, filters))] = {"prompt": prompt, "response": response}
+
+    async def hmget(self, key, fields):
+        entry = self.hashes.get(key, {})
+        return [entry.get(field) for field in fields]
+
+
+def test_namespaced_entries_do_not_overwrite_responses():
+    rag_cache = make_cache([])
+    rag_cache._cache = HashSemanticCache()
+
+    async def embed(prompt):
+        return [1.0, 0.0, 0.0]
+
+    rag_cache._aembed = embed
+
+    async def run():
+        await rag_cache.astore("what is rag", "cached answer")
+        await rag_cache.astore("what is rag", "", namespace="retrieval")
+        return (await rag_cache.alookup("what is rag", require_response=True),
+                await rag_cache.alookup("what is rag", namespace="retrieval"))
+
+    response, retrieval = asyncio.run(run())
+
+    assert len(rag_cache._cache.hashes) == 2
+    assert response[0]["response"] == "cached answer"
+    assert retrieval[0]["response"] == ""
+
+
+def test_lookup_coalescer_batches_concurrent_misses_by_threshold():
+    calls = []
+
+    async def lookup_fn(vectors, top_k, distance_threshold):
+        calls.append((len(vectors), top_k, distance_threshold))
+        return [[{"vector": vector}] for vector in vectors]
+
+    async def main():
+        coalescer = LookupCoalescer(lookup_fn)
+        return await asyncio.gather(
+            coalescer.submit("a", 1, None),
+            coalescer.submit("b", 1, None),
+            coalescer.submit("c", 1, 0.1),
+        )
+
+    results = asyncio.run(main())
+    assert results == [[{"vector": "a"}], [{"vector": "b"}], [{"vector": "c"}]]
+    assert sorted(calls, key=str) == sorted([(2, 1, None), (1, 1, 0.1)], key=str)
+
+
+def test_lookup_coalescer_propagates_errors():
+    async def lookup_fn(vectors, top_k, distance_threshold):
+        raise ConnectionError("redis down")
+
+    async def main():
+        coalescer = LookupCoalescer(lookup_fn)
+        return await asyncio.gather(coalescer.submit("a", 1, None), coalescer.submit("b", 1, None),
+                                    return_exceptions=True)
+
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(main()))
@@ -0,0 +1,106 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("dotenv")
+
+from src.chunker import RegexTextSplitter, TextChunker
+
+
+@pytest.fixture
+def splitter():
+    return RegexTextSplitter(chunk_size=10, chunk_overlap=3, separators=["\n\n", "\n", " "])
+
+
+def test_empty_text(splitter):
+    assert splitter.split_text("") == []
+    assert splitter.split_spans("").shape == (0, 2)
+
+
+def test_text_without_separators_is_kept_whole(splitter):
+    text = "abcdefghijklmnop"
+    assert splitter.split_text(text) == [text]
+    assert splitter.split_spans(text).tolist() == [[0, len(text)]]
+
+
+def test_oversized_piece_is_kept_whole_between_separators(splitter):
+    assert splitter.split_text("short abcdefghijklmnopq tail") == ["short", "abcdefghijklmnopq", "tail"]
+
+
+def test_higher_priority_separator_wins(splitter):
+    assert splitter.split_text("para one\n\npara two\n\nthree") == ["para one", "para two", "three"]
+
+
+def test_overlap_repeats_trailing_words(splitter):
+    text = "aa bb cc dd ee ff gg"
+    assert splitter.split_text(text) == ["aa bb cc", "cc dd ee", "ee ff gg"]
+    assert splitter.split_spans(text).tolist() == [[0, 8], [5, 14], [11, 20]]
+
+
+def test_no_overlap():
+    splitter = RegexTextSplitter(chunk_size=10, chunk_overlap=0, separators=[" "])
+    assert splitter.split_text("aa bb cc dd ee ff gg") == ["aa bb cc", "dd ee ff", "gg"]
+
+
+def test_chunks_respect_chunk_size(splitter):
+    text = " ".join(["word"] * 50)
+    assert all(len(chunk) <= splitter.chunk_size for chunk in splitter.split_text(text))
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        RegexTextSplitter(chunk_size=5, chunk_overlap=5, separators=[" "])
+
+
+def test_parent_child_batches_leave_no_task_when_consumer_fails():
+    chunker = TextChunker(parent_chunk_size=100, parent_chunk_overlap=0,
+                          child_chunk_size=50, child_chunk_overlap=0)
+    texts = [("a.txt", "Some words here. " * 500), ("b.txt", "Some words here. " * 500)]
+
+    async def consume():
+        async with aclosing(chunker.aparent_child_batches(texts, parents_per_batch=1, max_prefetch=1)) as batches:
+            async for _ in batches:
+                # let the producer fill the queue and block on it
+                await asyncio.sleep(0.05)
+                raise RuntimeError("upsert failed")
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await consume()
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert asyncio.run(main()) == set()
+
+
+def test_parent_child_batches_yield_every_parent():
+    chunker = TextChunker(parent_chunk_size=100, parent_chunk_overlap=0,
+                          child_chunk_size=50, child_chunk_overlap=0)
+    texts = [("a.txt", "Some words here. " * 50)]
+
+    async def main():
+        return [batch async for batch in chunker.aparent_child_batches(texts, parents_per_batch=3, max_prefetch=1)]
+
+    batches = asyncio.run(main())
+    parents = [parent for batch, _ in batches for parent in batch]
+    assert parents == chunker.split_text(texts[0][1], {"source": "a.txt"})
+
+
+def test_chunk_batch_as_dicts_matches_columns():
+    chunker = TextChunker(parent_chunk_size=100, parent_chunk_overlap=0,
+                          child_chunk_size=40, child_chunk_overlap=0)
+    parent_chunks = chunker.split_text("Some words here. " * 40, {"source": "a.txt"})
+    batch = chunker.split_children_batch(parent_chunks, start_child_id=10)
+    children = batch.as_dicts()
+
+    assert len(children) == len(batch) > len(parent_chunks)
+    assert [child["text"] for child in children] == batch.texts
+    assert [child["metadata"]["child_id"] for child in children] == list(range(10, 10 + len(batch)))
+    assert [child["metadata"]["parent_id"] for child in children] == batch.parent_ids.tolist()
+    assert {child["metadata"]["source"] for child in children} == {"a.txt"}
+    assert all("id" not in child["metadata"] for child in children)
+    # children of one parent share a single metadata dict
+    first_parent = [child for child in children if child["metadata"]["parent_id"] == batch.parent_ids[0]]
+    assert len({id(child["metadata"].maps[1]) for child in first_parent}) == 1
+    assert chunker.split_children(parent_chunks, start_child_id=10) == children
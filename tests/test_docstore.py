@@ -0,0 +1,184 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+pytest.importorskip("asyncpg")
+pytest.importorskip("fastapi")
+pytest.importorskip("dotenv")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.db_setup import Base, _ensure_docstore_unique, _migrate_docstore_schema
+from src.docstore.models import Docstore, File
+from src.docstore.docstore_crud import (stage_file_with_parents, async_stage_file_with_parents,
+                                        upsert_parents_to_docstore, retrieve_parent_chunks_from_docstore,
+                                        async_retrieve_parent_chunks_from_docstore, retrieve_parent_neighbors,
+                                        async_retrieve_parent_neighbors)
+from src.docstore.files_crud import delete_file_rows, stage_file_rows
+
+
+def _driver_url(url: str, driver: str) -> str:
+    return url.replace("postgresql://", f"postgresql+{driver}://", 1)
+
+
+@pytest.fixture
+def engine(postgres_url):
+    engine = create_engine(_driver_url(postgres_url, "psycopg2"))
+    with engine.begin() as conn:
+        Base.metadata.drop_all(conn)
+        Base.metadata.create_all(conn)
+    yield engine
+    with engine.begin() as conn:
+        Base.metadata.drop_all(conn)
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+def parents(source, ids):
+    return [{"text": f"{source} parent {i}", "metadata": {"source": source, "parent_id": i, "page": i}} for i in ids]
+
+
+def hits(*keys):
+    return SimpleNamespace(points=[
+        SimpleNamespace(payload={"metadata": {"source": source, "parent_id": parent_id}}) for source, parent_id in keys
+    ])
+
+
+def docstore_keys(session):
+    return session.execute(text("SELECT source, parent_id FROM docstore ORDER BY source, parent_id")).all()
+
+
+def test_stage_file_with_parents_inserts_file_and_skips_duplicates(session):
+    entries = parents("a.pdf", [0, 1, 2]) + parents("a.pdf", [1])
+    file_id, saved = stage_file_with_parents({"object_name": "a.pdf", "path": "p"}, entries, session)
+
+    assert saved == 3
+    assert session.get(File, file_id).file_metadata == {"object_name": "a.pdf", "path": "p"}
+    row = session.execute(text("SELECT file_id, chunk_metadata FROM docstore WHERE parent_id = 2")).one()
+    assert row.file_id == file_id
+    assert row.chunk_metadata == {"source": "a.pdf", "parent_id": 2, "page": 2}
+
+    # a second file carrying an already stored parent only adds the new ones
+    _, saved = stage_file_with_parents({"object_name": "b.pdf"}, parents("a.pdf", [2, 3]), session)
+    assert saved == 1
+    assert docstore_keys(session) == [("a.pdf", 0), ("a.pdf", 1), ("a.pdf", 2), ("a.pdf", 3)]
+
+
+def test_upsert_parents_skips_existing_rows(session):
+    file = stage_file_rows(session, {"object_name": "a.pdf"})
+    assert upsert_parents_to_docstore(parents("a.pdf", [0, 1]), session, {"a.pdf": file.id}) == 2
+    assert upsert_parents_to_docstore(parents("a.pdf", [1, 2]), session, {"a.pdf": file.id}) == 1
+    assert docstore_keys(session) == [("a.pdf", 0), ("a.pdf", 1), ("a.pdf", 2)]
+
+
+def test_retrieve_parents_by_key_in_hit_order(session):
+    stage_file_with_parents({"object_name": "a.pdf"}, parents("a.pdf", [0, 1, 2]), session)
+    stage_file_with_parents({"object_name": "b.pdf"}, parents("b.pdf", [0, 1]), session)
+
+    found = retrieve_parent_chunks_from_docstore(hits(("b.pdf", 1), ("a.pdf", 2), ("b.pdf", 1), ("a.pdf", 9)), session)
+
+    assert [doc["text"] for doc in found] == ["b.pdf parent 1", "a.pdf parent 2"]
+    assert found[0]["metadata"] == {"source": "b.pdf", "id": 1, "parent_id": 1, "page": 1}
+
+
+def test_neighbor_window_joins_adjacent_parents_of_the_same_source(session):
+    stage_file_with_parents({"object_name": "a.pdf"}, parents("a.pdf", [0, 1, 2, 3]), session)
+    stage_file_with_parents({"object_name": "b.pdf"}, parents("b.pdf", [0, 1]), session)
+    docs = [
+        {"metadata": {"source": "a.pdf", "id": 2}},
+        {"metadata": {"source": "b.pdf"}},           # no id: skipped
+        {"metadata": {"source": "a.pdf", "id": 0}},
+        {"metadata": {"source": "c.pdf", "id": 5}},  # not stored: empty window
+    ]
+
+    neighbors = retrieve_parent_neighbors(docs, session)
+
+    assert neighbors == [
+        {"text": "a.pdf parent 1 a.pdf parent 2 a.pdf parent 3", "metadata": {"source": "a.pdf"}},
+        {"text": "a.pdf parent 0 a.pdf parent 1", "metadata": {"source": "a.pdf"}},
+        {"text": "", "metadata": {"source": "c.pdf"}},
+    ]
+
+
+def test_delete_file_rows_removes_files_and_their_parents(session):
+    stage_file_with_parents({"object_name": "a.pdf"}, parents("a.pdf", [0, 1]), session)
+    stage_file_with_parents({"object_name": "b.pdf"}, parents("b.pdf", [0]), session)
+    session.commit()
+
+    assert delete_file_rows(["a.pdf", "missing.pdf"], session) == 1
+    assert session.execute(text("SELECT name FROM files")).scalars().all() == ["b.pdf"]
+    assert docstore_keys(session) == [("b.pdf", 0)]
+
+
+def test_async_statements_match_sync(postgres_url, engine):
+    async def main():
+        async_engine = create_async_engine(_driver_url(postgres_url, "asyncpg"))
+        try:
+            async with AsyncSession(async_engine) as session:
+                _, saved = await async_stage_file_with_parents(
+                    {"object_name": "a.pdf"},
+                    [{"text": f"a.pdf parent {i}", "metadata": {"source": "a.pdf", "id": i}} for i in range(3)],
+                    session)
+                found = await async_retrieve_parent_chunks_from_docstore(hits(("a.pdf", 1)), session)
+                neighbors = await async_retrieve_parent_neighbors([{"metadata": {"source": "a.pdf", "id": 1}}], session)
+                return saved, found, neighbors
+        finally:
+            await async_engine.dispose()
+
+    saved, found, neighbors = asyncio.run(main())
+    assert saved == 3
+    assert [doc["text"] for doc in found] == ["a.pdf parent 1"]
+    assert neighbors[0]["text"] == "a.pdf parent 0 a.pdf parent 1 a.pdf parent 2"
+
+
+def test_init_adds_unique_index_to_existing_docstore(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE docstore"))
+        # a docstore table from before the (source, parent_id) constraint, holding a duplicate
+        conn.execute(text("CREATE TABLE docstore (id serial PRIMARY KEY, file_id integer REFERENCES files(id), "
+                          "source varchar NOT NULL, parent_id integer NOT NULL, text text NOT NULL, "
+                          "chunk_metadata jsonb, created_date timestamp DEFAULT now())"))
+        conn.execute(text("INSERT INTO docstore (source, parent_id, text) "
+                          "VALUES ('a.pdf', 0, 'first'), ('a.pdf', 0, 'copy'), ('a.pdf', 1, 'other')"))
+        _ensure_docstore_unique(conn)
+        _ensure_docstore_unique(conn)   # idempotent
+
+    with Session(engine) as session:
+        assert session.execute(text("SELECT text FROM docstore ORDER BY id")).scalars().all() == ["first", "other"]
+        _, saved = stage_file_with_parents({"object_name": "a.pdf"}, parents("a.pdf", [0, 1, 2]), session)
+        assert saved == 1
+
+
+def test_init_migrates_json_columns_and_index_order(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE docstore"))
+        conn.execute(text("ALTER TABLE files ALTER COLUMN file_metadata TYPE json"))
+        # the docstore layout before JSONB and the file_id-first index
+        conn.execute(text("CREATE TABLE docstore (id serial PRIMARY KEY, file_id integer REFERENCES files(id), "
+                          "source varchar NOT NULL, parent_id integer NOT NULL, text text NOT NULL, "
+                          "chunk_metadata json, created_date timestamp DEFAULT now())"))
+        conn.execute(text("CREATE INDEX ix_docstore_file_parent ON docstore (parent_id, file_id)"))
+        conn.execute(text("INSERT INTO docstore (source, parent_id, text, chunk_metadata) "
+                          "VALUES ('a.pdf', 0, 'first', '{\"page\": 3}')"))
+        _migrate_docstore_schema(conn)
+        _migrate_docstore_schema(conn)   # idempotent
+
+        types = conn.execute(text(
+            "SELECT table_name, data_type FROM information_schema.columns "
+            "WHERE column_name IN ('file_metadata', 'chunk_metadata') ORDER BY table_name")).all()
+        index = conn.execute(text("SELECT indexdef FROM pg_indexes WHERE indexname = 'ix_docstore_file_parent'")).scalar()
+        page = conn.execute(text("SELECT chunk_metadata -> 'page' FROM docstore")).scalar()
+
+    assert types == [("docstore", "jsonb"), ("files", "jsonb")]
+    assert index.endswith("(file_id, parent_id)")
+    assert page == 3
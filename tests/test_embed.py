@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("fastembed")
+
+np = pytest.importorskip("numpy")
+
+from fastembed import SparseEmbedding
+
+from src.embed import (AsyncBatcher, EmbeddingCache, _decode_dense, _decode_sparse, _encode_dense,
+                       _encode_sparse)
+
+
+def test_concurrent_submits_share_one_batch():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = AsyncBatcher(batch_fn, max_batch_size=8, max_wait_ms=20)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+
+
+def test_full_batch_flushes_without_waiting():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return items
+
+    async def main():
+        # the timer would hold a partial batch for 10 s; full batches must not wait for it
+        batcher = AsyncBatcher(batch_fn, max_batch_size=2, max_wait_ms=10_000)
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(4))), timeout=1)
+
+    assert asyncio.run(main()) == [0, 1, 2, 3]
+    assert calls == [[0, 1], [2, 3]]
+
+
+def test_batch_error_reaches_every_caller():
+    def batch_fn(items):
+        raise ValueError("boom")
+
+    async def main():
+        batcher = AsyncBatcher(batch_fn, max_wait_ms=1)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def dense_cache(path, model="model-a"):
+    return EmbeddingCache(str(path / "emb.sqlite"), model)
+
+
+def fake_model(calls):
+    def compute(texts):
+        calls.append(list(texts))
+        return [np.full(3, len(text), dtype=np.float32) for text in texts]
+    return compute
+
+
+def test_embedding_cache_computes_only_missing_texts(tmp_path):
+    cache, calls = dense_cache(tmp_path), []
+
+    first = cache.get_or_compute(["a", "bb"], fake_model(calls), _encode_dense, _decode_dense)
+    second = cache.get_or_compute(["bb", "ccc", "ccc", "a"], fake_model(calls), _encode_dense, _decode_dense)
+
+    assert calls == [["a", "bb"], ["ccc"]]  # a repeated miss is embedded once
+    assert [v.tolist() for v in first] == [[1, 1, 1], [2, 2, 2]]
+    assert [v.tolist() for v in second] == [[2, 2, 2], [3, 3, 3], [3, 3, 3], [1, 1, 1]]
+
+
+def test_embedding_cache_persists_and_is_keyed_by_model(tmp_path):
+    calls = []
+    dense_cache(tmp_path).get_or_compute(["a"], fake_model(calls), _encode_dense, _decode_dense)
+
+    dense_cache(tmp_path).get_or_compute(["a"], fake_model(calls), _encode_dense, _decode_dense)
+    dense_cache(tmp_path, model="model-b").get_or_compute(["a"], fake_model(calls), _encode_dense, _decode_dense)
+
+    assert calls == [["a"], ["a"]]
+
+
+def test_embedding_cache_batches_lookups_past_the_parameter_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingCache, "LOOKUP_BATCH_SIZE", 3)
+    cache, calls = dense_cache(tmp_path), []
+    texts = [str(i) for i in range(10)]
+    cache.get_or_compute(texts, fake_model(calls), _encode_dense, _decode_dense)
+
+    assert cache.get_or_compute(texts, fake_model(calls), _encode_dense, _decode_dense)[9].tolist() == [1, 1, 1]
+    assert len(calls) == 1
+
+
+def test_sparse_embedding_roundtrip():
+    embedding = SparseEmbedding(values=np.array([0.5, 1.25], dtype=np.float32), indices=np.array([7, 2**40]))
+    decoded = _decode_sparse(_encode_sparse(embedding))
+
+    assert decoded.indices.tolist() == [7, 2**40]
+    assert decoded.values.tolist() == [0.5, 1.25]
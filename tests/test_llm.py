@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("redis")
+
+from redis import RedisError
+
+from src.llm import LLM
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the sync and async Redis clients."""
+
+    def __init__(self, fail=False):
+        self.data, self.fail = {}, fail
+
+    def get(self, key):
+        if self.fail:
+            raise RedisError("down")
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        if self.fail:
+            raise RedisError("down")
+        self.data[key] = value.encode("utf-8")
+
+
+class AsyncFakeRedis(FakeRedis):
+    async def get(self, key):
+        return FakeRedis.get(self, key)
+
+    async def set(self, key, value, ex=None):
+        return FakeRedis.set(self, key, value, ex)
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeCompletions:
+    def __init__(self, pieces):
+        self.pieces, self.calls = pieces, 0
+
+    def create(self, stream=False, **kwargs):
+        self.calls += 1
+        return iter(chunk(p) for p in self.pieces) if stream else completion("".join(self.pieces))
+
+
+class AsyncFakeCompletions(FakeCompletions):
+    async def create(self, stream=False, **kwargs):
+        self.calls += 1
+        if not stream:
+            return completion("".join(self.pieces))
+
+        async def gen():
+            for p in self.pieces:
+                yield chunk(p)
+        return gen()
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def make_llm(pieces=("Hello", ", world"), cache=None, async_cache=None):
+    llm = LLM(api_key="test", response_cache=cache, async_response_cache=async_cache)
+    llm.llm = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(list(pieces))))
+    llm.async_llm = SimpleNamespace(chat=SimpleNamespace(completions=AsyncFakeCompletions(list(pieces))))
+    return llm
+
+
+def test_invoke_is_served_from_the_cache_on_repeat():
+    llm = make_llm(cache=FakeRedis())
+
+    assert llm.invoke(MESSAGES) == "Hello, world"
+    assert llm.invoke(MESSAGES) == "Hello, world"
+    assert llm.llm.chat.completions.calls == 1
+
+
+def test_cache_key_depends_on_model_and_messages():
+    llm = make_llm()
+    other = make_llm()
+    other.model = "gpt-4"
+
+    assert llm._cache_key(MESSAGES) == make_llm()._cache_key(MESSAGES)
+    assert llm._cache_key(MESSAGES) != other._cache_key(MESSAGES)
+    assert llm._cache_key(MESSAGES) != llm._cache_key([{"role": "user", "content": "hey"}])
+
+
+def test_stream_caches_only_a_fully_consumed_response():
+    cache = FakeRedis()
+    llm = make_llm(cache=cache)
+
+    partial = llm.stream(MESSAGES)
+    next(partial)
+    partial.close()
+    assert cache.data == {}
+
+    assert "".join(llm.stream(MESSAGES)) == "Hello, world"
+    assert "".join(llm.stream(MESSAGES)) == "Hello, world"
+    assert llm.llm.chat.completions.calls == 2
+
+
+def test_stream_and_invoke_share_entries():
+    llm = make_llm(cache=FakeRedis())
+
+    "".join(llm.stream(MESSAGES))
+
+    assert llm.invoke(MESSAGES) == "Hello, world"
+    assert llm.llm.chat.completions.calls == 1
+
+
+def test_redis_errors_fall_back_to_the_api():
+    llm = make_llm(cache=FakeRedis(fail=True))
+
+    assert llm.invoke(MESSAGES) == "Hello, world"
+    assert llm.invoke(MESSAGES) == "Hello, world"
+    assert llm.llm.chat.completions.calls == 2
+
+
+def test_async_invoke_and_stream_use_the_async_cache():
+    llm = make_llm(async_cache=AsyncFakeRedis())
+
+    async def run():
+        first = await llm.async_invoke(MESSAGES)
+        streamed = [piece async for piece in llm.async_stream(MESSAGES)]
+        return first, streamed
+
+    first, streamed = asyncio.run(run())
+
+    assert first == "Hello, world"
+    assert "".join(streamed) == "Hello, world"
+    assert llm.async_llm.chat.completions.calls == 1
@@ -0,0 +1,81 @@
+import asyncio
+from collections import ChainMap
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("qdrant_client")
+
+from fastembed import SparseEmbedding
+from qdrant_client import QdrantClient
+
+from src.qdrant_utils import QdrantStore
+
+DIM = 4
+
+
+class RecordingAsyncClient:
+    def __init__(self):
+        self.calls = []
+
+    async def upsert(self, collection_name, points, wait):
+        await asyncio.sleep(0)
+        self.calls.append((points, wait))
+
+
+def points(n):
+    rng = np.random.default_rng(0)
+    dense = rng.random((n, DIM)).astype(np.float16)
+    sparse = [SparseEmbedding(values=np.array([1.0, 0.5], dtype=np.float32), indices=np.array([i, i + 1]))
+              for i in range(n)]
+    shared = {"source": "a.pdf"}
+    metadatas = [{"text": f"chunk {i}", "metadata": ChainMap({"child_id": i}, shared)} for i in range(n)]
+    return dense, sparse, metadatas
+
+
+def make_store(async_client=None):
+    return QdrantStore(client=QdrantClient(":memory:"), async_client=async_client or RecordingAsyncClient(),
+                       collection_name="test", vector_size=DIM, dense_datatype="float16")
+
+
+def test_build_batches_splits_columns():
+    store = make_store()
+    dense, sparse, metadatas = points(5)
+
+    batches = store._build_batches(dense, sparse, metadatas, batch_size=2)
+
+    assert [len(b.ids) for b in batches] == [2, 2, 1]
+    assert len({point_id for b in batches for point_id in b.ids}) == 5
+    assert batches[2].vectors["dense"] == [dense[4].astype(np.float32).tolist()]
+    assert batches[2].vectors["sparse"][0].indices == [4, 5]
+    assert batches[1].payloads[1] == {"text": "chunk 3", "metadata": {"child_id": 3, "source": "a.pdf"}}
+    assert type(batches[1].payloads[1]["metadata"]) is dict
+
+
+def test_upsert_stores_every_point():
+    store = make_store()
+    dense, sparse, metadatas = points(7)
+
+    store.upsert(dense, sparse, metadatas, upsert_batch_size=3)
+
+    records, _ = store.client.scroll("test", limit=10)
+    assert sorted(r.payload["metadata"]["child_id"] for r in records) == list(range(7))
+
+
+def test_upsert_rejects_mismatched_lengths():
+    store = make_store()
+    dense, sparse, metadatas = points(3)
+
+    with pytest.raises(ValueError):
+        store.upsert(dense[:2], sparse, metadatas)
+
+
+def test_async_upsert_waits_only_on_the_last_batch():
+    client = RecordingAsyncClient()
+    store = make_store(client)
+    dense, sparse, metadatas = points(7)
+
+    asyncio.run(store.async_upsert(dense, sparse, metadatas, upsert_batch_size=3, max_concurrent_batches=2))
+
+    assert [wait for _, wait in client.calls] == [False, False, True]
+    assert client.calls[-1][0].payloads[0]["text"] == "chunk 6"
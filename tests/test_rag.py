@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("dotenv")
+pytest.importorskip("qdrant_client")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("fitz")
+pytest.importorskip("fastapi")
+
+from src.rag import RagPipeline
+
+
+class DictCache:
+    """Stand-in for RagSemanticCache matching prompts exactly."""
+    def __init__(self):
+        self.entries = {}
+        self.lookups = []
+
+    async def alookup(self, prompt, top_k=1, distance_threshold=None, require_response=False, namespace=None):
+        self.lookups.append(prompt)
+        entry = self.entries.get((namespace, prompt))
+        return [entry] if entry else None
+
+    async def astore(self, prompt, response, metadata=None, namespace=None):
+        self.entries[(namespace, prompt)] = {"prompt": prompt, "response": response, "metadata": metadata or {}}
+
+
+def make_pipeline(cache):
+    return RagPipeline(session=None, loader=None, chunker=None, dense_embedder=None, sparse_embedder=None,
+                       vectorstore=None, reranker=None, llm=None, system_prompt="",
+                       context_relevance_prompt="", rag_cache=cache)
+
+
+def test_same_follow_up_in_two_conversations_does_not_share_answers():
+    cache = DictCache()
+    pipeline = make_pipeline(cache)
+    follow_up = "tell me more"
+
+    async def turn(history, rewritten, answer):
+        # mirrors the chat flow: raw probe, then a probe and a store keyed on the rewritten query
+        hit = await pipeline.lookup_response(query=follow_up, chat_history=history)
+        hit = hit or await pipeline.lookup_response(query=rewritten)
+        if hit:
+            return hit["response"]
+        await pipeline.cache_response(query=follow_up, response=answer, sources=[], chat_history=history)
+        await pipeline.cache_response(query=rewritten, response=answer, sources=[])
+        return answer
+
+    async def main():
+        first = await turn("User: what are apples?", "tell me more about apples", "apples answer")
+        second = await turn("User: what are pears?", "tell me more about pears", "pears answer")
+        return first, second
+
+    assert asyncio.run(main()) == ("apples answer", "pears answer")
+    assert follow_up not in cache.lookups
+    assert set(cache.entries) == {(None, "tell me more about apples"), (None, "tell me more about pears")}
+
+
+def test_first_message_is_cached_as_sent():
+    cache = DictCache()
+    pipeline = make_pipeline(cache)
+
+    async def main():
+        await pipeline.cache_response(query="what are apples?", response="apples answer", sources=[{"text": "a"}],
+                                      chat_history="")
+        return await pipeline.lookup_response(query="what are apples?", chat_history="  ")
+
+    assert asyncio.run(main()) == {"response": "apples answer", "sources": [{"text": "a"}]}
+
+
+class EchoLLM:
+    def __init__(self):
+        self.calls = []
+
+    async def async_invoke(self, messages):
+        self.calls.append("relevance")
+        return '{"rating": 1}'
+
+    async def async_stream(self, messages):
+        self.calls.append("stream")
+        yield "answer"
+
+
+def test_context_relevance_can_be_disabled_per_call():
+    pipeline = make_pipeline(DictCache())
+    pipeline.llm = EchoLLM()
+
+    async def answer(**kwargs):
+        stream = await pipeline.generate_response("q", ["ctx"], **kwargs)
+        return "".join([chunk async for chunk in stream])
+
+    assert asyncio.run(answer(context_relevance=False)) == "answer"
+    assert pipeline.llm.calls == ["stream"]
+    # the pipeline default still checks relevance and falls back on a low rating
+    assert asyncio.run(answer()) != "answer"
+    assert pipeline.llm.calls == ["stream", "relevance"]
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("fitz")
+pytest.importorskip("openai")
+
+from src import rag_utils
+from src.rag_utils import render_prompt, rewrite_query
+
+
+class FakeLLM:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    async def async_invoke(self, messages):
+        self.calls += 1
+        return self.response
+
+
+@pytest.fixture(autouse=True)
+def empty_rewrite_cache():
+    rag_utils._rewrite_cache.clear()
+    yield
+    rag_utils._rewrite_cache.clear()
+
+
+@pytest.mark.parametrize("template, values", [
+    ("Question: {message}\nContext: {context}", {"message": "hi", "context": ["a"]}),
+    ("{{literal}} {message}", {"message": "hi"}),
+    ("{message!r} {n:>4}", {"message": "hi", "n": 7}),
+    ("{item.real} {items[1]}", {"item": 3, "items": ["a", "b"]}),
+])
+def test_render_prompt_matches_str_format(template, values):
+    assert render_prompt(template, **values) == template.format(**values)
+
+
+def test_render_prompt_positional_field_fails_like_str_format():
+    with pytest.raises(IndexError):
+        render_prompt("{} {message}", message="hi")
+
+
+REWRITE = '{"valid": "true", "query": "rewritten", "sources": ["a.pdf"]}'
+
+
+def test_rewrite_is_not_memoized_by_default():
+    llm = FakeLLM(REWRITE)
+
+    async def main():
+        await rewrite_query("q", llm, "prompt {chat_history} {sources}")
+        await rewrite_query("q", llm, "prompt {chat_history} {sources}")
+
+    asyncio.run(main())
+    assert llm.calls == 2
+
+
+def test_memoized_rewrite_returns_independent_sources():
+    llm = FakeLLM(REWRITE)
+
+    async def main():
+        first = await rewrite_query("q", llm, "prompt {chat_history} {sources}", cache_ttl=60)
+        first[1].append("mutated.pdf")
+        return await rewrite_query("q", llm, "prompt {chat_history} {sources}", cache_ttl=60)
+
+    assert asyncio.run(main()) == ("rewritten", ["a.pdf"], None)
+    assert llm.calls == 1
+
+
+def test_memoized_rewrite_expires():
+    llm = FakeLLM(REWRITE)
+
+    async def main():
+        await rewrite_query("q", llm, "prompt {chat_history} {sources}", cache_ttl=0.01)
+        await asyncio.sleep(0.02)
+        await rewrite_query("q", llm, "prompt {chat_history} {sources}", cache_ttl=0.01)
+
+    asyncio.run(main())
+    assert llm.calls == 2